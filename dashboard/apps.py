@@ -9,10 +9,23 @@ class DashboardConfig(AppConfig):
     name = 'dashboard'
 
     def ready(self):
+        from . import signals  # noqa: F401
+
         # Skip background service during migrations or if Fyers is not available
         if 'makemigrations' in sys.argv or 'migrate' in sys.argv:
             return
 
+        # A single run_market_feed process ingests for the whole deployment
+        from .services.market_feed import ingestion_mode, shared_cache
+        if ingestion_mode() == 'command' or 'run_market_feed' in sys.argv:
+            if not shared_cache():
+                logger.warning("MARKET_DATA_INGESTION is 'command' but the cache is private to each process; "
+                               "web workers will not see quotes from run_market_feed")
+            return
+        if not shared_cache():
+            logger.warning("The cache is private to each process: with several workers, quotes, panel "
+                           "invalidations and holding/watchlist changes are not shared between them (set REDIS_URL)")
+
         try:
             from .services.fyers_background_service import background_service
             background_service.start()
@@ -0,0 +1,21 @@
+from django.utils.functional import SimpleLazyObject
+from .services.dashboard_data import watchlists_panel
+from .services.quote_hub import can_stream
+
+
+def watchlists(request):
+    """
+    The user's watchlists with stock counts for the sidebar, loaded from the
+    panel cache the first time a template uses them. Views may pass their
+    own `watchlists` to override it.
+    """
+    if not request.user.is_authenticated:
+        return {}
+    return {
+        'watchlists': SimpleLazyObject(lambda: watchlists_panel(request.user))
+    }
+
+
+def quote_streaming(request):
+    """Whether pages may open a live quote stream (only when served over ASGI)"""
+    return {'quote_streaming': can_stream(request)}
@@ -0,0 +1,58 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.models import Stock
+from dashboard.services.price_backfill import backfill_prices, get_history_source
+
+
+class Command(BaseCommand):
+    help = 'Backfills daily StockPrice bars from Fyers history (or a local fixture directory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', nargs='+', help='Only backfill these stock symbols (default: all stocks)')
+        parser.add_argument('--from', dest='start', help='First date to fetch, YYYY-MM-DD (default: one year ago)')
+        parser.add_argument('--to', dest='end', help='Last date to fetch, YYYY-MM-DD (default: today)')
+        parser.add_argument('--full', action='store_true', help='Refetch the whole range instead of resuming after the last stored date')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent history requests')
+        parser.add_argument('--rate', type=float, help='Maximum history requests per second')
+        parser.add_argument('--fixtures', help='Read candles from <SYMBOL>.json/.csv files in this directory')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per bulk statement')
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date: {value}')
+
+    def handle(self, *args, **options):
+        stocks = Stock.objects.order_by('symbol')
+        if options['symbols']:
+            stocks = stocks.filter(symbol__in=[symbol.upper() for symbol in options['symbols']])
+
+        def progress(stock, rows, error):
+            if error is not None:
+                self.stdout.write(self.style.ERROR(f'{stock.symbol}: {str(error)}'))
+            elif options['verbosity'] > 1:
+                self.stdout.write(f'{stock.symbol}: {rows} bars')
+
+        started = time.perf_counter()
+        stats = backfill_prices(
+            stocks,
+            get_history_source(options['fixtures'], options['rate']),
+            start_date=self.parse_date(options['start']),
+            end_date=self.parse_date(options['end']),
+            resume=not options['full'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+
+        self.stdout.write(
+            f"Stocks: {stats['stocks']}, fetched: {stats['fetched']}, up to date: {stats['skipped']}, "
+            f"failed: {stats['failed']}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Upserted {stats['rows']} bars in {time.perf_counter() - started:.2f}s"
+        ))
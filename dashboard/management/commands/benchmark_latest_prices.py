@@ -0,0 +1,79 @@
+import time
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from dashboard.models import Stock, StockPrice
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks StockPrice.get_latest_prices against the per-stock get_latest_price loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 2000],
+                            help='Numbers of stocks to resolve')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+        parser.add_argument('--days', type=int, default=30,
+                            help='Days of price history per generated stock')
+        parser.add_argument('--use-existing', action='store_true',
+                            help='Benchmark against existing stocks instead of generated ones')
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        with transaction.atomic():
+            if options['use_existing']:
+                stocks = list(Stock.objects.order_by('id')[:sizes[-1]])
+            else:
+                stocks = self.generate(sizes[-1], options['days'])
+
+            self.stdout.write(f"{'stocks':>8} {'loop ms':>10} {'queries':>8} {'bulk ms':>10} {'queries':>8} {'speedup':>8}")
+            for size in sizes:
+                subset = stocks[:size]
+                loop_time, loop_queries = self.measure(
+                    lambda: {stock.id: StockPrice.get_latest_price(stock) for stock in subset},
+                    options['repeat']
+                )
+                bulk_time, bulk_queries = self.measure(
+                    lambda: StockPrice.get_latest_prices(subset),
+                    options['repeat']
+                )
+                self.stdout.write(
+                    f"{len(subset):>8} {loop_time * 1000:>10.2f} {loop_queries:>8} "
+                    f"{bulk_time * 1000:>10.2f} {bulk_queries:>8} {loop_time / bulk_time:>7.1f}x"
+                )
+
+            # Leave the database as it was
+            transaction.set_rollback(True)
+
+    def measure(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, len(ctx.captured_queries)
+
+    def generate(self, count, days):
+        """Create throwaway stocks with price history (rolled back afterwards)"""
+        self.stdout.write(f'Generating {count} stocks x {days} days of prices...')
+        stocks = Stock.objects.bulk_create([
+            Stock(symbol=f'BENCH{i}', name=f'Benchmark Stock {i}', isin=f'BENCH{i:07d}')
+            for i in range(count)
+        ])
+        today = timezone.now().date()
+        prices = []
+        for stock in stocks:
+            price = Decimal(random.randint(500, 5000))
+            for day in range(days):
+                prices.append(StockPrice(
+                    stock=stock, date=today - timedelta(days=day), open_price=price,
+                    high_price=price, low_price=price, close_price=price,
+                    adjusted_close=price, volume=100000
+                ))
+        StockPrice.objects.bulk_create(prices, batch_size=5000)
+        return stocks
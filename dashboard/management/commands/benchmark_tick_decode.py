@@ -0,0 +1,111 @@
+import json
+import time
+import pickle
+import random
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from dashboard.services.quote_cache import quote_cache_key, QUOTE_CACHE_TIMEOUT
+from dashboard.services.quote_table import QuoteTable
+from dashboard.services.ticks import DECODERS, cache_value, tick_decoder_name
+
+
+def _dict_decoder(message, now=None):
+    """The previous hot path: json.loads into a full tick dict"""
+    data = json.loads(message)
+    return {
+        'symbol': data['symbol'],
+        'ltp': data.get('ltp', 0),
+        'change': data.get('change', 0),
+        'change_percentage': data.get('change_percentage', 0),
+        'volume': data.get('volume', 0),
+        'timestamp': now or timezone.now(),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks tick decoders and the decode->store path in ticks per second on one core'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ticks', type=int, default=100000, help='Messages to decode per run')
+        parser.add_argument('--symbols', type=int, default=500, help='Distinct symbols in the messages')
+        parser.add_argument('--batch', type=int, default=500,
+                            help='Ticks per store batch, as emitted by the coalescer')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+        parser.add_argument('--decoders', nargs='+', help='Decoders to compare (default: all installed)')
+
+    def handle(self, *args, **options):
+        decoders = {'dict (json.loads)': _dict_decoder}
+        for name in options['decoders'] or DECODERS:
+            if name not in DECODERS:
+                raise CommandError(f'Tick decoder not available: {name} (installed: {", ".join(DECODERS)})')
+            decoders[name] = DECODERS[name]
+
+        setting = getattr(settings, 'TICK_DECODER', 'auto')
+        self.stdout.write(
+            f"Hot path decoder: {tick_decoder_name(setting)} (TICK_DECODER={setting!r}, installed: {', '.join(DECODERS)})"
+        )
+        messages = self.generate(options['ticks'], options['symbols'])
+        self.stdout.write(
+            f"{len(messages)} messages, {options['symbols']} symbols, store batches of {options['batch']}"
+        )
+        self.stdout.write(f"{'decoder':>18} {'decode/s':>12} {'decode+store/s':>16} {'cache bytes':>12}")
+        try:
+            for name, decode in decoders.items():
+                store = (lambda tick: tick) if decode is _dict_decoder else cache_value
+                decode_rate = self.measure(lambda: self.decode_all(decode, messages), len(messages), options['repeat'])
+                store_rate = self.measure(
+                    lambda: self.decode_and_store(decode, messages, options['batch'], store), len(messages), options['repeat']
+                )
+                size = len(pickle.dumps(store(decode(messages[0])), pickle.HIGHEST_PROTOCOL))
+                self.stdout.write(f"{name:>18} {decode_rate:>12,.0f} {store_rate:>16,.0f} {size:>12}")
+        finally:
+            cache.delete_many([quote_cache_key(f'NSE:TICKBENCH{i}-EQ') for i in range(options['symbols'])])
+
+    def generate(self, count, symbols):
+        """Messages shaped like the upstream feed, including fields the pipeline ignores"""
+        messages = []
+        for i in range(count):
+            ltp = round(random.uniform(100, 5000), 2)
+            messages.append(json.dumps({
+                'symbol': f'NSE:TICKBENCH{i % symbols}-EQ',
+                'ltp': ltp,
+                'change': round(random.uniform(-50, 50), 2),
+                'change_percentage': round(random.uniform(-5, 5), 2),
+                'volume': random.randint(1000, 10000000),
+                'open_price': ltp,
+                'high_price': ltp,
+                'low_price': ltp,
+                'prev_close_price': ltp,
+                'exch_feed_time': int(time.time()),
+            }))
+        return messages
+
+    def decode_all(self, decode, messages):
+        now = timezone.now()
+        for message in messages:
+            decode(message, now)
+
+    def decode_and_store(self, decode, messages, batch_size, store):
+        """Decode, coalesce per batch and write the quote table and the cache, as publish_quotes does"""
+        table = QuoteTable()
+        now = timezone.now()
+        for start in range(0, len(messages), batch_size):
+            latest = {}
+            for message in messages[start:start + batch_size]:
+                tick = decode(message, now)
+                latest[tick['symbol']] = tick
+            ticks = list(latest.values())
+            table.update_many(ticks)
+            cache.set_many({quote_cache_key(tick['symbol']): store(tick) for tick in ticks}, timeout=QUOTE_CACHE_TIMEOUT)
+
+    def measure(self, func, count, repeat):
+        """Best ticks per second over repeat single-threaded runs"""
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return count / best
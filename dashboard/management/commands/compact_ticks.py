@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from dashboard.services.tick_partitions import tick_partitions, trading_day
+
+
+class Command(BaseCommand):
+    help = 'Rolls completed tick partitions up into intraday bars and drops those past retention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retain-days', type=int, default=getattr(settings, 'TICK_RETENTION_DAYS', 7),
+                            help='Days of raw ticks to keep, today included')
+        parser.add_argument('--force', action='store_true',
+                            help='Roll up days again, rewriting every bar from the ticks')
+
+    def handle(self, *args, **options):
+        today = trading_day(timezone.now())
+        for day in tick_partitions.partitions():
+            if day >= today:
+                continue
+            written = tick_partitions.rollup(day, force=options['force'])
+            if written:
+                self.stdout.write(f'{day}: rolled up {written} intraday bars')
+
+        dropped = tick_partitions.expire(options['retain_days'], today=today)
+        for day in dropped:
+            self.stdout.write(f'{day}: partition dropped')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(tick_partitions.partitions())} tick partitions kept, {len(dropped)} dropped'
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from dashboard.models import Stock, StockPrice, StockQuote, LatestStockPrice
+from dashboard.services.tick_partitions import tick_partitions
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the LatestStockPrice table from StockPrice, StockQuote and the tick partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-quotes', action='store_true',
+                            help='Only use end-of-day StockPrice bars')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            LatestStockPrice.objects.all().delete()
+
+            bars = StockPrice.get_latest_prices(Stock.objects.all())
+            written = LatestStockPrice.upsert_from_prices(bars.values())
+            self.stdout.write(f'Loaded {written} prices from StockPrice')
+
+            if not options['skip_quotes']:
+                # Newest quote per symbol; newer than the bar wins in upsert()
+                quotes = StockQuote.objects.annotate(
+                    row_number=Window(RowNumber(), partition_by=[F('symbol')], order_by=F('timestamp').desc())
+                ).filter(row_number=1)
+                written = LatestStockPrice.upsert_from_quotes(quotes)
+                self.stdout.write(f'Applied {written} prices from StockQuote')
+
+                written = LatestStockPrice.upsert_from_quotes(tick_partitions.latest_ticks())
+                self.stdout.write(f'Applied {written} prices from the latest tick partition')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'LatestStockPrice rebuilt: {LatestStockPrice.objects.count()} stocks'
+        ))
@@ -0,0 +1,48 @@
+import os
+import signal
+import asyncio
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.services.market_feed import MarketFeed, FYERS_WS_URL, shared_cache, websockets
+
+
+class Command(BaseCommand):
+    help = 'Runs the asyncio market data ingestion service (one per deployment, with MARKET_DATA_INGESTION = "command")'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Websocket URL (default: the Fyers feed for FYERS_ACCESS_TOKEN)')
+
+    def handle(self, *args, **options):
+        if not shared_cache():
+            raise CommandError(
+                'The market feed needs a cache shared with the web workers (set REDIS_URL); '
+                f"{settings.CACHES['default']['BACKEND']} is private to each process"
+            )
+        if websockets is None:
+            raise CommandError('The websockets package is required: pip install websockets')
+
+        url = options['url']
+        if not url:
+            access_token = os.getenv('FYERS_ACCESS_TOKEN')
+            if not access_token:
+                raise CommandError('No access token found. Please set FYERS_ACCESS_TOKEN in environment')
+            url = FYERS_WS_URL.format(token=access_token)
+
+        feed = MarketFeed(
+            url,
+            coalesce_interval=getattr(settings, 'QUOTE_COALESCE_INTERVAL', 0.25),
+            base_delay=getattr(settings, 'FYERS_WS_RECONNECT_BASE_DELAY', 1.0),
+            max_delay=getattr(settings, 'FYERS_WS_RECONNECT_MAX_DELAY', 60.0),
+            heartbeat_timeout=getattr(settings, 'FYERS_WS_HEARTBEAT_TIMEOUT', 30.0),
+            ping_interval=getattr(settings, 'FYERS_WS_PING_INTERVAL', 10.0),
+        )
+        self.stdout.write('Starting market feed...')
+        asyncio.run(self._run(feed))
+        self.stdout.write(self.style.SUCCESS(f'Market feed stopped: {feed.stats()}'))
+
+    async def _run(self, feed):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await feed.run(stop)
@@ -1,201 +1,243 @@
-import random
-from django.core.management.base import BaseCommand
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
-from dashboard.models import Stock, Watchlist, StockPrice
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from dashboard.models import (
+    Stock, Watchlist, StockPrice, LatestStockPrice, Portfolio, PortfolioHolding, Transaction
+)
+from dashboard.services.sample_market import trading_days, simulate_ohlcv, insert_prices, stored_closes
+from dashboard.services.search_index import stock_search_index
 from decimal import Decimal
 from django.utils import timezone
-from datetime import timedelta
+
+SAMPLE_STOCKS = [
+    {'symbol': 'RELIANCE', 'name': 'Reliance Industries Ltd.', 'isin': 'INE002A01018', 'sector': 'Energy'},
+    {'symbol': 'TCS', 'name': 'Tata Consultancy Services Ltd.', 'isin': 'INE467B01029', 'sector': 'Technology'},
+    {'symbol': 'HDFCBANK', 'name': 'HDFC Bank Ltd.', 'isin': 'INE040A01034', 'sector': 'Financial Services'},
+    {'symbol': 'INFY', 'name': 'Infosys Ltd.', 'isin': 'INE009A01021', 'sector': 'Technology'},
+    {'symbol': 'ICICIBANK', 'name': 'ICICI Bank Ltd.', 'isin': 'INE090A01021', 'sector': 'Financial Services'},
+    {'symbol': 'HINDUNILVR', 'name': 'Hindustan Unilever Ltd.', 'isin': 'INE030A01027', 'sector': 'Consumer Goods'},
+    {'symbol': 'BAJFINANCE', 'name': 'Bajaj Finance Ltd.', 'isin': 'INE296A01024', 'sector': 'Financial Services'},
+    {'symbol': 'BHARTIARTL', 'name': 'Bharti Airtel Ltd.', 'isin': 'INE397D01024', 'sector': 'Telecommunications'},
+    {'symbol': 'SBIN', 'name': 'State Bank of India', 'isin': 'INE062A01020', 'sector': 'Financial Services'},
+    {'symbol': 'ADANIPORTS', 'name': 'Adani Ports & SEZ Ltd.', 'isin': 'INE742F01042', 'sector': 'Infrastructure'},
+]
+
+SECTORS = sorted({stock['sector'] for stock in SAMPLE_STOCKS} | {'Healthcare', 'Automobile', 'Metals'})
+
+# Named watchlists for the demo users; indices pick from the stocks by symbol
+DEMO_WATCHLISTS = [
+    {
+        'name': 'Blue Chip Stocks',
+        'description': 'Portfolio of stable, large-cap companies with consistent performance',
+        'stock_indices': [0, 1, 2, 3, 4]
+    },
+    {
+        'name': 'Tech Stocks',
+        'description': 'Technology companies with high growth potential',
+        'stock_indices': [1, 3, 7]
+    },
+    {
+        'name': 'Banking & Financial',
+        'description': 'Banks and financial institutions',
+        'stock_indices': [2, 4, 6, 8]
+    },
+]
+
+CENT = Decimal('0.01')
+
 
 class Command(BaseCommand):
-    help = 'Create sample data for dashboard demo (stocks, watchlists, prices)'
-    
-    def handle(self, *args, **kwargs):
+    help = 'Create sample data for dashboard demo (stocks, watchlists, prices), optionally at load-test scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stocks', type=int, default=0, help='Synthetic stocks to add besides the sample stocks')
+        parser.add_argument('--days', type=int, default=30, help='Trading days of price history per stock')
+        parser.add_argument('--users', type=int, default=0, help='Synthetic users to add besides admin and demouser')
+        parser.add_argument('--holdings', type=int, default=5, help='Holdings per new portfolio')
+        parser.add_argument('--transactions', type=int, default=2, help='Buy transactions per holding')
+        parser.add_argument('--watchlists', type=int, default=3, help='Watchlists per synthetic user')
+        parser.add_argument('--watchlist-size', type=int, default=10, help='Stocks per synthetic watchlist')
+        parser.add_argument('--seed', type=int, help='Random seed for repeatable data')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Price rows per insert batch')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        self.rng = np.random.default_rng(options['seed'])
+        self.options = options
         self.stdout.write('Creating sample data...')
-        
-        # Create sample stocks if they don't exist
-        self.create_sample_stocks()
-        
-        # Create sample users if they don't exist
-        self.create_sample_users()
-        
-        # Create sample watchlists
-        self.create_sample_watchlists()
-        
-        # Create sample stock prices
-        self.create_sample_prices()
-        
+
+        self.timed('stocks', self.create_sample_stocks)
+        self.timed('users', self.create_sample_users)
+        self.timed('prices', self.create_sample_prices)
+        self.timed('portfolios', self.create_sample_portfolios)
+        self.timed('watchlists', self.create_sample_watchlists)
+
         self.stdout.write(self.style.SUCCESS('Sample data created successfully!'))
-    
+
+    def timed(self, label, func):
+        started = time.perf_counter()
+        func()
+        self.stdout.write(f'  {label}: {time.perf_counter() - started:.2f}s')
+
     def create_sample_stocks(self):
-        """Create sample stocks if they don't exist"""
-        sample_stocks = [
-            {'symbol': 'RELIANCE', 'name': 'Reliance Industries Ltd.', 'isin': 'INE002A01018', 'sector': 'Energy'},
-            {'symbol': 'TCS', 'name': 'Tata Consultancy Services Ltd.', 'isin': 'INE467B01029', 'sector': 'Technology'},
-            {'symbol': 'HDFCBANK', 'name': 'HDFC Bank Ltd.', 'isin': 'INE040A01034', 'sector': 'Financial Services'},
-            {'symbol': 'INFY', 'name': 'Infosys Ltd.', 'isin': 'INE009A01021', 'sector': 'Technology'},
-            {'symbol': 'ICICIBANK', 'name': 'ICICI Bank Ltd.', 'isin': 'INE090A01021', 'sector': 'Financial Services'},
-            {'symbol': 'HINDUNILVR', 'name': 'Hindustan Unilever Ltd.', 'isin': 'INE030A01027', 'sector': 'Consumer Goods'},
-            {'symbol': 'BAJFINANCE', 'name': 'Bajaj Finance Ltd.', 'isin': 'INE296A01024', 'sector': 'Financial Services'},
-            {'symbol': 'BHARTIARTL', 'name': 'Bharti Airtel Ltd.', 'isin': 'INE397D01024', 'sector': 'Telecommunications'},
-            {'symbol': 'SBIN', 'name': 'State Bank of India', 'isin': 'INE062A01020', 'sector': 'Financial Services'},
-            {'symbol': 'ADANIPORTS', 'name': 'Adani Ports & SEZ Ltd.', 'isin': 'INE742F01042', 'sector': 'Infrastructure'},
+        """Create the sample stocks plus --stocks synthetic ones, skipping existing symbols"""
+        stocks = [
+            Stock(market_cap=Decimal(int(self.rng.integers(50000, 1000000))), **data)
+            for data in SAMPLE_STOCKS
         ]
-        
-        for stock_data in sample_stocks:
-            stock, created = Stock.objects.get_or_create(
-                symbol=stock_data['symbol'],
-                defaults={
-                    'name': stock_data['name'],
-                    'isin': stock_data['isin'],
-                    'sector': stock_data['sector'],
-                    'market_cap': Decimal(str(random.randint(50000, 1000000))),
-                }
-            )
-            if created:
-                self.stdout.write(f"Created stock: {stock.symbol}")
-    
-    def create_sample_users(self):
-        """Create sample users if they don't exist"""
-        # Ensure admin user exists
-        admin_user, created = User.objects.get_or_create(
-            username='admin',
-            defaults={
-                'email': 'admin@example.com',
-                'is_staff': True,
-                'is_superuser': True,
-            }
-        )
-        
+        for i in range(self.options['stocks']):
+            stocks.append(Stock(
+                symbol=f'SIM{i:06d}',
+                name=f'Simulated Company {i}',
+                isin=f'INSIM{i:06d}0',
+                sector=SECTORS[int(self.rng.integers(len(SECTORS)))],
+                market_cap=Decimal(int(self.rng.integers(1000, 1000000))),
+            ))
+        before = Stock.objects.count()
+        Stock.objects.bulk_create(stocks, batch_size=1000, ignore_conflicts=True)
+        created = Stock.objects.count() - before
         if created:
-            admin_user.set_password('admin123')
-            admin_user.save()
-            self.stdout.write(f"Created admin user: {admin_user.username}")
-        
-        # Create regular user if it doesn't exist
-        user, created = User.objects.get_or_create(
-            username='demouser',
-            defaults={
-                'email': 'demo@example.com',
-                'first_name': 'Demo',
-                'last_name': 'User',
-            }
+            stock_search_index.invalidate()
+        self.stdout.write(f'Created {created} stocks')
+
+    def create_sample_users(self):
+        """Create admin, demouser and --users synthetic users if they don't exist"""
+        if not User.objects.filter(username='admin').exists():
+            User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+            self.stdout.write('Created admin user: admin')
+        if not User.objects.filter(username='demouser').exists():
+            User.objects.create_user(
+                'demouser', 'demo@example.com', 'demopass', first_name='Demo', last_name='User'
+            )
+            self.stdout.write('Created demo user: demouser')
+
+        if self.options['users']:
+            # Hash once; every synthetic user gets the password "loadtest"
+            password = make_password('loadtest')
+            users = [
+                User(username=f'loadtest{i:06d}', email=f'loadtest{i:06d}@example.com', password=password)
+                for i in range(self.options['users'])
+            ]
+            before = User.objects.count()
+            User.objects.bulk_create(users, batch_size=1000, ignore_conflicts=True)
+            self.stdout.write(f'Created {User.objects.count() - before} synthetic users')
+
+    def create_sample_prices(self):
+        """Simulate correlated price history for every stock and insert it in bulk"""
+        stocks = list(Stock.objects.order_by('symbol').values_list('id', 'sector'))
+        sector_index = {}
+        sector_ids = [sector_index.setdefault(sector, len(sector_index)) for _, sector in stocks]
+        self.stock_ids = np.array([stock_id for stock_id, _ in stocks], dtype='int64')
+
+        dates = trading_days(timezone.localdate(), self.options['days'])
+        bars = simulate_ohlcv(sector_ids, len(dates), seed=self.rng.integers(2 ** 32))
+        self.dates = dates
+
+        rows = insert_prices(self.stock_ids, dates, bars, chunk_size=self.options['chunk_size'])
+
+        # Existing rows were kept, so value portfolios from what is stored
+        self.closes = stored_closes(self.stock_ids, dates)
+
+        # Raw inserts skip the signal that maintains LatestStockPrice
+        LatestStockPrice.upsert_from_prices(StockPrice.get_latest_prices(Stock.objects.all()).values())
+        self.stdout.write(f'Created price history for {len(stocks)} stocks over {len(dates)} days ({rows} rows)')
+
+    @transaction.atomic
+    def create_sample_portfolios(self):
+        """Give every user without a portfolio one, with holdings bought over the price history"""
+        users = list(User.objects.filter(portfolio__isnull=True).values_list('id', flat=True))
+        if not users or len(self.stock_ids) == 0:
+            return
+        per_user = min(self.options['holdings'], len(self.stock_ids))
+        buys = max(self.options['transactions'], 1)
+
+        # Which stocks each portfolio holds, and the day and size of each buy
+        picks = np.stack([self.rng.choice(len(self.stock_ids), per_user, replace=False) for _ in users]) \
+            if per_user else np.empty((len(users), 0), dtype='int64')
+        stock_index = picks.ravel()
+        holding_count = len(stock_index)
+        buy_days = self.rng.integers(0, len(self.dates), size=(holding_count, buys))
+        buy_quantities = self.rng.integers(1, 200, size=(holding_count, buys))
+        buy_prices = self.closes[stock_index[:, None], buy_days]
+
+        quantities = buy_quantities.sum(axis=1)
+        invested = (buy_quantities * buy_prices).sum(axis=1).round(2)
+        average_cost = (invested / quantities).round(2)
+        current_value = (quantities * self.closes[stock_index, -1]).round(2)
+        portfolio_values = current_value.reshape(len(users), per_user).sum(axis=1)
+
+        Portfolio.objects.bulk_create([
+            Portfolio(user_id=user_id, total_value=Decimal(str(round(value, 2))),
+                      cash_balance=Decimal(int(self.rng.integers(10000, 1000000))))
+            for user_id, value in zip(users, portfolio_values)
+        ], batch_size=1000)
+        portfolio_ids = dict(Portfolio.objects.filter(user_id__in=users).values_list('user_id', 'id'))
+        owners = np.repeat([portfolio_ids[user_id] for user_id in users], per_user)
+        stock_ids = self.stock_ids[stock_index]
+
+        PortfolioHolding.objects.bulk_create([
+            PortfolioHolding(
+                portfolio_id=int(portfolio_id), stock_id=int(stock_id), quantity=int(quantity),
+                average_cost=Decimal(str(cost)), total_invested=Decimal(str(total)),
+                current_value=Decimal(str(value))
+            )
+            for portfolio_id, stock_id, quantity, cost, total, value
+            in zip(owners, stock_ids, quantities, average_cost, invested, current_value)
+        ], batch_size=5000)
+        Transaction.objects.bulk_create([
+            Transaction(
+                portfolio_id=int(owners[h]), stock_id=int(stock_ids[h]), transaction_type='buy',
+                quantity=int(buy_quantities[h, b]), price_per_share=Decimal(str(buy_prices[h, b])),
+                total_amount=(Decimal(int(buy_quantities[h, b])) * Decimal(str(buy_prices[h, b]))).quantize(CENT)
+            )
+            for h in range(holding_count) for b in range(buys)
+        ], batch_size=5000)
+        self.stdout.write(
+            f'Created {len(users)} portfolios, {holding_count} holdings and {holding_count * buys} transactions'
         )
-        
-        if created:
-            user.set_password('demopass')
-            user.save()
-            self.stdout.write(f"Created demo user: {user.username}")
-    
+
+    @transaction.atomic
     def create_sample_watchlists(self):
-        """Create sample watchlists"""
-        try:
-            users = User.objects.all()
-            stocks = Stock.objects.all()
-            
-            if not users.exists() or not stocks.exists():
-                self.stdout.write(self.style.WARNING('No users or stocks available. Skipping watchlist creation.'))
-                return
-            
-            for user in users:
-                # Create a few watchlists for each user
-                watchlist_configs = [
-                    {
-                        'name': 'Blue Chip Stocks',
-                        'description': 'Portfolio of stable, large-cap companies with consistent performance',
-                        'is_global': False,
-                        'stock_indices': [0, 1, 2, 3, 4]  # Will pick these indices from the stocks list
-                    },
-                    {
-                        'name': 'Tech Stocks',
-                        'description': 'Technology companies with high growth potential',
-                        'is_global': True if user.username == 'admin' else False,
-                        'stock_indices': [1, 3, 7]  # Will pick these indices from the stocks list
-                    },
-                    {
-                        'name': 'Banking & Financial',
-                        'description': 'Banks and financial institutions',
-                        'is_global': False,
-                        'stock_indices': [2, 4, 6, 8]  # Will pick these indices from the stocks list
-                    }
-                ]
-                
-                stocks_list = list(stocks)
-                
-                for config in watchlist_configs:
-                    # Check if watchlist already exists
-                    existing = Watchlist.objects.filter(name=config['name'], created_by=user).exists()
-                    if not existing:
-                        watchlist = Watchlist.objects.create(
-                            name=config['name'],
-                            description=config['description'],
-                            is_global=config['is_global'],
-                            created_by=user
-                        )
-                        
-                        # Add stocks to watchlist
-                        watchlist_stocks = []
-                        for idx in config['stock_indices']:
-                            if idx < len(stocks_list):
-                                watchlist_stocks.append(stocks_list[idx])
-                        
-                        watchlist.stocks.set(watchlist_stocks)
-                        self.stdout.write(f"Created watchlist '{watchlist.name}' for user {user.username}")
-        
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error creating watchlists: {str(e)}'))
-    
-    def create_sample_prices(self):
-        """Create sample price history for stocks"""
-        try:
-            stocks = Stock.objects.all()
-            today = timezone.now().date()
-            
-            # Generate price history for the last 30 days
-            for stock in stocks:
-                # Create a base price between 500 and 5000
-                base_price = Decimal(str(random.randint(500, 5000)))
-                
-                # Generate daily prices with some randomness
-                for day in range(30):
-                    date = today - timedelta(days=29-day)
-                    
-                    # Check if price already exists for this date
-                    if StockPrice.objects.filter(stock=stock, date=date).exists():
-                        continue
-                    
-                    # Add some random fluctuation to simulate price movement
-                    fluctuation = Decimal(str(random.uniform(-0.03, 0.03))) * base_price
-                    close_price = base_price + fluctuation
-                    
-                    # Ensure price doesn't go negative
-                    close_price = max(close_price, Decimal('0.01'))
-                    
-                    # Create realistic open, high, low prices
-                    open_price = close_price - Decimal(str(random.uniform(-0.02, 0.02))) * close_price
-                    high_price = max(open_price, close_price) + Decimal(str(random.uniform(0, 0.015))) * close_price
-                    low_price = min(open_price, close_price) - Decimal(str(random.uniform(0, 0.015))) * close_price
-                    
-                    # Ensure prices are positive and in proper order
-                    open_price = max(open_price, Decimal('0.01'))
-                    high_price = max(high_price, open_price, close_price)
-                    low_price = max(min(low_price, open_price, close_price), Decimal('0.01'))
-                    
-                    # Create a stock price entry
-                    StockPrice.objects.create(
-                        stock=stock,
-                        date=date,
-                        open_price=open_price.quantize(Decimal('0.01')),
-                        high_price=high_price.quantize(Decimal('0.01')),
-                        low_price=low_price.quantize(Decimal('0.01')),
-                        close_price=close_price.quantize(Decimal('0.01')),
-                        adjusted_close=close_price.quantize(Decimal('0.01')),
-                        volume=random.randint(100000, 10000000)
-                    )
-                
-                # Update the base price for the next day
-                base_price = close_price
-                
-            self.stdout.write(f"Created price history for {stocks.count()} stocks over 30 days")
-                
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error creating stock prices: {str(e)}')) 
\ No newline at end of file
+        """Create watchlists for users that have none"""
+        users = list(
+            User.objects.filter(created_watchlists__isnull=True).values_list('id', 'username', 'is_superuser')
+        )
+        stock_ids = self.stock_ids
+        if not users or len(stock_ids) == 0:
+            return
+        sample_ids = list(Stock.objects.filter(symbol__in=[s['symbol'] for s in SAMPLE_STOCKS])
+                          .order_by('symbol').values_list('id', flat=True))
+        size = min(self.options['watchlist_size'], len(stock_ids))
+
+        watchlists = []
+        members = []
+        for user_id, username, is_superuser in users:
+            if username.startswith('loadtest'):
+                for i in range(self.options['watchlists']):
+                    watchlists.append(Watchlist(name=f'Watchlist {i + 1}', created_by_id=user_id))
+                    members.append(stock_ids[self.rng.choice(len(stock_ids), size, replace=False)].tolist())
+            else:
+                for config in DEMO_WATCHLISTS:
+                    watchlists.append(Watchlist(
+                        name=config['name'], description=config['description'], created_by_id=user_id,
+                        is_global=is_superuser and config['name'] == 'Tech Stocks'
+                    ))
+                    members.append([sample_ids[i] for i in config['stock_indices'] if i < len(sample_ids)])
+
+        Watchlist.objects.bulk_create(watchlists, batch_size=1000)
+        ids = {
+            (created_by_id, name): watchlist_id
+            for watchlist_id, created_by_id, name in Watchlist.objects.filter(
+                created_by_id__in=[user_id for user_id, _, _ in users]
+            ).values_list('id', 'created_by_id', 'name')
+        }
+        Through = Watchlist.stocks.through
+        Through.objects.bulk_create([
+            Through(watchlist_id=ids[(watchlist.created_by_id, watchlist.name)], stock_id=stock_id)
+            for watchlist, stock_list in zip(watchlists, members) for stock_id in stock_list
+        ], batch_size=5000, ignore_conflicts=True)
+        self.stdout.write(f'Created {len(watchlists)} watchlists')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from dashboard.models import Stock
+from dashboard.services.ohlcv_store import get_ohlcv_store
+
+
+class Command(BaseCommand):
+    help = 'Syncs daily bars from StockPrice into the columnar OHLCV store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', nargs='+', help='Only sync these stock symbols')
+        parser.add_argument('--rebuild', action='store_true', help='Discard stored bars and reload them')
+
+    def handle(self, *args, **options):
+        store = get_ohlcv_store()
+        stock_ids = None
+        if options['symbols']:
+            stock_ids = list(Stock.objects.filter(symbol__in=options['symbols']).values_list('id', flat=True))
+
+        self.stdout.write(f'Syncing OHLCV store at {store.root}...')
+        appended = store.sync_from_db(stock_ids=stock_ids, rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(f'Appended {appended} bars'))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_riskanalysis_marketinsight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestStockPrice',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_price', serialize=False, to='dashboard.stock')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('change', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('change_percentage', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('volume', models.BigIntegerField(default=0)),
+                ('as_of', models.DateTimeField()),
+                ('source', models.CharField(choices=[('eod', 'End of day'), ('live', 'Live quote')], max_length=4)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_intradaybar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='intradaybar',
+            name='partial',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='TickRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('bars', models.PositiveIntegerField(default=0)),
+                ('rolled_up_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
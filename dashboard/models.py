@@ -1,9 +1,12 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.utils import timezone
 from django.urls import reverse
+from datetime import datetime
+from .services.panel_cache import invalidate_on_commit, price_tag
 
 class Portfolio(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='portfolio')
@@ -37,6 +40,14 @@ class Stock(models.Model):
     def __str__(self):
         return f"{self.symbol} - {self.name}"
 
+    @property
+    def current_price(self):
+        """Latest known price, or None. Use select_related('latest_price') to avoid a query per stock."""
+        try:
+            return self.latest_price.price
+        except LatestStockPrice.DoesNotExist:
+            return None
+
 class PortfolioHolding(models.Model):
     portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='holdings')
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
@@ -74,6 +85,36 @@ class Transaction(models.Model):
     def __str__(self):
         return f"{self.transaction_type.upper()} {self.quantity} {self.stock.symbol}"
 
+WATCHLIST_PREVIEW_STOCKS = 5
+
+
+class WatchlistQuerySet(models.QuerySet):
+    def with_counts(self):
+        """
+        Annotate stock_count and subscriber_count. Each is a correlated
+        COUNT subquery rather than a join, so the two don't multiply and no
+        per-row query is needed.
+        """
+        def count_of(through):
+            counts = through.objects.filter(watchlist_id=models.OuterRef('pk')).order_by().values(
+                'watchlist_id'
+            ).annotate(total=models.Count('*')).values('total')
+            return Coalesce(models.Subquery(counts), 0)
+
+        return self.annotate(
+            stock_count=count_of(Watchlist.stocks.through),
+            subscriber_count=count_of(Watchlist.subscribers.through),
+        )
+
+    def with_preview_stocks(self, limit=WATCHLIST_PREVIEW_STOCKS):
+        """Prefetch the first `limit` stocks by symbol of every watchlist into preview_stocks, in one query"""
+        return self.prefetch_related(models.Prefetch(
+            'stocks',
+            queryset=Stock.objects.order_by('symbol')[:limit],
+            to_attr='preview_stocks',
+        ))
+
+
 class Watchlist(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -96,14 +137,23 @@ class Watchlist(models.Model):
     def get_absolute_url(self):
         return reverse('dashboard:watchlist:detail', kwargs={'watchlist_id': self.id})
 
+    objects = WatchlistQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         unique_together = ['name', 'created_by']
 
     @property
     def subscriber_count(self):
+        """Annotated by WatchlistQuerySet.with_counts(), otherwise counted"""
+        if '_subscriber_count' in self.__dict__:
+            return self._subscriber_count
         return self.subscribers.count()
 
+    @subscriber_count.setter
+    def subscriber_count(self, value):
+        self._subscriber_count = value
+
     def add_stock(self, stock):
         """Add a stock to the watchlist if it's not already present"""
         if not self.stocks.filter(id=stock.id).exists():
@@ -206,6 +256,26 @@ class StockPrice(models.Model):
         """Get the most recent price for a stock"""
         return cls.objects.filter(stock=stock).order_by('-date').first()
 
+    @classmethod
+    def get_latest_prices(cls, stocks):
+        """
+        Get the most recent price for many stocks in a single query.
+        stocks may be Stock instances, ids or a Stock queryset.
+        Returns {stock_id: StockPrice}; stocks without prices are omitted.
+        """
+        if isinstance(stocks, models.QuerySet):
+            stock_ids = stocks.values('pk')
+        else:
+            stock_ids = [getattr(stock, 'pk', stock) for stock in stocks]
+            if not stock_ids:
+                return {}
+        # One (stock, date) index seek per stock for its newest row id
+        newest = cls.objects.filter(stock=models.OuterRef('pk')).order_by('-date').values('pk')[:1]
+        latest_ids = Stock.objects.filter(pk__in=stock_ids).annotate(
+            latest_price_id=models.Subquery(newest)
+        ).values('latest_price_id')
+        return {price.stock_id: price for price in cls.objects.filter(pk__in=latest_ids)}
+
     @classmethod
     def get_price_history(cls, stock, days=30):
         """Get price history for a stock for the specified number of days"""
@@ -233,3 +303,181 @@ class StockQuote(models.Model):
         
     def __str__(self):
         return f"{self.symbol} - ₹{self.ltp} ({self.change_percentage}%)"
+
+class IntradayBar(models.Model):
+    """
+    OHLCV bar of `resolution` minutes starting at `start`, built from live
+    ticks. Keyed by Fyers symbol like StockQuote, so index bars are kept
+    too. Bars are written as they complete by the live candle aggregator
+    (services/candles.py), and bars it missed or only partly saw are filled
+    in from the day-partitioned tick tables (services/tick_partitions.py).
+    """
+    symbol = models.CharField(max_length=50)
+    resolution = models.PositiveSmallIntegerField()  # Minutes
+    start = models.DateTimeField()
+    open_price = models.DecimalField(max_digits=10, decimal_places=2)
+    high_price = models.DecimalField(max_digits=10, decimal_places=2)
+    low_price = models.DecimalField(max_digits=10, decimal_places=2)
+    close_price = models.DecimalField(max_digits=10, decimal_places=2)
+    volume = models.BigIntegerField(default=0)
+    # Not seen from start to end: the process started mid-bar or stopped before it ended
+    partial = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ['symbol', 'resolution', 'start']
+
+    def __str__(self):
+        return f"{self.symbol} {self.resolution}m {self.start} - Close: {self.close_price}"
+
+    @classmethod
+    def upsert(cls, bars):
+        """Insert or replace many bars in one statement; returns the number written"""
+        bars = list(bars)
+        if bars:
+            cls.objects.bulk_create(
+                bars,
+                update_conflicts=True,
+                unique_fields=['symbol', 'resolution', 'start'],
+                update_fields=['open_price', 'high_price', 'low_price', 'close_price', 'volume', 'partial'],
+            )
+        return len(bars)
+
+    @classmethod
+    def save_bars(cls, bars):
+        """
+        Write bars from the live aggregator: complete bars replace what is
+        stored, partial bars are only inserted where no bar exists yet, so
+        they never overwrite a better one. Returns the number of bars given.
+        """
+        bars = list(bars)
+        cls.upsert(bar for bar in bars if not bar.partial)
+        partial = [bar for bar in bars if bar.partial]
+        if partial:
+            cls.objects.bulk_create(partial, ignore_conflicts=True)
+        return len(bars)
+
+
+class TickRollup(models.Model):
+    """A trading day whose tick partition has been rolled up into IntradayBar rows"""
+    day = models.DateField(unique=True)
+    bars = models.PositiveIntegerField(default=0)
+    rolled_up_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.day} - {self.bars} bars"
+
+class LatestStockPrice(models.Model):
+    """
+    Denormalised current price per stock, so "current price" is a primary
+    key lookup that can be joined to Stock with select_related. Rows are
+    upserted in batches whenever StockPrice or StockQuote rows or live
+    ticks are written;
+    see upsert() and `manage.py rebuild_latest_prices`.
+    """
+    SOURCE_CHOICES = [
+        ('eod', 'End of day'),
+        ('live', 'Live quote'),
+    ]
+
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, primary_key=True, related_name='latest_price')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    change = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    change_percentage = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    volume = models.BigIntegerField(default=0)
+    as_of = models.DateTimeField()
+    source = models.CharField(max_length=4, choices=SOURCE_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.symbol} - {self.price} ({self.as_of})"
+
+    @classmethod
+    def upsert(cls, rows):
+        """
+        Insert or update many rows in one statement, ignoring any row older
+        than what is already stored for its stock.
+        rows: iterable of unsaved LatestStockPrice instances. Returns the
+        number of rows written.
+        """
+        newest = {}
+        for row in rows:
+            current = newest.get(row.stock_id)
+            if current is None or row.as_of >= current.as_of:
+                newest[row.stock_id] = row
+        if not newest:
+            return 0
+
+        stored = dict(cls.objects.filter(stock_id__in=list(newest)).values_list('stock_id', 'as_of'))
+        fresh = [
+            row for stock_id, row in newest.items()
+            if stock_id not in stored or row.as_of >= stored[stock_id]
+        ]
+        now = timezone.now()
+        for row in fresh:
+            row.updated_at = now
+        cls.objects.bulk_create(
+            fresh,
+            update_conflicts=True,
+            unique_fields=['stock'],
+            update_fields=['price', 'change', 'change_percentage', 'volume', 'as_of', 'source', 'updated_at'],
+        )
+        # Panels showing these prices are stale now
+        invalidate_on_commit([price_tag(row.stock_id) for row in fresh])
+        return len(fresh)
+
+    @classmethod
+    def from_stock_price(cls, stock_price):
+        """Unsaved row for an end-of-day bar"""
+        as_of = timezone.make_aware(datetime.combine(stock_price.date, datetime.min.time()))
+        return cls(
+            stock_id=stock_price.stock_id,
+            price=stock_price.close_price,
+            change=stock_price.price_change,
+            change_percentage=round(Decimal(stock_price.price_change_percentage), 2),
+            volume=stock_price.volume,
+            as_of=as_of,
+            source='eod',
+        )
+
+    @classmethod
+    def upsert_from_prices(cls, stock_prices):
+        """Upsert from StockPrice rows"""
+        return cls.upsert(cls.from_stock_price(price) for price in stock_prices)
+
+    @classmethod
+    def upsert_from_quotes(cls, quotes):
+        """
+        Upsert from live quotes: StockQuote instances, Tick records or tick
+        dicts keyed by Fyers symbol. Quotes for instruments without a Stock are skipped.
+        """
+        from .services.symbols import to_stock_symbol
+
+        def field(quote, name, default=None):
+            if isinstance(quote, dict):
+                return quote.get(name, default)
+            return getattr(quote, name, default)
+
+        by_symbol = {}
+        for quote in quotes:
+            symbol = to_stock_symbol(field(quote, 'symbol'))
+            if symbol:
+                by_symbol.setdefault(symbol, []).append(quote)
+        if not by_symbol:
+            return 0
+
+        stock_ids = dict(Stock.objects.filter(symbol__in=list(by_symbol)).values_list('symbol', 'id'))
+        rows = []
+        for symbol, symbol_quotes in by_symbol.items():
+            if symbol not in stock_ids:
+                continue
+            for quote in symbol_quotes:
+                rows.append(cls(
+                    stock_id=stock_ids[symbol],
+                    price=field(quote, 'ltp'),
+                    change=field(quote, 'change', 0),
+                    change_percentage=field(quote, 'change_percentage', 0),
+                    volume=field(quote, 'volume', 0),
+                    as_of=field(quote, 'timestamp') or timezone.now(),
+                    source='live',
+                ))
+        return cls.upsert(rows)
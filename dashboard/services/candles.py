@@ -0,0 +1,281 @@
+import threading
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from .ticks import as_tick
+from .tick_partitions import TRADING_TIME_ZONE, trading_day, day_bounds
+
+logger = logging.getLogger(__name__)
+
+# Bar sizes in minutes built from the tick stream
+INTRADAY_RESOLUTIONS = tuple(getattr(settings, 'INTRADAY_RESOLUTIONS', (1, 5, 15)))
+
+# History timeframes (as accepted by FyersClient.get_historical_data) served from local bars
+INTRADAY_TIMEFRAMES = {f'{minutes}M': minutes for minutes in INTRADAY_RESOLUTIONS}
+
+
+def _floor(local, minutes):
+    """Start of the bar of `minutes` containing a time on the exchange's clock, aligned to midnight"""
+    minute = local.hour * 60 + local.minute
+    minute -= minute % minutes
+    return local.replace(hour=minute // 60, minute=minute % 60, second=0, microsecond=0)
+
+
+class Candle:
+    """Open/high/low/close/volume accumulator for one bar of one symbol"""
+    __slots__ = ('symbol', 'resolution', 'start', 'open', 'high', 'low', 'close', 'volume', 'base', 'partial')
+
+    def __init__(self, symbol, resolution, start, price, base, partial=False):
+        self.symbol = symbol
+        self.resolution = resolution
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.volume = 0
+        # Cumulative day volume before the bar's first tick
+        self.base = base
+        self.partial = partial
+
+    def update(self, price, cumulative):
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.close = price
+        self.volume = max(self.volume, cumulative - self.base)
+
+    def to_bar(self):
+        from ..models import IntradayBar
+
+        return IntradayBar(
+            symbol=self.symbol, resolution=self.resolution, start=self.start,
+            open_price=self.open, high_price=self.high, low_price=self.low,
+            close_price=self.close, volume=self.volume, partial=self.partial,
+        )
+
+
+class CandleAggregator:
+    """
+    Build intraday OHLCV bars of several resolutions at once from live ticks.
+
+    offer() is called with every decoded tick, before coalescing, so bars
+    see each price. It keeps one Candle per symbol, resolution and bar
+    start. A bar stays open for late_tolerance seconds after it ends, so a
+    tick that arrives late still lands in the right bar; later ticks for a
+    completed bar are counted and dropped. Tick volume is the day's
+    cumulative volume, so a bar's volume is its growth during the bar.
+
+    The first tick of a symbol seen on a day may arrive mid-session, after
+    a restart, so it only seeds the cumulative volume and the bars it opens
+    are marked partial, as are the bars still open when stop() writes them.
+    With from_day_start the first tick is taken as the day's first trade
+    instead, for ticks replayed from a whole day's partition.
+
+    A background thread completes due bars and writes them with
+    IntradayBar.save_bars in batches of batch_size every flush_interval
+    seconds; partial bars never overwrite a stored bar.
+    """
+
+    def __init__(self, resolutions=INTRADAY_RESOLUTIONS, late_tolerance=2.0, flush_interval=2.0, batch_size=500,
+                 sink=None, from_day_start=False):
+        self.resolutions = tuple(sorted(resolutions))
+        self.late_tolerance = timedelta(seconds=late_tolerance)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.sink = sink
+        self.from_day_start = from_day_start
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._open = {}           # (symbol, resolution) -> {start: Candle}
+        self._closed_before = {}  # (symbol, resolution) -> end of the last completed bar
+        self._cumulative = {}     # symbol -> (trading day, highest cumulative volume)
+        self._completed = []
+
+        self.ticks = 0
+        self.late_dropped = 0
+        self.bars_written = 0
+
+    def offer(self, tick):
+        """Add a tick to the open bar of every resolution"""
+        tick = as_tick(tick)
+        local = tick.timestamp.astimezone(TRADING_TIME_ZONE)
+        day = local.date()
+        with self._lock:
+            self.ticks += 1
+            state = self._cumulative.get(tick.symbol)
+            if state is not None and state[0] == day:
+                base, partial = state[1], False
+            elif self.from_day_start:
+                base, partial = 0, False
+            else:
+                # Trades before this tick may belong to a bar this process never saw
+                base, partial = tick.volume, True
+            self._cumulative[tick.symbol] = (day, max(base, tick.volume))
+            for resolution in self.resolutions:
+                key = (tick.symbol, resolution)
+                start = _floor(local, resolution)
+                closed_before = self._closed_before.get(key)
+                if closed_before is not None and start < closed_before:
+                    self.late_dropped += 1
+                    continue
+                bars = self._open.get(key)
+                if bars is None:
+                    bars = self._open[key] = {}
+                candle = bars.get(start)
+                if candle is None:
+                    candle = bars[start] = Candle(tick.symbol, resolution, start, tick.ltp, base, partial)
+                candle.update(tick.ltp, tick.volume)
+
+    def roll(self, now=None):
+        """Complete the bars that ended more than late_tolerance ago; returns how many"""
+        now = now or timezone.now()
+        completed = 0
+        with self._lock:
+            for key in list(self._open):
+                bars = self._open[key]
+                step = timedelta(minutes=key[1])
+                for start in sorted(bars):
+                    if start + step + self.late_tolerance > now:
+                        break
+                    self._completed.append(bars.pop(start))
+                    self._closed_before[key] = start + step
+                    completed += 1
+                if not bars:
+                    del self._open[key]
+        return completed
+
+    def complete_all(self, cut=False):
+        """
+        Complete every open bar and return all completed bars as unsaved
+        IntradayBar instances. With cut the open bars are marked partial,
+        as they end before their time is up.
+        """
+        with self._lock:
+            for bars in self._open.values():
+                for candle in bars.values():
+                    candle.partial = candle.partial or cut
+                self._completed.extend(bars.values())
+            self._open = {}
+            completed, self._completed = self._completed, []
+        return [candle.to_bar() for candle in completed]
+
+    def open_bars(self, symbol, resolution):
+        """Snapshot of the bars of a symbol still being built, oldest first"""
+        with self._lock:
+            bars = self._open.get((symbol, resolution), {})
+            return [
+                (candle.start, candle.open, candle.high, candle.low, candle.close, candle.volume)
+                for _, candle in sorted(bars.items())
+            ]
+
+    def _write(self, bars):
+        if self.sink is None:
+            from ..models import IntradayBar
+            self.sink = IntradayBar.save_bars
+        for start in range(0, len(bars), self.batch_size):
+            batch = bars[start:start + self.batch_size]
+            try:
+                self.sink(batch)
+                self.bars_written += len(batch)
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} intraday bars: {str(e)}")
+
+    def flush(self):
+        """Write the completed bars; returns how many were taken"""
+        with self._lock:
+            completed, self._completed = self._completed, []
+        self._write([candle.to_bar() for candle in completed])
+        return len(completed)
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            close_old_connections()
+            self.roll()
+            self.flush()
+        close_old_connections()
+
+    def start(self):
+        """Start the periodic roll-and-flush thread"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='candle-aggregator')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the thread and write every bar, including those still open (as partial bars)"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self._write(self.complete_all(cut=True))
+
+    def stats(self):
+        """Counters for monitoring the aggregator"""
+        with self._lock:
+            return {
+                'ticks': self.ticks,
+                'open_bars': sum(len(bars) for bars in self._open.values()),
+                'pending_bars': len(self._completed),
+                'bars_written': self.bars_written,
+                'late_dropped': self.late_dropped,
+            }
+
+
+def bars_from_ticks(ticks, resolutions=INTRADAY_RESOLUTIONS):
+    """
+    IntradayBar instances for ticks sorted by symbol, then time, as used to
+    roll up stored ticks. Bars are emitted a symbol at a time so only one
+    symbol's day is held in memory.
+    """
+    aggregator = CandleAggregator(resolutions, from_day_start=True)
+    symbol = None
+    for tick in ticks:
+        if tick.symbol != symbol:
+            yield from aggregator.complete_all()
+            symbol = tick.symbol
+        aggregator.offer(tick)
+    yield from aggregator.complete_all()
+
+
+def intraday_candles(symbol, resolution, start=None, end=None, aggregator=None):
+    """
+    Bars of `resolution` minutes for a Fyers symbol starting in [start, end),
+    oldest first, as Fyers history candles [epoch, open, high, low, close,
+    volume]. Stored IntradayBar rows are merged with the bars this process
+    is still building. Defaults to the current trading day. Raises
+    ValueError for a resolution that is not aggregated.
+    """
+    from ..models import IntradayBar
+
+    if resolution not in INTRADAY_RESOLUTIONS:
+        raise ValueError(f"Unsupported intraday resolution: {resolution}")
+    aggregator = aggregator or candle_aggregator
+    now = timezone.now()
+    if start is None:
+        start = day_bounds(trading_day(now))[0]
+    if end is None:
+        end = now + timedelta(minutes=resolution)
+
+    bars = {
+        row[0]: row for row in IntradayBar.objects.filter(
+            symbol=symbol, resolution=resolution, start__gte=start, start__lt=end
+        ).order_by('start').values_list('start', 'open_price', 'high_price', 'low_price', 'close_price', 'volume')
+    }
+    for row in aggregator.open_bars(symbol, resolution):
+        if start <= row[0] < end:
+            bars[row[0]] = row
+    return [
+        [int(bar_time.timestamp()), float(o), float(h), float(l), float(c), int(v)]
+        for bar_time, (_, o, h, l, c, v) in sorted(bars.items())
+    ]
+
+
+# Global instance
+candle_aggregator = CandleAggregator(
+    late_tolerance=getattr(settings, 'CANDLE_LATE_TOLERANCE', 2.0),
+    flush_interval=getattr(settings, 'CANDLE_FLUSH_INTERVAL', 2.0),
+)
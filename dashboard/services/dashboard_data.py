@@ -0,0 +1,170 @@
+from decimal import Decimal
+from datetime import timedelta
+from django.db.models import Sum
+from django.http import Http404
+from django.utils import timezone
+from ..models import Portfolio, PortfolioHolding, Transaction, Watchlist, AssetAllocation, PortfolioPerformance
+from .panel_cache import (
+    get_panel, panel_key, portfolio_tag, transactions_tag, allocation_tag,
+    performance_tag, stock_tag, price_tag, watchlists_tag
+)
+
+# Queries the dashboard view may issue, including the two the auth
+# middleware makes for the session and user. Checked by the test suite.
+DASHBOARD_QUERY_BUDGET = 7
+
+PERFORMANCE_HISTORY_DAYS = 30
+RECENT_TRANSACTIONS = 5
+
+
+# Panels are cached per user and rebuilt only when one of their tags is
+# invalidated by dashboard.signals, the valuation engine or a price update.
+
+def performance_panel(user, portfolio_id):
+    """The last 30 performance rows, newest first"""
+    def build():
+        rows = list(
+            PortfolioPerformance.objects.filter(portfolio_id=portfolio_id).order_by('-date')[:PERFORMANCE_HISTORY_DAYS]
+        )
+        return rows, [performance_tag(portfolio_id)]
+    return get_panel(panel_key(user.pk, 'performance'), build)
+
+
+def overview_panel(user):
+    """Portfolio totals, returns and daily change"""
+    today = timezone.localdate()
+    yesterday = today - timedelta(days=1)
+
+    def build():
+        portfolio = (
+            Portfolio.objects.filter(user=user)
+            .annotate(total_investments=Sum('holdings__total_invested'))
+            .first()
+        )
+        if portfolio is None:
+            raise Http404('No Portfolio matches the given query.')
+
+        total_value = portfolio.total_value
+        total_investments = portfolio.total_investments or Decimal('0')
+
+        # Calculate total returns
+        total_returns = total_value - total_investments
+        returns_percentage = (total_returns / total_investments * 100) if total_investments > 0 else 0
+
+        # Get daily change from the performance history
+        performance_by_date = {p.date: p for p in performance_panel(user, portfolio.pk)}
+        today_performance = performance_by_date.get(today)
+        yesterday_performance = performance_by_date.get(yesterday)
+        daily_change = Decimal('0')
+        if today_performance and yesterday_performance:
+            daily_change = today_performance.daily_change_percentage
+
+        overview = {
+            'portfolio_id': portfolio.pk,
+            'total_value': total_value,
+            'cash_balance': portfolio.cash_balance,
+            'total_investments': total_investments,
+            'total_returns': total_returns,
+            'returns_percentage': returns_percentage,
+            'daily_change': daily_change,
+        }
+        tags = [
+            portfolio_tag(portfolio.pk),
+            performance_tag(portfolio.pk, today),
+            performance_tag(portfolio.pk, yesterday),
+        ]
+        return overview, tags
+
+    # Keyed by date as well, since the daily change rolls over at midnight
+    return get_panel(panel_key(user.pk, 'overview', today.isoformat()), build)
+
+
+def _transactions(portfolio_id, limit=None):
+    transactions = Transaction.objects.filter(portfolio_id=portfolio_id).select_related('stock').order_by('-date')
+    if limit is not None:
+        transactions = transactions[:limit]
+    transactions = list(transactions)
+    tags = [transactions_tag(portfolio_id)] + [stock_tag(stock_id) for stock_id in {t.stock_id for t in transactions}]
+    return transactions, tags
+
+
+def recent_transactions_panel(user, portfolio_id):
+    """The 5 most recent transactions with their stocks"""
+    return get_panel(
+        panel_key(user.pk, 'recent_transactions'),
+        lambda: _transactions(portfolio_id, RECENT_TRANSACTIONS)
+    )
+
+
+def transaction_history_panel(user, portfolio_id):
+    """Every transaction of the portfolio, newest first"""
+    return get_panel(panel_key(user.pk, 'transaction_history'), lambda: _transactions(portfolio_id))
+
+
+def allocation_panel(user, portfolio_id):
+    """Asset allocation values for the allocation chart"""
+    def build():
+        values = AssetAllocation.objects.filter(portfolio_id=portfolio_id).values_list('value', flat=True)
+        return [float(value) for value in values], [allocation_tag(portfolio_id)]
+    return get_panel(panel_key(user.pk, 'allocation'), build)
+
+
+def holdings_panel(user, portfolio_id):
+    """Holdings with their stocks and latest prices"""
+    def build():
+        holdings = list(
+            PortfolioHolding.objects.filter(portfolio_id=portfolio_id).select_related('stock__latest_price')
+        )
+        tags = [portfolio_tag(portfolio_id)]
+        for holding in holdings:
+            tags += [stock_tag(holding.stock_id), price_tag(holding.stock_id)]
+        return holdings, tags
+    return get_panel(panel_key(user.pk, 'holdings'), build)
+
+
+def watchlists_panel(user):
+    """The user's watchlists annotated with their stock counts"""
+    def build():
+        watchlists = list(Watchlist.objects.filter(created_by=user).with_counts())
+        return watchlists, [watchlists_tag(user.pk)]
+    return get_panel(panel_key(user.pk, 'watchlists'), build)
+
+
+def performance_chart_data(user):
+    """Chart labels and values for the performance history, oldest first"""
+    portfolio_id = overview_panel(user)['portfolio_id']
+    performance_history = list(reversed(performance_panel(user, portfolio_id)))
+    return (
+        [p.date.strftime('%Y-%m-%d') for p in performance_history],
+        [float(p.total_value) for p in performance_history],
+    )
+
+
+def build_dashboard_context(user):
+    """
+    Assemble the dashboard context from cached panels. With every panel
+    cached this needs no queries; cold, it needs a fixed number that does
+    not grow with the number of holdings, transactions, watchlists or stocks:
+
+    1. portfolio with the invested total aggregated in the same query
+    2. the last 30 performance rows (today's and yesterday's are taken from them)
+    3. the 5 most recent transactions with their stocks
+    4. asset allocations
+    5. the user's watchlists with annotated stock counts
+
+    The stock picker is not part of the context; the create watchlist
+    modal loads it page by page from the stock picker API.
+    """
+    overview = overview_panel(user)
+    portfolio_id = overview['portfolio_id']
+    performance_labels, performance_data = performance_chart_data(user)
+
+    context = {key: value for key, value in overview.items() if key != 'portfolio_id'}
+    context.update({
+        'recent_transactions': recent_transactions_panel(user, portfolio_id),
+        'allocation_data': allocation_panel(user, portfolio_id),
+        'performance_labels': performance_labels,
+        'performance_data': performance_data,
+        'watchlists': watchlists_panel(user),
+    })
+    return context
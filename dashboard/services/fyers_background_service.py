@@ -1,17 +1,21 @@
 import threading
-import time
 import logging
 from fyers_apiv2 import FyersModel
 import websocket
 import json
 import os
 from django.conf import settings
-from ..models import StockQuote
-from django.utils import timezone
-from django.core.cache import cache
+from .tick_coalescer import TickCoalescer
+from .valuation import valuation_engine
+from .subscriptions import symbol_subscriptions
+from .market_feed import subscription_frame, default_tick_buffer, publish_quotes
+from .ticks import decode_tick
+from .candles import candle_aggregator
+from .ws_supervisor import ConnectionSupervisor
 
 logger = logging.getLogger(__name__)
 
+
 class FyersBackgroundService:
     _instance = None
     _lock = threading.Lock()
@@ -27,21 +31,22 @@ class FyersBackgroundService:
             self.fyers = None
             self.ws = None
             self.is_connected = False
-            self.symbols = [
-                "NSE:NIFTY50-INDEX",  # NIFTY 50 Index
-                "NSE:NIFTYBANK-INDEX",  # Bank NIFTY Index
-                # Add more symbols as needed
-                "NSE:RELIANCE-EQ",
-                "NSE:TCS-EQ",
-                "NSE:HDFCBANK-EQ",
-                "NSE:INFY-EQ",
-                "NSE:ICICIBANK-EQ",
-                "NSE:HINDUNILVR-EQ",
-                "NSE:ITC-EQ",
-                "NSE:SBIN-EQ",
-                "NSE:BHARTIARTL-EQ",
-                "NSE:KOTAKBANK-EQ"
-            ]
+            self.tick_buffer = default_tick_buffer()
+            self.coalescer = TickCoalescer(
+                self.publish_quotes,
+                interval=getattr(settings, 'QUOTE_COALESCE_INTERVAL', 0.25),
+            )
+            # Sole owner of the websocket: reconnects with backoff and
+            # closes connections that go quiet
+            ping_interval = getattr(settings, 'FYERS_WS_PING_INTERVAL', 10.0)
+            self.supervisor = ConnectionSupervisor(
+                self._create_websocket,
+                run_kwargs={'ping_interval': ping_interval, 'ping_timeout': ping_interval / 2} if ping_interval else {},
+                base_delay=getattr(settings, 'FYERS_WS_RECONNECT_BASE_DELAY', 1.0),
+                max_delay=getattr(settings, 'FYERS_WS_RECONNECT_MAX_DELAY', 60.0),
+                heartbeat_timeout=getattr(settings, 'FYERS_WS_HEARTBEAT_TIMEOUT', 30.0),
+                name='fyers-websocket',
+            )
             self.initialized = True
 
     def initialize_fyers(self):
@@ -61,102 +66,90 @@ class FyersBackgroundService:
             return False
 
     def connect_websocket(self):
-        """Establish WebSocket connection with Fyers"""
+        """Hand the WebSocket connection to the supervisor"""
+        self.supervisor.start()
+        return True
+
+    def _create_websocket(self):
+        """Build a new WebSocket; called by the supervisor for each (re)connect"""
+        if not self.initialize_fyers():
+            raise RuntimeError("Fyers client could not be initialized")
+
         def on_message(ws, message):
-            try:
-                data = json.loads(message)
-                self.process_market_data(data)
-            except Exception as e:
-                logger.error(f"Error processing message: {str(e)}")
+            self.supervisor.touch()
+            self.process_market_data(message)
 
+        def on_pong(ws, message):
+            self.supervisor.touch()
+
+        # Error and close only record the disconnect; the supervisor
+        # notices run_forever returning and schedules the reconnect
         def on_error(ws, error):
             logger.error(f"WebSocket error: {str(error)}")
             self.is_connected = False
-            self._reconnect()
+            symbol_subscriptions.on_disconnect()
 
         def on_close(ws, close_status_code, close_msg):
             logger.info("WebSocket connection closed")
             self.is_connected = False
-            self._reconnect()
+            symbol_subscriptions.on_disconnect()
 
         def on_open(ws):
             logger.info("WebSocket connection established")
             self.is_connected = True
-            # Subscribe to symbols
-            subscribe_data = {
-                "symbol": self.symbols,
-                "dataType": "symbolUpdate"
-            }
-            ws.send(json.dumps(subscribe_data))
-
-        try:
-            self.ws = websocket.WebSocketApp(
-                f"wss://websocket.fyers.in/socket/v2?token={self.fyers.token}",
-                on_message=on_message,
-                on_error=on_error,
-                on_close=on_close,
-                on_open=on_open
+            # Subscribe to every symbol currently in demand; later changes
+            # are sent incrementally by the subscription manager
+            symbol_subscriptions.on_connect(
+                lambda action, symbols: ws.send(json.dumps(subscription_frame(action, symbols)))
             )
-            
-            # Start WebSocket connection in a separate thread
-            ws_thread = threading.Thread(target=self.ws.run_forever)
-            ws_thread.daemon = True
-            ws_thread.start()
-            
-        except Exception as e:
-            logger.error(f"Error connecting to WebSocket: {str(e)}")
-            return False
-        
-        return True
 
-    def process_market_data(self, data):
-        """Process incoming market data"""
+        self.ws = websocket.WebSocketApp(
+            f"wss://websocket.fyers.in/socket/v2?token={self.fyers.token}",
+            on_message=on_message,
+            on_error=on_error,
+            on_close=on_close,
+            on_open=on_open,
+            on_pong=on_pong
+        )
+        return self.ws
+
+    def process_market_data(self, message):
+        """Decode a raw market data message and queue its tick"""
         try:
-            # Update cache with latest quotes
-            cache_key = f"stock_quote_{data['symbol']}"
-            cache.set(cache_key, data, timeout=300)  # Cache for 5 minutes
-
-            # Store in database (you might want to batch this for better performance)
-            StockQuote.objects.create(
-                symbol=data['symbol'],
-                ltp=data.get('ltp', 0),
-                change=data.get('change', 0),
-                change_percentage=data.get('change_percentage', 0),
-                volume=data.get('volume', 0),
-                timestamp=timezone.now()
-            )
+            tick = decode_tick(message)
+            # Every tick goes into the intraday bars; cache and database
+            # writes happen once per symbol per interval in publish_quotes
+            candle_aggregator.offer(tick)
+            self.coalescer.offer(tick)
         except Exception as e:
             logger.error(f"Error processing market data: {str(e)}")
 
-    def _reconnect(self, max_retries=5, delay=5):
-        """Attempt to reconnect the WebSocket"""
-        retries = 0
-        while not self.is_connected and retries < max_retries:
-            logger.info(f"Attempting to reconnect (attempt {retries + 1}/{max_retries})")
-            try:
-                if self.ws:
-                    self.ws.close()
-                time.sleep(delay)
-                success = self.initialize_fyers() and self.connect_websocket()
-                if success:
-                    logger.info("Successfully reconnected")
-                    break
-            except Exception as e:
-                logger.error(f"Reconnection attempt failed: {str(e)}")
-            retries += 1
+    def publish_quotes(self, ticks):
+        """Write coalesced ticks to the quote table, the cache and the batched database writer"""
+        publish_quotes(ticks, self.tick_buffer)
 
     def start(self):
         """Start the background service"""
         if self.initialize_fyers():
+            self.tick_buffer.start()
+            self.coalescer.start()
+            valuation_engine.start()
+            candle_aggregator.start()
+            symbol_subscriptions.start()
             return self.connect_websocket()
         return False
 
     def stop(self):
         """Stop the background service"""
         try:
-            if self.ws:
-                self.ws.close()
+            self.supervisor.stop()
             self.is_connected = False
+            symbol_subscriptions.stop()
+            symbol_subscriptions.on_disconnect()
+            self.coalescer.stop()
+            self.tick_buffer.stop()
+            valuation_engine.stop()
+            candle_aggregator.stop()
             logger.info("Background service stopped")
         except Exception as e:
             logger.error(f"Error stopping service: {str(e)}")
@@ -0,0 +1,160 @@
+import os
+import time
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from .fyers_config import FYERS_APP_ID, FYERS_DATA_API_URL
+
+logger = logging.getLogger(__name__)
+
+
+class FyersClientError(Exception):
+    """Raised when a Fyers REST call fails"""
+
+
+class _InflightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class FyersClient:
+    """
+    Thread-safe REST client for Fyers market data, shared by the whole process.
+
+    All calls go through one requests.Session, so TLS connections are kept
+    alive and reused across requests. At most max_concurrency calls are sent
+    upstream at once, and concurrent calls with identical arguments are
+    deduplicated: the first caller makes the request and the others wait for
+    its result.
+    """
+
+    def __init__(self, base_url=None, app_id=None, access_token=None,
+                 max_concurrency=8, pool_size=None, timeout=10):
+        self.base_url = (base_url or FYERS_DATA_API_URL).rstrip('/')
+        self.app_id = app_id if app_id is not None else FYERS_APP_ID
+        self.access_token = access_token if access_token is not None else os.getenv('FYERS_ACCESS_TOKEN')
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+        self.upstream_calls = 0
+        self.shared_calls = 0
+
+    def set_access_token(self, access_token):
+        """Use a new access token for subsequent requests"""
+        self.access_token = access_token
+
+    def _request(self, path, params):
+        """Send one GET request upstream, respecting the concurrency limit"""
+        if not self.access_token:
+            raise FyersClientError("No access token found. Please set FYERS_ACCESS_TOKEN in environment")
+        headers = {'Authorization': f"{self.app_id}:{self.access_token}"}
+        with self._semaphore:
+            self.upstream_calls += 1
+            try:
+                response = self.session.get(
+                    f"{self.base_url}/{path}/", params=params, headers=headers, timeout=self.timeout
+                )
+                response.raise_for_status()
+                return response.json()
+            except (requests.RequestException, ValueError) as e:
+                raise FyersClientError(f"Fyers request to {path} failed: {str(e)}") from e
+
+    def _single_flight(self, key, func):
+        """Run func once for all concurrent callers with the same key"""
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+            else:
+                self.shared_calls += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def get_quotes(self, symbols):
+        """
+        Get quotes for multiple symbols
+        :param symbols: List of symbols (e.g., ['NSE:RELIANCE-EQ', 'NSE:TCS-EQ'])
+        :return: Raw Fyers quotes response
+        """
+        symbols = ",".join(symbols)
+        return self._single_flight(
+            ('quotes', symbols),
+            lambda: self._request('quotes', {'symbols': symbols})
+        )
+
+    def get_historical_data(self, symbol, timeframe="1D", from_date=None, to_date=None):
+        """
+        Get historical data for a symbol
+        timeframe: "1D", "1H", "15M", "5M", "1M"
+        from_date/to_date: epoch seconds, defaulting to the last 30 days
+        """
+        if not from_date:
+            from_date = int(time.time()) - (30 * 24 * 60 * 60)  # Last 30 days
+        if not to_date:
+            to_date = int(time.time())
+
+        params = {
+            "symbol": symbol,
+            "resolution": timeframe,
+            "date_format": "0",
+            "range_from": from_date,
+            "range_to": to_date,
+            "cont_flag": "1"
+        }
+        return self._single_flight(
+            ('history', symbol, timeframe, from_date, to_date),
+            lambda: self._request('history', params)
+        )
+
+    def stats(self):
+        """Counters for monitoring the client"""
+        return {
+            'upstream_calls': self.upstream_calls,
+            'shared_calls': self.shared_calls,
+            'inflight': len(self._inflight),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_fyers_client():
+    """Return the process-wide FyersClient, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = FyersClient(
+                    max_concurrency=getattr(settings, 'FYERS_CLIENT_MAX_CONCURRENCY', 8),
+                    timeout=getattr(settings, 'FYERS_CLIENT_TIMEOUT', 10),
+                )
+    return _client
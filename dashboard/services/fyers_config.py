@@ -10,4 +10,5 @@ FYERS_REDIRECT_URI = os.getenv('FYERS_REDIRECT_URI', 'http://localhost:8000/fyer
 
 # Fyers API Endpoints
 FYERS_API_URL = "https://api.fyers.in/api/v2"
+FYERS_DATA_API_URL = os.getenv('FYERS_DATA_API_URL', "https://api.fyers.in/data-rest/v2")
 FYERS_WEBSOCKET_URL = "wss://api.fyers.in/websocket/v1" 
\ No newline at end of file
@@ -3,10 +3,10 @@ from fyers_apiv2.accessToken import accessToken
 from fyers_config import FYERS_APP_ID, FYERS_SECRET_KEY, FYERS_REDIRECT_URI
 import websocket
 import json
-import threading
 import time
 from datetime import datetime
 import logging
+from .ws_supervisor import ConnectionSupervisor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,6 +15,8 @@ class FyersService:
     def __init__(self):
         self.fyers = None
         self.ws = None
+        self.supervisor = None
+        self.symbols = []
         self.session = None
         self.is_connected = False
         self.callbacks = []
@@ -53,7 +55,22 @@ class FyersService:
         Connect to Fyers WebSocket for live market data
         symbols: List of symbols to subscribe to (e.g., ["NSE:SBIN-EQ", "NSE:RELIANCE-EQ"])
         """
+        self.symbols = list(symbols)
+        if self.supervisor is None:
+            self.supervisor = ConnectionSupervisor(
+                self._create_websocket,
+                run_kwargs={'ping_interval': 10, 'ping_timeout': 5},
+                name='fyers-service-websocket',
+            )
+            self.supervisor.start()
+        elif self.ws and self.is_connected:
+            # Already connected: subscribe the new symbols on the live socket
+            self.ws.send(json.dumps({"symbol": self.symbols, "dataType": "symbolUpdate"}))
+
+    def _create_websocket(self):
+        """Build a new WebSocket; called by the supervisor for each (re)connect"""
         def on_message(ws, message):
+            self.supervisor.touch()
             try:
                 data = json.loads(message)
                 # Process the message and notify callbacks
@@ -62,60 +79,37 @@ class FyersService:
             except Exception as e:
                 logger.error(f"Error processing websocket message: {str(e)}")
 
+        def on_pong(ws, message):
+            self.supervisor.touch()
+
+        # The supervisor reconnects once run_forever returns
         def on_error(ws, error):
             logger.error(f"WebSocket error: {str(error)}")
             self.is_connected = False
-            self._reconnect()
 
         def on_close(ws, close_status_code, close_msg):
             logger.info("WebSocket connection closed")
             self.is_connected = False
-            self._reconnect()
 
         def on_open(ws):
             logger.info("WebSocket connection established")
             self.is_connected = True
-            # Subscribe to symbols
+            # Subscribe (again, after a reconnect) to the requested symbols
             subscribe_data = {
-                "symbol": symbols,
+                "symbol": self.symbols,
                 "dataType": "symbolUpdate"
             }
             ws.send(json.dumps(subscribe_data))
 
-        try:
-            self.ws = websocket.WebSocketApp(
-                f"wss://websocket.fyers.in/socket/v2?token={self.fyers.token}",
-                on_message=on_message,
-                on_error=on_error,
-                on_close=on_close,
-                on_open=on_open
-            )
-            
-            # Start WebSocket connection in a separate thread
-            ws_thread = threading.Thread(target=self.ws.run_forever)
-            ws_thread.daemon = True
-            ws_thread.start()
-            
-        except Exception as e:
-            logger.error(f"Error connecting to WebSocket: {str(e)}")
-            raise
-
-    def _reconnect(self, max_retries=5, delay=5):
-        """Attempt to reconnect the WebSocket"""
-        retries = 0
-        while not self.is_connected and retries < max_retries:
-            logger.info(f"Attempting to reconnect (attempt {retries + 1}/{max_retries})")
-            try:
-                if self.ws:
-                    self.ws.close()
-                time.sleep(delay)
-                self.connect_websocket()
-                if self.is_connected:
-                    logger.info("Successfully reconnected")
-                    break
-            except Exception as e:
-                logger.error(f"Reconnection attempt failed: {str(e)}")
-            retries += 1
+        self.ws = websocket.WebSocketApp(
+            f"wss://websocket.fyers.in/socket/v2?token={self.fyers.token}",
+            on_message=on_message,
+            on_error=on_error,
+            on_close=on_close,
+            on_open=on_open,
+            on_pong=on_pong
+        )
+        return self.ws
 
     def add_data_callback(self, callback):
         """Add a callback function to handle incoming market data"""
@@ -181,8 +175,9 @@ class FyersService:
     def disconnect(self):
         """Disconnect from WebSocket and cleanup"""
         try:
-            if self.ws:
-                self.ws.close()
+            if self.supervisor:
+                self.supervisor.stop()
+                self.supervisor = None
             self.is_connected = False
             self.callbacks = []
             logger.info("Successfully disconnected from Fyers")
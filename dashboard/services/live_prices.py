@@ -0,0 +1,100 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.utils import timezone
+from .quote_table import quote_table
+from .quote_cache import get_quotes
+from .symbols import to_fyers_symbol
+
+logger = logging.getLogger(__name__)
+
+# Sort keys accepted by sort_by_price, prefixed with '-' for descending
+PRICE_SORT_FIELDS = ('symbol', 'name', 'price', 'change_percentage', 'volume')
+
+
+def _from_quote(quote):
+    return {
+        'price': Decimal(str(quote.get('ltp', 0))),
+        'change': Decimal(str(quote.get('change', 0))),
+        'change_percentage': Decimal(str(quote.get('change_percentage', 0))),
+        'volume': int(quote.get('volume', 0)),
+        'as_of': quote.get('timestamp'),
+        'source': 'live',
+    }
+
+
+def _from_latest(latest):
+    return {
+        'price': latest.price,
+        'change': latest.change,
+        'change_percentage': latest.change_percentage,
+        'volume': latest.volume,
+        'as_of': latest.as_of,
+        'source': latest.source,
+    }
+
+
+def live_quotes(symbols, max_age=None, table=quote_table):
+    """
+    Live quote dicts for Fyers symbols from the quote table, then the quote
+    cache. Quotes older than max_age seconds (QUOTE_MAX_AGE by default)
+    count as misses in both, so a feed that stopped ticking is not served
+    as live.
+    """
+    symbols = list(symbols)
+    if max_age is None:
+        max_age = getattr(settings, 'QUOTE_MAX_AGE', None)
+    quotes = table.get_many(symbols)
+    if max_age is not None:
+        oldest = timezone.now() - timedelta(seconds=max_age)
+        quotes = {symbol: quote for symbol, quote in quotes.items() if quote['timestamp'] >= oldest}
+    misses = [symbol for symbol in symbols if symbol not in quotes]
+    if misses:
+        cached, _ = get_quotes(misses, max_age=max_age)
+        quotes.update(cached)
+    return quotes
+
+
+def live_prices(stocks, max_age=None, table=quote_table):
+    """
+    Latest price dicts for stocks as {stock_id: price}, resolved in bulk:
+    this process's quote table, then one cache.get_many for the rest, then
+    each stock's LatestStockPrice. Select stocks with
+    select_related('latest_price') so the last step needs no query.
+    Stocks with no price anywhere are omitted.
+    """
+    stocks = list(stocks)
+    symbols = {stock.pk: to_fyers_symbol(stock.symbol) for stock in stocks}
+
+    quotes = live_quotes(symbols.values(), max_age=max_age, table=table)
+
+    prices = {}
+    for stock in stocks:
+        quote = quotes.get(symbols[stock.pk])
+        if quote is not None:
+            prices[stock.pk] = _from_quote(quote)
+            continue
+        latest = getattr(stock, 'latest_price', None)
+        if latest is not None:
+            prices[stock.pk] = _from_latest(latest)
+    return prices
+
+
+def sort_by_price(rows, sort):
+    """
+    Sort rows of {'stock', 'latest_price'} by a PRICE_SORT_FIELDS key,
+    '-key' for descending. Rows without a price always sort last.
+    Raises ValueError for an unknown key.
+    """
+    field = sort.lstrip('-')
+    if field not in PRICE_SORT_FIELDS:
+        raise ValueError(f"Unknown sort field: {sort}")
+    descending = sort.startswith('-')
+
+    if field in ('symbol', 'name'):
+        return sorted(rows, key=lambda row: getattr(row['stock'], field), reverse=descending)
+    priced = [row for row in rows if row['latest_price'] is not None]
+    unpriced = [row for row in rows if row['latest_price'] is None]
+    priced.sort(key=lambda row: row['latest_price'][field], reverse=descending)
+    return priced + unpriced
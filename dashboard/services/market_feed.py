@@ -0,0 +1,259 @@
+import json
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from .tick_buffer import TickBuffer
+from .quote_table import quote_table
+from .quote_cache import quote_cache_key, QUOTE_CACHE_TIMEOUT
+from .valuation import valuation_engine
+from .quote_hub import quote_hub
+from .subscriptions import symbol_subscriptions
+from .ws_supervisor import backoff_delay
+from .ticks import decode_tick, as_tick, cache_value
+from .candles import candle_aggregator
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+logger = logging.getLogger(__name__)
+
+FYERS_WS_URL = "wss://websocket.fyers.in/socket/v2?token={token}"
+
+# Cache backends whose entries are private to one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def ingestion_mode():
+    """
+    'thread' when every Django process runs its own websocket thread,
+    'command' when a single run_market_feed process ingests for everyone
+    """
+    return getattr(settings, 'MARKET_DATA_INGESTION', 'thread')
+
+
+def shared_cache():
+    """
+    Whether the default cache is shared between processes. 'command'
+    ingestion depends on it: quotes, push client demand and invalidations
+    travel between run_market_feed and the web workers through the cache.
+    """
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def subscription_frame(action, symbols):
+    """Websocket message subscribing to or unsubscribing from symbols"""
+    return {
+        "symbol": symbols,
+        "dataType": "symbolUpdate",
+        "subscribe": action == 'subscribe',
+    }
+
+
+def default_tick_buffer():
+    return TickBuffer(
+        capacity=getattr(settings, 'TICK_BUFFER_CAPACITY', 10000),
+        batch_size=getattr(settings, 'TICK_BUFFER_BATCH_SIZE', 500),
+        flush_interval=getattr(settings, 'TICK_BUFFER_FLUSH_INTERVAL', 1.0),
+        backpressure=getattr(settings, 'TICK_BUFFER_BACKPRESSURE', 'drop_oldest'),
+    )
+
+
+def publish_quotes(ticks, tick_buffer):
+    """Write coalesced ticks to the quote table, the cache and the batched database writer"""
+    ticks = [as_tick(tick) for tick in ticks]
+
+    # In-process latest-quote table for same-process readers
+    quote_table.update_many(ticks)
+
+    # Update cache with latest quotes; with a shared cache backend this is
+    # also how other processes receive them
+    cache.set_many(
+        {quote_cache_key(tick.symbol): cache_value(tick) for tick in ticks},
+        timeout=QUOTE_CACHE_TIMEOUT
+    )
+
+    # Queue for the batched database writer
+    for tick in ticks:
+        tick_buffer.put(tick)
+
+    # Re-value only the holdings of the ticking stocks
+    valuation_engine.on_prices(ticks)
+
+    # Push to connected browsers
+    quote_hub.publish(ticks)
+
+
+class MarketFeed:
+    """
+    Asyncio ingestion of the upstream websocket for the run_market_feed
+    command, the one process per deployment that talks to Fyers when
+    MARKET_DATA_INGESTION is 'command'.
+
+    One task reads the websocket, adds every tick to the intraday candles
+    and keeps the newest tick per symbol, another publishes them every
+    coalesce_interval seconds and a third refreshes and flushes symbol
+    subscriptions. Publishing writes the shared cache, from which web
+    workers relay quotes to their push clients. Database writes stay on the
+    batching TickBuffer, valuation and candle threads, as the ORM is
+    synchronous.
+
+    Only one connection is open at a time. A connection that delivers
+    nothing for heartbeat_timeout seconds is dropped, and reconnects wait a
+    jittered exponential backoff.
+    """
+
+    def __init__(self, url, connect=None, decode=decode_tick, tick_buffer=None, subscriptions=symbol_subscriptions,
+                 candles=candle_aggregator, coalesce_interval=0.25, base_delay=1.0, max_delay=60.0,
+                 heartbeat_timeout=30.0, ping_interval=10.0, stable_after=60.0):
+        if connect is None:
+            if websockets is None:
+                raise ImportError("The websockets package is required for the market feed")
+            connect = websockets.connect
+        self.url = url
+        self.connect = connect
+        self.decode = decode
+        self.tick_buffer = tick_buffer or default_tick_buffer()
+        self.subscriptions = subscriptions
+        self.candles = candles
+        self.coalesce_interval = coalesce_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.heartbeat_timeout = heartbeat_timeout
+        self.ping_interval = ping_interval
+        self.stable_after = stable_after
+        self._latest = {}
+
+        self.connects = 0
+        self.received = 0
+        self.published = 0
+        self.decode_errors = 0
+
+    def offer(self, message):
+        """Decode a websocket message and keep it as the newest tick for its symbol"""
+        try:
+            tick = self.decode(message)
+        except ValueError:
+            self.decode_errors += 1
+            return
+        self.candles.offer(tick)
+        self._latest[tick.symbol] = tick
+        self.received += 1
+
+    async def drain(self):
+        """Publish the pending ticks; returns how many were published"""
+        if not self._latest:
+            return 0
+        ticks = list(self._latest.values())
+        self._latest = {}
+        try:
+            await sync_to_async(publish_quotes)(ticks, self.tick_buffer)
+            self.published += len(ticks)
+        except Exception as e:
+            logger.error(f"Error publishing {len(ticks)} ticks: {str(e)}")
+        return len(ticks)
+
+    async def _wait(self, stop, timeout):
+        """Sleep for timeout seconds or until stop is set; True if stopped"""
+        try:
+            await asyncio.wait_for(stop.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _publish_loop(self, stop):
+        while not await self._wait(stop, self.coalesce_interval):
+            await self.drain()
+        await self.drain()
+
+    async def _subscription_loop(self, stop):
+        while not await self._wait(stop, self.subscriptions.flush_interval):
+            await sync_to_async(self.subscriptions.refresh)()
+            self.subscriptions.flush()
+
+    async def _write_loop(self, ws, outbox):
+        while True:
+            await ws.send(await outbox.get())
+
+    async def session(self):
+        """Hold one connection open until it closes, errors or goes quiet"""
+        kwargs = {'ping_interval': self.ping_interval, 'ping_timeout': self.ping_interval} if self.ping_interval else {}
+        async with self.connect(self.url, **kwargs) as ws:
+            self.connects += 1
+            logger.info("Market feed connected")
+            loop = asyncio.get_running_loop()
+            outbox = asyncio.Queue()
+
+            def send(action, symbols):
+                # Called from the subscription manager in any thread
+                loop.call_soon_threadsafe(outbox.put_nowait, json.dumps(subscription_frame(action, symbols)))
+
+            writer = asyncio.create_task(self._write_loop(ws, outbox))
+            try:
+                await sync_to_async(self.subscriptions.on_connect)(send)
+                while True:
+                    try:
+                        message = await asyncio.wait_for(ws.recv(), self.heartbeat_timeout or None)
+                    except asyncio.TimeoutError:
+                        logger.warning(f"No market data for {self.heartbeat_timeout}s, reconnecting")
+                        return
+                    self.offer(message)
+            finally:
+                writer.cancel()
+                self.subscriptions.on_disconnect()
+
+    async def run(self, stop):
+        """Ingest until stop (an asyncio.Event) is set"""
+        self.tick_buffer.start()
+        valuation_engine.start()
+        self.candles.start()
+        tasks = [
+            asyncio.create_task(self._publish_loop(stop)),
+            asyncio.create_task(self._subscription_loop(stop)),
+        ]
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        try:
+            while not stop.is_set():
+                started = loop.time()
+                session = asyncio.create_task(self.session())
+                stopped = asyncio.create_task(stop.wait())
+                await asyncio.wait({session, stopped}, return_when=asyncio.FIRST_COMPLETED)
+                stopped.cancel()
+                session.cancel()
+                try:
+                    await session
+                except asyncio.CancelledError:
+                    pass
+                except Exception as e:
+                    logger.error(f"Market feed connection failed: {str(e)}")
+                if stop.is_set():
+                    break
+                if loop.time() - started >= self.stable_after:
+                    attempt = 0
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                attempt += 1
+                logger.info(f"Market feed reconnecting in {delay:.1f}s (attempt {attempt})")
+                await self._wait(stop, delay)
+        finally:
+            stop.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await sync_to_async(self.tick_buffer.stop)()
+            await sync_to_async(valuation_engine.stop)()
+            await sync_to_async(self.candles.stop)()
+
+    def stats(self):
+        """Counters for monitoring the feed"""
+        return {
+            'connects': self.connects,
+            'received': self.received,
+            'published': self.published,
+            'decode_errors': self.decode_errors,
+            'pending': len(self._latest),
+        }
@@ -0,0 +1,238 @@
+import os
+import shutil
+import threading
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Column name -> on-disk dtype. Dates are stored as days since the epoch.
+COLUMNS = {
+    'date': np.dtype('<i8'),
+    'open': np.dtype('<f8'),
+    'high': np.dtype('<f8'),
+    'low': np.dtype('<f8'),
+    'close': np.dtype('<f8'),
+    'adjusted_close': np.dtype('<f8'),
+    'volume': np.dtype('<i8'),
+}
+
+# StockPrice field for each column
+PRICE_FIELDS = {
+    'date': 'date',
+    'open': 'open_price',
+    'high': 'high_price',
+    'low': 'low_price',
+    'close': 'close_price',
+    'adjusted_close': 'adjusted_close',
+    'volume': 'volume',
+}
+
+
+class OHLCVStore:
+    """
+    Columnar on-disk store of daily bars, one directory per stock.
+
+    Every column is a raw little-endian array file under
+    <root>/<stock_id>/<column>.bin holding date-sorted rows. Reads memory-map
+    the files read-only, so loading history for thousands of stocks never
+    builds model instances. New bars are appended to the end of each file;
+    the date column is written last and defines how many rows are complete,
+    so a reader racing an append never sees a partial row.
+
+    <root>/synced_through records the newest StockPrice.updated_at seen by
+    the last full sync, so rows rewritten or backfilled behind a stock's
+    last stored date are detected and that stock is reloaded.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+        self._write_lock = threading.Lock()
+
+    def _stock_dir(self, stock_id):
+        return os.path.join(self.root, str(stock_id))
+
+    def _path(self, stock_id, column):
+        return os.path.join(self._stock_dir(stock_id), f"{column}.bin")
+
+    def _length(self, stock_id):
+        try:
+            return os.path.getsize(self._path(stock_id, 'date')) // COLUMNS['date'].itemsize
+        except OSError:
+            return 0
+
+    def synced_through(self):
+        """StockPrice.updated_at high-water mark of the last full sync, or None"""
+        try:
+            with open(os.path.join(self.root, 'synced_through')) as f:
+                return datetime.fromisoformat(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _set_synced_through(self, mark):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, 'synced_through')
+        with open(f"{path}.tmp", 'w') as f:
+            f.write(mark.isoformat())
+        os.replace(f"{path}.tmp", path)
+
+    def stock_ids(self):
+        """Ids of all stocks with data in the store"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(int(name) for name in os.listdir(self.root) if name.isdigit())
+
+    def read(self, stock_id):
+        """Memory-mapped, read-only column arrays for a stock ({} if it has no data)"""
+        length = self._length(stock_id)
+        if length == 0:
+            return {}
+        return {
+            column: np.memmap(self._path(stock_id, column), dtype=dtype, mode='r', shape=(length,))
+            for column, dtype in COLUMNS.items()
+        }
+
+    def last_date(self, stock_id):
+        """Date of the newest stored bar, or None"""
+        length = self._length(stock_id)
+        if length == 0:
+            return None
+        dates = np.memmap(self._path(stock_id, 'date'), dtype=COLUMNS['date'], mode='r', shape=(length,))
+        return dates[-1].astype('datetime64[D]').item()
+
+    def append(self, stock_id, bars):
+        """
+        Append bars for a stock. bars maps column name to an array-like;
+        dates must be newer than the last stored date and sorted.
+        """
+        dates = np.asarray(bars['date'], dtype='datetime64[D]').astype(COLUMNS['date'])
+        if len(dates) == 0:
+            return 0
+        if np.any(np.diff(dates) <= 0):
+            raise ValueError("Bars must be sorted by date without duplicates")
+
+        with self._write_lock:
+            last = self.last_date(stock_id)
+            if last is not None and dates[0] <= np.datetime64(last, 'D').astype(COLUMNS['date']):
+                raise ValueError(f"Bars for stock {stock_id} must be newer than {last}")
+
+            os.makedirs(self._stock_dir(stock_id), exist_ok=True)
+            length = self._length(stock_id)
+            for column, dtype in COLUMNS.items():
+                if column == 'date':
+                    continue
+                values = np.asarray(bars[column], dtype=dtype)
+                with open(self._path(stock_id, column), 'r+b' if length else 'wb') as f:
+                    # Drop any tail left behind by an interrupted append
+                    f.truncate(length * dtype.itemsize)
+                    f.seek(0, os.SEEK_END)
+                    f.write(values.tobytes())
+            with open(self._path(stock_id, 'date'), 'ab') as f:
+                f.write(dates.tobytes())
+        return len(dates)
+
+    def delete(self, stock_id):
+        """Remove all stored bars for a stock"""
+        with self._write_lock:
+            shutil.rmtree(self._stock_dir(stock_id), ignore_errors=True)
+
+    def get_price_history(self, stock, days=30):
+        """
+        Price history for a stock over the last `days` days as NumPy arrays,
+        the columnar counterpart of StockPrice.get_price_history.
+        'date' is returned as datetime64[D].
+        """
+        stock_id = getattr(stock, 'pk', stock)
+        columns = self.read(stock_id)
+        if not columns:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()}
+
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=days)
+        dates = columns['date']
+        lo = np.searchsorted(dates, np.datetime64(start_date, 'D').astype(np.int64), side='left')
+        hi = np.searchsorted(dates, np.datetime64(end_date, 'D').astype(np.int64), side='right')
+        history = {column: values[lo:hi] for column, values in columns.items()}
+        history['date'] = history['date'].view('datetime64[D]')
+        return history
+
+    def sync_from_db(self, stock_ids=None, rebuild=False, chunk_size=100000):
+        """
+        Append StockPrice bars newer than each stock's last stored date.
+        Stocks with rows changed since the last full sync at or before their
+        last stored date (corrections, backfilled history) are reloaded.
+        With rebuild=True the stored data is discarded and reloaded. Returns
+        the number of bars appended.
+        """
+        from ..models import StockPrice
+
+        # Taken before loading so rows written during the sync are seen next time
+        mark = StockPrice.objects.aggregate(mark=Max('updated_at'))['mark']
+        since = self.synced_through()
+        if rebuild:
+            for stock_id in (stock_ids if stock_ids is not None else self.stock_ids()):
+                self.delete(stock_id)
+        elif since is not None:
+            changed = StockPrice.objects.filter(updated_at__gt=since)
+            if stock_ids is not None:
+                changed = changed.filter(stock_id__in=stock_ids)
+            first_changed = changed.order_by().values('stock_id').annotate(first=Min('date'))
+            for stock_id, first in first_changed.values_list('stock_id', 'first'):
+                last = self.last_date(stock_id)
+                if last is not None and first <= last:
+                    logger.info(f"Reloading stock {stock_id}: bars changed on or before {last}")
+                    self.delete(stock_id)
+
+        # Group stored stocks by their last date so the incremental load is
+        # one query per distinct date (usually one) plus one for new stocks
+        candidates = list(stock_ids) if stock_ids is not None else self.stock_ids()
+        by_last_date = {}
+        for stock_id in candidates:
+            by_last_date.setdefault(self.last_date(stock_id), []).append(stock_id)
+        new_stocks = by_last_date.pop(None, [])
+
+        querysets = [
+            StockPrice.objects.filter(stock_id__in=ids, date__gt=last)
+            for last, ids in by_last_date.items()
+        ]
+        if stock_ids is not None:
+            if new_stocks:
+                querysets.append(StockPrice.objects.filter(stock_id__in=new_stocks))
+        else:
+            querysets.append(StockPrice.objects.exclude(stock_id__in=candidates))
+
+        fields = ['stock_id'] + list(PRICE_FIELDS.values())
+        appended = 0
+        for prices in querysets:
+            rows = prices.order_by('stock_id', 'date').values_list(*fields)
+            df = pd.DataFrame.from_records(rows.iterator(chunk_size=chunk_size), columns=fields)
+            for stock_id, group in df.groupby('stock_id', sort=False):
+                bars = {
+                    column: group[field].to_numpy(dtype=COLUMNS[column])
+                    for column, field in PRICE_FIELDS.items() if column != 'date'
+                }
+                bars['date'] = pd.to_datetime(group['date']).to_numpy().astype('datetime64[D]')
+                appended += self.append(stock_id, bars)
+
+        # A partial sync leaves other stocks' changes unseen, so only a full
+        # one advances the mark
+        if stock_ids is None and mark is not None:
+            self._set_synced_through(mark)
+        return appended
+
+
+_store = None
+
+
+def get_ohlcv_store():
+    """Return the store rooted at settings.OHLCV_STORE_DIR"""
+    global _store
+    root = str(getattr(settings, 'OHLCV_STORE_DIR', os.path.join(settings.BASE_DIR, 'data', 'ohlcv')))
+    if _store is None or _store.root != root:
+        _store = OHLCVStore(root)
+    return _store
@@ -0,0 +1,131 @@
+import uuid
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+PANEL_CACHE_PREFIX = 'panel_'
+PANEL_TAG_PREFIX = 'panel_tag_'
+
+# How long a panel's tag list outlives its entry, so a rebuild after expiry
+# still snapshots tag versions before reading the database
+PANEL_TAGS_TIMEOUT = 24 * 60 * 60
+
+
+# Dependency tags. A cached panel carries the tags of everything it was
+# built from; changing any of those rows invalidates the tag.
+
+def portfolio_tag(portfolio_id):
+    return f"portfolio:{portfolio_id}"
+
+
+def transactions_tag(portfolio_id):
+    return f"transactions:{portfolio_id}"
+
+
+def allocation_tag(portfolio_id):
+    return f"allocation:{portfolio_id}"
+
+
+def performance_tag(portfolio_id, date=None):
+    if date is None:
+        return f"performance:{portfolio_id}"
+    return f"performance:{portfolio_id}:{date.isoformat()}"
+
+
+def stock_tag(stock_id):
+    return f"stock:{stock_id}"
+
+
+def price_tag(stock_id):
+    return f"price:{stock_id}"
+
+
+def watchlists_tag(user_id):
+    return f"watchlists:{user_id}"
+
+
+def panel_key(user_id, panel, *parts):
+    return ':'.join([f"{PANEL_CACHE_PREFIX}{user_id}", panel] + [str(part) for part in parts])
+
+
+def _tag_key(tag):
+    return f"{PANEL_TAG_PREFIX}{tag}"
+
+
+def _tag_versions(tags):
+    """Current version of each tag, creating versions for new tags"""
+    if not tags:
+        return {}
+    keys = {tag: _tag_key(tag) for tag in tags}
+    stored = cache.get_many(list(keys.values()))
+    versions = {}
+    for tag, key in keys.items():
+        version = stored.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(key, version, timeout=None):
+                # Another process created or bumped it first
+                version = cache.get(key, version)
+        versions[tag] = version
+    return versions
+
+
+def _tags_key(key):
+    return f"{key}:tags"
+
+
+def get_panel(key, build, timeout=None):
+    """
+    Return the cached panel for key, building it on a miss.
+
+    build() returns (value, tags). The entry is stored with the version
+    each tag had when it was built and stays valid only while all of them
+    are unchanged, so one invalidate_tags() call drops every panel that
+    depends on a row, for every user, without tracking keys. A missing or
+    evicted tag counts as changed.
+
+    Versions are read before build() for the tags the panel had last time
+    (kept for PANEL_TAGS_TIMEOUT), so an invalidation that lands while the
+    panel is being built leaves the new entry stale rather than serving old
+    rows under the new version.
+    """
+    tags_key = _tags_key(key)
+    cached = cache.get_many([key, tags_key])
+    entry = cached.get(key)
+    if entry is not None:
+        versions = entry['versions']
+        current = cache.get_many([_tag_key(tag) for tag in versions])
+        if all(current.get(_tag_key(tag)) == version for tag, version in versions.items()):
+            return entry['value']
+
+    known = _tag_versions(set(entry['versions']) if entry is not None else set(cached.get(tags_key, ())))
+    value, tags = build()
+    tags = set(tags)
+    versions = {tag: known[tag] for tag in tags if tag in known}
+    versions.update(_tag_versions(tags - set(versions)))
+    if timeout is None:
+        timeout = getattr(settings, 'PANEL_CACHE_TIMEOUT', 300)
+    cache.set(key, {'value': value, 'versions': versions}, timeout=timeout)
+    cache.set(tags_key, sorted(tags), timeout=PANEL_TAGS_TIMEOUT)
+    return value
+
+
+def invalidate_tags(tags):
+    """Invalidate every cached panel that depends on any of the tags"""
+    tags = set(tags)
+    if not tags:
+        return
+    version = uuid.uuid4().hex
+    cache.set_many({_tag_key(tag): version for tag in tags}, timeout=None)
+
+
+def invalidate_on_commit(tags):
+    """
+    Invalidate tags once the current transaction commits, so a concurrent
+    request cannot rebuild a panel from the old rows after invalidation
+    """
+    tags = list(tags)
+    transaction.on_commit(lambda: invalidate_tags(tags))
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import threading
+import logging
+from decimal import Decimal
+from datetime import datetime, time as dt_time, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from .symbols import to_fyers_symbol
+
+logger = logging.getLogger(__name__)
+
+# Fyers serves at most a year of daily candles per request
+FYERS_MAX_DAYS_PER_REQUEST = 365
+MARKET_TIMEZONE = 'Asia/Kolkata'
+CANDLE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+PRICE_UPDATE_FIELDS = ['open_price', 'high_price', 'low_price', 'close_price', 'adjusted_close', 'volume', 'updated_at']
+
+
+class RateLimiter:
+    """Token bucket shared by worker threads: at most `rate` acquisitions per second"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call may be made"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class FyersHistorySource:
+    """Daily candles from the Fyers history API via the shared FyersClient"""
+
+    def __init__(self, client, rate_limiter=None):
+        self.client = client
+        self.rate_limiter = rate_limiter
+
+    def fetch(self, symbol, start_date, end_date):
+        """Candles [[epoch, open, high, low, close, volume], ...] for a stock symbol"""
+        candles = []
+        window_start = start_date
+        while window_start <= end_date:
+            window_end = min(end_date, window_start + timedelta(days=FYERS_MAX_DAYS_PER_REQUEST - 1))
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            response = self.client.get_historical_data(
+                to_fyers_symbol(symbol),
+                timeframe="1D",
+                from_date=_epoch(window_start),
+                to_date=_epoch(window_end + timedelta(days=1)) - 1,
+            )
+            if response.get('s') == 'ok':
+                candles.extend(response.get('candles') or [])
+            elif response.get('s') != 'no_data':
+                raise ValueError(response.get('message') or f"Unexpected history response for {symbol}")
+            window_start = window_end + timedelta(days=1)
+        return candles
+
+
+class FixtureHistorySource:
+    """
+    Daily candles from a local directory, for offline runs. Each stock is
+    <SYMBOL>.json, holding a Fyers history response or a bare candle list,
+    or <SYMBOL>.csv with timestamp (epoch seconds) or date, open, high,
+    low, close and volume columns.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+
+    def fetch(self, symbol, start_date, end_date):
+        json_path = os.path.join(self.directory, f"{symbol}.json")
+        csv_path = os.path.join(self.directory, f"{symbol}.csv")
+        if os.path.exists(json_path):
+            with open(json_path) as f:
+                data = json.load(f)
+            candles = data.get('candles', []) if isinstance(data, dict) else data
+            frame = pd.DataFrame(candles, columns=CANDLE_COLUMNS)
+        elif os.path.exists(csv_path):
+            frame = pd.read_csv(csv_path)
+            frame.columns = frame.columns.str.strip().str.lower()
+            if 'timestamp' not in frame.columns:
+                dates = pd.to_datetime(frame['date']).dt.tz_localize(MARKET_TIMEZONE)
+                frame['timestamp'] = (dates - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+            frame = frame[CANDLE_COLUMNS]
+        else:
+            return []
+
+        dates = _candle_dates(frame['timestamp'].to_numpy())
+        in_range = (dates >= np.datetime64(start_date)) & (dates <= np.datetime64(end_date))
+        return frame[in_range].to_numpy().tolist()
+
+
+def _epoch(date):
+    """Epoch seconds of midnight in the market timezone"""
+    return int(pd.Timestamp(datetime.combine(date, dt_time.min)).tz_localize(MARKET_TIMEZONE).timestamp())
+
+
+def _candle_dates(timestamps):
+    """Trading dates (datetime64[D]) of epoch-second candle timestamps"""
+    local = pd.to_datetime(np.asarray(timestamps, dtype='int64'), unit='s', utc=True).tz_convert(MARKET_TIMEZONE)
+    return local.tz_localize(None).to_numpy().astype('datetime64[D]')
+
+
+def candles_to_rows(stock_id, candles):
+    """
+    Turn a candle list into unsaved StockPrice rows. Conversion and rounding
+    are done on whole arrays; a later candle for the same date wins.
+    """
+    from ..models import StockPrice
+
+    if not len(candles):
+        return []
+    values = np.asarray(candles, dtype='float64')
+    frame = pd.DataFrame({
+        'date': _candle_dates(values[:, 0].astype('int64')),
+        'open': values[:, 1].round(2),
+        'high': values[:, 2].round(2),
+        'low': values[:, 3].round(2),
+        'close': values[:, 4].round(2),
+        'volume': values[:, 5].astype('int64'),
+    })
+    frame = frame.drop_duplicates('date', keep='last').sort_values('date')
+    frame = frame[np.isfinite(frame[['open', 'high', 'low', 'close']]).all(axis=1)]
+
+    now = timezone.now()
+    return [
+        StockPrice(
+            stock_id=stock_id, date=date.date(), open_price=Decimal(str(open_)), high_price=Decimal(str(high)),
+            low_price=Decimal(str(low)), close_price=Decimal(str(close)), adjusted_close=Decimal(str(close)),
+            volume=int(volume), updated_at=now
+        )
+        for date, open_, high, low, close, volume in frame.itertuples(index=False)
+    ]
+
+
+def backfill_prices(stocks, source, start_date=None, end_date=None, resume=True,
+                    workers=4, batch_size=1000, progress=None):
+    """
+    Fetch daily history for stocks from source and upsert it into StockPrice.
+
+    Fetches run concurrently on a bounded thread pool; rows are written
+    from the calling thread with bulk_create(update_conflicts=True) on the
+    (stock, date) key, so re-running over an existing range is safe. With
+    resume each stock starts the day after its newest stored bar. A stock
+    whose fetch or write fails is rolled back and counted as failed.
+    progress(stock, rows, error) is called as each stock completes.
+    Returns a dict of counts.
+    """
+    from ..models import StockPrice, LatestStockPrice
+
+    stocks = list(stocks)
+    end_date = end_date or timezone.localdate()
+    start_date = start_date or end_date - timedelta(days=FYERS_MAX_DAYS_PER_REQUEST)
+
+    last_dates = {}
+    if resume:
+        last_dates = dict(
+            StockPrice.objects.filter(stock__in=stocks).values('stock_id')
+            .annotate(last=Max('date')).values_list('stock_id', 'last')
+        )
+
+    jobs = []
+    for stock in stocks:
+        first = start_date
+        if stock.pk in last_dates:
+            first = max(first, last_dates[stock.pk] + timedelta(days=1))
+        if first <= end_date:
+            jobs.append((stock, first))
+
+    stats = {'stocks': len(stocks), 'fetched': 0, 'skipped': len(stocks) - len(jobs), 'failed': 0, 'rows': 0}
+    latest = []
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='price-backfill') as executor:
+        futures = {
+            executor.submit(source.fetch, stock.symbol, first, end_date): stock
+            for stock, first in jobs
+        }
+        for future in as_completed(futures):
+            stock = futures[future]
+            try:
+                rows = candles_to_rows(stock.pk, future.result())
+                # One stock's rows commit or roll back together
+                with transaction.atomic():
+                    StockPrice.objects.bulk_create(
+                        rows,
+                        batch_size=batch_size,
+                        update_conflicts=True,
+                        unique_fields=['stock', 'date'],
+                        update_fields=PRICE_UPDATE_FIELDS,
+                    )
+            except Exception as e:
+                logger.error(f"Error backfilling prices for {stock.symbol}: {str(e)}")
+                stats['failed'] += 1
+                if progress:
+                    progress(stock, 0, e)
+                continue
+            if rows:
+                latest.append(rows[-1])
+            stats['fetched'] += 1
+            stats['rows'] += len(rows)
+            if progress:
+                progress(stock, len(rows), None)
+
+    # bulk_create skips the post_save signal that maintains LatestStockPrice
+    LatestStockPrice.upsert_from_prices(latest)
+    return stats
+
+
+def get_history_source(fixtures=None, rate=None):
+    """Fixture source for a directory, otherwise the rate-limited Fyers source"""
+    if fixtures:
+        return FixtureHistorySource(fixtures)
+    from .fyers_client import get_fyers_client
+    rate = rate or getattr(settings, 'FYERS_HISTORY_RATE_LIMIT', 8)
+    return FyersHistorySource(get_fyers_client(), RateLimiter(rate))
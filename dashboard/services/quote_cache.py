@@ -0,0 +1,100 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .ticks import as_quote_dict
+
+logger = logging.getLogger(__name__)
+
+QUOTE_CACHE_PREFIX = 'stock_quote_'
+QUOTE_CACHE_TIMEOUT = 300  # Same lifetime as the background service writes
+
+# Instruments shown in the market summary
+MARKET_INDEX_SYMBOLS = [
+    "NSE:NIFTY50-INDEX",
+    "NSE:NIFTYBANK-INDEX",
+]
+
+
+def quote_cache_key(symbol):
+    return f"{QUOTE_CACHE_PREFIX}{symbol}"
+
+
+def parse_fyers_quotes(response):
+    """Convert a Fyers REST quotes response into quote dicts keyed by symbol"""
+    quotes = {}
+    if not response or response.get('s') != 'ok':
+        return quotes
+    now = timezone.now()
+    for item in response.get('d', []):
+        values = item.get('v') or {}
+        if item.get('s') != 'ok' or 'lp' not in values:
+            continue
+        symbol = item.get('n') or values.get('symbol')
+        quotes[symbol] = {
+            'symbol': symbol,
+            'ltp': values.get('lp', 0),
+            'change': values.get('ch', 0),
+            'change_percentage': values.get('chp', 0),
+            'volume': values.get('volume', 0),
+            'timestamp': now,
+        }
+    return quotes
+
+
+def _is_fresh(quote, max_age, now):
+    if max_age is None:
+        return True
+    timestamp = quote.get('timestamp')
+    if timestamp is None:
+        return False
+    return (now - timestamp).total_seconds() <= max_age
+
+
+def get_quotes(symbols, max_age=None, fetch=None):
+    """
+    Get the latest quotes for symbols, cache first.
+
+    All symbols are read with a single cache.get_many. Entries older than
+    max_age seconds count as misses (None accepts any cached entry). Misses
+    are fetched with one call to fetch(symbols), which must return a raw
+    Fyers quotes response, and written back to the cache with set_many.
+
+    Cached Tick records are returned as dicts. Returns (quotes, missing):
+    quotes maps symbol to quote dict and missing lists symbols that could
+    not be resolved.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if max_age is None:
+        max_age = getattr(settings, 'QUOTE_MAX_AGE', None)
+
+    now = timezone.now()
+    cached = cache.get_many([quote_cache_key(symbol) for symbol in symbols])
+    quotes = {}
+    misses = []
+    for symbol in symbols:
+        quote = cached.get(quote_cache_key(symbol))
+        if quote is None:
+            misses.append(symbol)
+            continue
+        quote = as_quote_dict(quote)
+        if _is_fresh(quote, max_age, now):
+            quotes[symbol] = quote
+        else:
+            misses.append(symbol)
+
+    if misses and fetch is not None:
+        try:
+            fetched = parse_fyers_quotes(fetch(misses))
+        except Exception as e:
+            logger.error(f"Error fetching quotes for cache misses: {str(e)}")
+            fetched = {}
+        if fetched:
+            cache.set_many(
+                {quote_cache_key(symbol): quote for symbol, quote in fetched.items()},
+                timeout=QUOTE_CACHE_TIMEOUT
+            )
+            quotes.update(fetched)
+        misses = [symbol for symbol in misses if symbol not in quotes]
+
+    return quotes, misses
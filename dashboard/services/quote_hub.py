@@ -0,0 +1,180 @@
+import json
+import time
+import asyncio
+import threading
+import logging
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+logger = logging.getLogger(__name__)
+
+# Push stream limits: most symbols per connection, seconds between
+# keep-alive comments, and seconds before the server ends a stream so the
+# browser reconnects (bounding streams left behind by vanished clients)
+QUOTE_STREAM_MAX_SYMBOLS = getattr(settings, 'QUOTE_STREAM_MAX_SYMBOLS', 200)
+QUOTE_STREAM_HEARTBEAT = getattr(settings, 'QUOTE_STREAM_HEARTBEAT', 15.0)
+QUOTE_STREAM_MAX_AGE = getattr(settings, 'QUOTE_STREAM_MAX_AGE', 300.0)
+
+
+class Subscription:
+    """
+    One client's interest in a set of symbols. Ticks published for those
+    symbols collect in a per-symbol dict until the client takes them, so a
+    slow client only ever holds the newest tick per symbol.
+    """
+
+    def __init__(self, hub, symbols, loop):
+        self.hub = hub
+        self.symbols = frozenset(symbols)
+        self._loop = loop
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def offer(self, tick):
+        """Queue a tick from any thread and wake the client's event loop"""
+        with self._lock:
+            first = not self._pending
+            self._pending[tick['symbol']] = tick
+        if first:
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+    def take(self):
+        """Pending ticks, oldest symbol first, clearing the queue"""
+        with self._lock:
+            ticks = list(self._pending.values())
+            self._pending = {}
+            self._ready.clear()
+        return ticks
+
+    async def next_batch(self, timeout):
+        """Wait up to timeout seconds for ticks; returns [] on timeout"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return self.take()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class QuoteHub:
+    """
+    Fan coalesced quotes from the single upstream websocket out to every
+    connected push client in this process.
+
+    publish() is called with each coalesced batch by publish_quotes in the
+    ingesting process, or by the quote relay in web workers. The hub keeps an index from
+    symbol to subscriptions, so a batch costs one dict lookup per tick
+    regardless of how many clients are connected, and clients never touch
+    the upstream connection.
+    """
+
+    def __init__(self):
+        self._by_symbol = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, symbols, loop=None):
+        """Register a subscription whose ticks wake `loop` (the running loop by default)"""
+        subscription = Subscription(self, symbols, loop or asyncio.get_running_loop())
+        with self._lock:
+            for symbol in subscription.symbols:
+                self._by_symbol.setdefault(symbol, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for symbol in subscription.symbols:
+                subscribers = self._by_symbol.get(symbol)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_symbol[symbol]
+
+    def publish(self, ticks):
+        """Deliver each tick to the subscriptions for its symbol"""
+        with self._lock:
+            deliveries = [
+                (subscription, tick)
+                for tick in ticks
+                for subscription in self._by_symbol.get(tick['symbol'], ())
+            ]
+        for subscription, tick in deliveries:
+            try:
+                subscription.offer(tick)
+            except RuntimeError:
+                # The client's event loop has already closed
+                self.unsubscribe(subscription)
+        self.published += len(deliveries)
+
+    def symbols(self):
+        """Symbols with at least one subscriber"""
+        with self._lock:
+            return set(self._by_symbol)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._by_symbol.values() for s in subscribers})
+
+
+# Global instance
+quote_hub = QuoteHub()
+
+
+def can_stream(request):
+    """
+    Whether a push stream can be served to this request. Under WSGI Django
+    consumes an async stream to the end before sending any of it, so
+    streams need the ASGI application (portfolio/asgi.py).
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def sse_frame(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _quote_payload(tick, names):
+    timestamp = tick.get('timestamp')
+    return {
+        'symbol': names.get(tick['symbol'], tick['symbol']),
+        'ltp': tick.get('ltp', 0),
+        'change': tick.get('change', 0),
+        'change_percentage': tick.get('change_percentage', 0),
+        'volume': tick.get('volume', 0),
+        'timestamp': timestamp.isoformat() if timestamp else None,
+    }
+
+
+async def quote_events(names, snapshot, hub=quote_hub, heartbeat=None, max_age=None):
+    """
+    Server-sent event stream of quotes for a push client.
+
+    names maps each upstream (Fyers) symbol to the name the client asked
+    for. The stream opens with the snapshot of current quotes, then sends a
+    'quotes' event per coalesced batch, a comment every heartbeat seconds
+    while idle, and ends after max_age seconds.
+    """
+    heartbeat = QUOTE_STREAM_HEARTBEAT if heartbeat is None else heartbeat
+    max_age = QUOTE_STREAM_MAX_AGE if max_age is None else max_age
+    subscription = hub.subscribe(names)
+    try:
+        yield "retry: 3000\n\n"
+        yield sse_frame('quotes', [_quote_payload(tick, names) for tick in snapshot])
+        started = last_sent = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now - started >= max_age:
+                break
+            ticks = await subscription.next_batch(min(heartbeat, started + max_age - now))
+            if ticks:
+                yield sse_frame('quotes', [_quote_payload(tick, names) for tick in ticks])
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= heartbeat:
+                yield ": ping\n\n"
+                last_sent = time.monotonic()
+    finally:
+        subscription.close()
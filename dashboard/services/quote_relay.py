@@ -0,0 +1,106 @@
+import time
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from .quote_cache import quote_cache_key
+from .quote_hub import quote_hub
+from .subscriptions import publish_stream_demand, worker_id
+from .ticks import as_tick
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteRelay:
+    """
+    Feed the quote hub of a web worker from the shared cache when quotes are
+    ingested by the separate run_market_feed process.
+
+    While the hub has subscribers, a task on the worker's event loop reads
+    the quotes for the subscribed symbols with one cache.get_many every
+    interval and publishes those with a new timestamp. The task exits once
+    the last subscriber leaves, so idle workers do no polling and no
+    threads are started.
+
+    The subscribed symbols are also published to the cache (refreshed
+    every demand_ttl / 3 seconds), so the feed process subscribes upstream
+    to symbols only push clients watch.
+    """
+
+    def __init__(self, hub=quote_hub, interval=0.5, demand_ttl=30.0):
+        self.hub = hub
+        self.interval = interval
+        self.demand_ttl = demand_ttl
+        self.worker = worker_id()
+        self._task = None
+        self._seen = {}  # symbol -> timestamp of the last relayed tick
+        self._shared = set()
+        self._shared_at = 0.0
+
+        self.polls = 0
+        self.relayed = 0
+
+    def ensure_running(self):
+        """Start relaying on the running event loop unless already relaying"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def share_demand(self, symbols):
+        """Publish the symbols this worker's push clients watch, when changed or due for a refresh"""
+        now = time.monotonic()
+        if symbols == self._shared and (not symbols or now - self._shared_at < self.demand_ttl / 3):
+            return
+        publish_stream_demand(self.worker, symbols, self.demand_ttl)
+        self._shared = symbols
+        self._shared_at = now
+
+    def poll(self):
+        """Relay new cached quotes for the hub's symbols; returns how many were published"""
+        symbols = self.hub.symbols()
+        self.share_demand(symbols)
+        if not symbols:
+            return 0
+        cached = cache.get_many([quote_cache_key(symbol) for symbol in symbols])
+        ticks = []
+        for symbol in symbols:
+            quote = cached.get(quote_cache_key(symbol))
+            if quote is None:
+                continue
+            tick = as_tick(quote)
+            if self._seen.get(symbol) == tick.timestamp:
+                continue
+            self._seen[symbol] = tick.timestamp
+            ticks.append(tick)
+        self.polls += 1
+        if ticks:
+            self.hub.publish(ticks)
+            self.relayed += len(ticks)
+        return len(ticks)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.hub.symbols():
+                break
+            try:
+                await sync_to_async(self.poll)()
+            except Exception as e:
+                logger.error(f"Error relaying cached quotes: {str(e)}")
+        self._seen = {}
+        try:
+            await sync_to_async(self.share_demand)(set())
+        except Exception as e:
+            logger.error(f"Error clearing push client demand: {str(e)}")
+
+    def stats(self):
+        """Counters for monitoring the relay"""
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'polls': self.polls,
+            'relayed': self.relayed,
+        }
+
+
+# Global instance
+quote_relay = QuoteRelay(interval=getattr(settings, 'QUOTE_RELAY_INTERVAL', 0.5))
@@ -0,0 +1,146 @@
+import sys
+import time
+import threading
+from datetime import datetime, timezone as dt_timezone
+import numpy as np
+from .ticks import as_tick
+
+FIELDS = ('ltp', 'change', 'change_percentage', 'volume', 'timestamp')
+DTYPES = {
+    'ltp': np.float64,
+    'change': np.float64,
+    'change_percentage': np.float64,
+    'volume': np.int64,
+    'timestamp': np.float64,  # epoch seconds, 0 means never written
+}
+
+# Optimistic reads attempted before a snapshot falls back to the write lock
+SNAPSHOT_RETRIES = 100
+
+
+class QuoteTable:
+    """
+    In-process table of the latest quote per symbol.
+
+    Each symbol is interned to a row index and its fields live in parallel
+    NumPy arrays, so a snapshot of N symbols is one fancy-index copy per
+    column instead of N cache round-trips.
+
+    Writers serialise on a lock and bump a sequence number before and after
+    each write (a seqlock). Readers normally skip the lock: they copy the
+    rows they need and retry, yielding in between, if the sequence changed
+    underneath them, which guarantees the snapshot reflects a single point
+    between two writes. After SNAPSHOT_RETRIES failed attempts a reader
+    takes the lock.
+    """
+
+    def __init__(self, capacity=256):
+        self._index = {}
+        self._symbols = []
+        self._columns = {name: np.zeros(max(capacity, 1), dtype=DTYPES[name]) for name in FIELDS}
+        self._seq = 0
+        self._write_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._index
+
+    def _row_for(self, symbol):
+        """Return the row index for a symbol, growing the arrays if needed (write lock held, sequence odd)"""
+        row = self._index.get(symbol)
+        if row is not None:
+            return row
+        row = len(self._symbols)
+        capacity = len(self._columns['ltp'])
+        if row >= capacity:
+            # Readers may still hold the old arrays, so grow by swapping in
+            # a new dict of columns rather than resizing in place
+            grown = {}
+            for name, column in self._columns.items():
+                grown[name] = np.zeros(capacity * 2, dtype=column.dtype)
+                grown[name][:capacity] = column
+            self._columns = grown
+        symbol = sys.intern(symbol)
+        self._symbols.append(symbol)
+        self._index[symbol] = row
+        return row
+
+    def update_many(self, ticks):
+        """Write a batch of Ticks (or tick dicts) as one atomic update"""
+        ticks = [as_tick(tick) for tick in ticks]
+        if not ticks:
+            return
+        with self._write_lock:
+            # New symbols are interned inside the write, so a reader never
+            # sees a row whose values have not been written yet
+            self._seq += 1
+            try:
+                # Last tick per row wins; NumPy leaves repeated indices in one
+                # fancy assignment unordered
+                by_row = {self._row_for(tick.symbol): tick for tick in ticks}
+                rows = np.fromiter(by_row, dtype=np.int64, count=len(by_row))
+                _, ltp, change, change_percentage, volume, timestamp = zip(*by_row.values())
+                timestamp = [stamp.timestamp() if stamp else 0 for stamp in timestamp]
+                columns = self._columns
+                columns['ltp'][rows] = ltp
+                columns['change'][rows] = change
+                columns['change_percentage'][rows] = change_percentage
+                columns['volume'][rows] = volume
+                columns['timestamp'][rows] = timestamp
+            finally:
+                self._seq += 1
+
+    def update(self, tick):
+        """Write a single tick"""
+        self.update_many([tick])
+
+    def snapshot(self, symbols):
+        """
+        Consistent copy of the latest quotes for symbols.
+        Returns a dict of arrays aligned with symbols plus a boolean 'found'
+        mask; rows for unknown symbols are zero.
+        """
+        index = self._index
+        rows = np.fromiter((index.get(symbol, -1) for symbol in symbols), dtype=np.int64, count=len(symbols))
+        found = rows >= 0
+        rows[~found] = 0
+        for _ in range(SNAPSHOT_RETRIES):
+            seq = self._seq
+            if not seq % 2:
+                columns = self._columns
+                result = {name: columns[name].take(rows) for name in FIELDS}
+                if self._seq == seq:
+                    break
+            # Give the writer the GIL instead of spinning through our time slice
+            time.sleep(0)
+        else:
+            # Writers keep winning: copy under their lock instead
+            with self._write_lock:
+                columns = self._columns
+                result = {name: columns[name].take(rows) for name in FIELDS}
+        for name in FIELDS:
+            result[name][~found] = 0
+        result['found'] = found
+        return result
+
+    def get_many(self, symbols):
+        """Latest quotes for symbols as {symbol: quote dict}, skipping unknown symbols"""
+        symbols = list(symbols)
+        snap = self.snapshot(symbols)
+        quotes = {}
+        for i in np.flatnonzero(snap['found']):
+            quotes[symbols[i]] = {
+                'symbol': symbols[i],
+                'ltp': float(snap['ltp'][i]),
+                'change': float(snap['change'][i]),
+                'change_percentage': float(snap['change_percentage'][i]),
+                'volume': int(snap['volume'][i]),
+                'timestamp': datetime.fromtimestamp(snap['timestamp'][i], tz=dt_timezone.utc),
+            }
+        return quotes
+
+
+# Global instance
+quote_table = QuoteTable()
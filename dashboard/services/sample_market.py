@@ -0,0 +1,141 @@
+import logging
+import numpy as np
+import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def trading_days(end_date, count):
+    """The last `count` weekdays up to and including end_date"""
+    return pd.bdate_range(end=end_date, periods=count).date
+
+
+def simulate_ohlcv(sector_ids, n_days, start_prices=None, seed=None, drift=0.08, volatility=0.25,
+                   market_weight=0.3, sector_weight=0.3):
+    """
+    Simulate daily OHLCV bars for many stocks as geometric Brownian motion.
+
+    Each stock's daily shock mixes a market factor, a factor shared by its
+    sector and its own noise, so stocks in one sector move together. The
+    weights are variance shares (market_weight + sector_weight <= 1).
+    sector_ids holds one integer per stock. Returns a dict of
+    (n_stocks, n_days) arrays: open, high, low, close (float64) and
+    volume (int64).
+    """
+    rng = np.random.default_rng(seed)
+    sector_ids = np.asarray(sector_ids)
+    n_stocks = len(sector_ids)
+    n_sectors = int(sector_ids.max()) + 1 if n_stocks else 0
+    idiosyncratic_weight = max(1.0 - market_weight - sector_weight, 0.0)
+
+    # Per-stock annual drift and volatility scattered around the defaults
+    mu = drift + rng.normal(0, 0.05, size=(n_stocks, 1))
+    sigma = volatility * rng.lognormal(0, 0.25, size=(n_stocks, 1))
+    dt = 1.0 / TRADING_DAYS_PER_YEAR
+
+    market = rng.standard_normal((1, n_days))
+    sectors = rng.standard_normal((n_sectors, n_days))
+    shocks = (
+        np.sqrt(market_weight) * market
+        + np.sqrt(sector_weight) * sectors[sector_ids]
+        + np.sqrt(idiosyncratic_weight) * rng.standard_normal((n_stocks, n_days))
+    )
+    log_returns = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks
+
+    if start_prices is None:
+        start_prices = rng.uniform(100, 5000, size=n_stocks)
+    start_prices = np.asarray(start_prices, dtype='float64').reshape(-1, 1)
+    # The walk carries across days: each close compounds every earlier return
+    close = start_prices * np.exp(np.cumsum(log_returns, axis=1))
+
+    previous_close = np.concatenate([start_prices, close[:, :-1]], axis=1)
+    daily_sigma = sigma * np.sqrt(dt)
+    open_ = previous_close * np.exp(rng.normal(0, 0.3, size=close.shape) * daily_sigma)
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.5, size=close.shape)) * daily_sigma)
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.5, size=close.shape)) * daily_sigma)
+
+    # Volume rises on big moves
+    base_volume = rng.lognormal(13, 1, size=(n_stocks, 1))
+    volume = base_volume * (1 + 20 * np.abs(log_returns)) * rng.lognormal(0, 0.3, size=close.shape)
+
+    return {
+        'open': open_.round(2),
+        'high': high.round(2),
+        'low': low.round(2),
+        'close': close.round(2),
+        'volume': volume.astype('int64'),
+    }
+
+
+def insert_prices(stock_ids, dates, bars, chunk_size=50000):
+    """
+    Insert simulated bars into StockPrice, skipping (stock, date) pairs that
+    already exist. Rows are sent with executemany in chunks of chunk_size,
+    one transaction per chunk, without building model instances.
+    Returns the number of rows sent.
+    """
+    from ..models import StockPrice
+
+    stock_ids = np.asarray(stock_ids)
+    n_stocks, n_days = bars['close'].shape
+    if n_stocks == 0 or n_days == 0:
+        return 0
+
+    opts = StockPrice._meta
+    quote = connection.ops.quote_name
+    columns = [
+        'stock_id', 'date', 'open_price', 'high_price', 'low_price', 'close_price',
+        'adjusted_close', 'volume', 'created_at', 'updated_at',
+    ]
+    sql = (
+        f"INSERT INTO {quote(opts.db_table)} ({', '.join(quote(opts.get_field(c).column) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) ON CONFLICT DO NOTHING"
+    )
+
+    # Flatten stock-major so each chunk is a contiguous slice of every array
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    flat_stock = np.repeat(stock_ids, n_days).tolist()
+    flat_date = [connection.ops.adapt_datefield_value(d) for d in dates] * n_stocks
+    flat = {name: values.ravel().tolist() for name, values in bars.items()}
+
+    total = n_stocks * n_days
+    for start in range(0, total, chunk_size):
+        end = min(start + chunk_size, total)
+        close = flat['close'][start:end]
+        rows = zip(
+            flat_stock[start:end], flat_date[start:end], flat['open'][start:end],
+            flat['high'][start:end], flat['low'][start:end], close, close,
+            flat['volume'][start:end], [now] * (end - start), [now] * (end - start),
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    return total
+
+
+def stored_closes(stock_ids, dates):
+    """
+    Close prices stored in StockPrice as a (stocks x dates) array aligned
+    with stock_ids and dates, NaN where there is no row. insert_prices keeps
+    rows that already exist, so on a re-run these, not the newly simulated
+    bars, are the prices in the database.
+    """
+    from ..models import StockPrice
+
+    rows = {stock_id: i for i, stock_id in enumerate(np.asarray(stock_ids).tolist())}
+    columns = {day: j for j, day in enumerate(dates)}
+    closes = np.full((len(rows), len(columns)), np.nan)
+    if not rows or not columns:
+        return closes
+    prices = StockPrice.objects.filter(date__gte=min(dates), date__lte=max(dates)).values_list(
+        'stock_id', 'date', 'close_price'
+    )
+    for stock_id, day, close in prices.iterator(chunk_size=10000):
+        i = rows.get(stock_id)
+        j = columns.get(day)
+        if i is not None and j is not None:
+            closes[i, j] = close
+    return closes
@@ -0,0 +1,213 @@
+import re
+import time
+import uuid
+import threading
+import logging
+from bisect import bisect_left
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_VERSION_KEY = 'stock_search_index_version'
+
+# Share of the query's trigrams a fuzzy match must contain
+MIN_FUZZY_SIMILARITY = 0.5
+
+_TOKEN_RE = re.compile(r'[A-Z0-9&]+')
+
+
+def normalize(text):
+    return ' '.join(_TOKEN_RE.findall((text or '').upper()))
+
+
+def trigrams(text):
+    """Trigrams of each word, padded so word starts weigh more"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _prefix_range(keys, prefix):
+    """Slice bounds of the sorted keys that start with prefix"""
+    lo = bisect_left(keys, prefix)
+    hi = bisect_left(keys, prefix + '￿', lo)
+    return lo, hi
+
+
+class _Snapshot:
+    """
+    Immutable index structures; searches run against one snapshot. Stocks
+    are numbered densely and postings are NumPy arrays of those numbers, so
+    ranking a large candidate set is a few array operations.
+    """
+
+    def __init__(self, rows):
+        self.stocks = []
+        symbols = []
+        isins = []
+        name_tokens = []
+        grams = {}
+        sectors = {}
+        for stock_id, symbol, name, isin, sector in rows:
+            idx = len(self.stocks)
+            self.stocks.append({'id': stock_id, 'symbol': symbol, 'name': name, 'isin': isin, 'sector': sector})
+            sectors.setdefault(sector, []).append(idx)
+            symbol = symbol.upper()
+            symbols.append((symbol, idx))
+            if isin:
+                isins.append((isin.upper(), idx))
+            normalized_name = normalize(name)
+            for token in set(normalized_name.split()):
+                name_tokens.append((token, idx))
+            for gram in trigrams(symbol) | trigrams(normalized_name):
+                grams.setdefault(gram, []).append(idx)
+
+        # Tie-break within a tier: shorter symbols first, then alphabetical
+        self.order = np.empty(len(self.stocks), dtype=np.int64)
+        by_symbol = sorted(range(len(self.stocks)), key=lambda i: (len(symbols[i][0]), symbols[i][0]))
+        self.order[by_symbol] = np.arange(len(self.stocks))
+
+        symbols.sort()
+        isins.sort()
+        name_tokens.sort()
+        self.symbol_keys = [key for key, _ in symbols]
+        self.symbol_ids = np.array([idx for _, idx in symbols], dtype=np.int64)
+        self.isin_keys = [key for key, _ in isins]
+        self.isin_ids = np.array([idx for _, idx in isins], dtype=np.int64)
+        self.token_keys = [key for key, _ in name_tokens]
+        self.token_ids = np.array([idx for _, idx in name_tokens], dtype=np.int64)
+        self.grams = {gram: np.array(ids, dtype=np.int64) for gram, ids in grams.items()}
+        self.sector_ids = {sector: np.array(ids, dtype=np.int64) for sector, ids in sectors.items()}
+
+    def _name_prefix_ids(self, token):
+        lo, hi = _prefix_range(self.token_keys, token)
+        return self.token_ids[lo:hi]
+
+    def _fuzzy_ids(self, tokens):
+        """Stocks similar to every query word, with their weakest word similarity"""
+        similarity = None
+        for token in tokens:
+            token_grams = trigrams(token)
+            postings = [self.grams[gram] for gram in token_grams if gram in self.grams]
+            if not postings:
+                return np.empty(0, dtype=np.int64), np.empty(0)
+            coverage = np.bincount(np.concatenate(postings), minlength=len(self.stocks)) / len(token_grams)
+            similarity = coverage if similarity is None else np.minimum(similarity, coverage)
+        ids = np.flatnonzero(similarity >= MIN_FUZZY_SIMILARITY)
+        return ids, similarity[ids]
+
+    def search(self, query, limit, sector=None):
+        tokens = normalize(query).split()
+        if not tokens or not self.stocks:
+            return []
+        compact = ''.join(tokens)
+        results = []
+        taken = np.zeros(len(self.stocks), dtype=bool)
+        if sector:
+            # Stocks of other sectors count as taken, so no tier returns them
+            taken[:] = True
+            taken[self.sector_ids.get(sector, np.empty(0, dtype=np.int64))] = False
+
+        def take(ids):
+            """Add the best of ids in symbol order until limit is reached"""
+            ids = np.unique(ids)
+            ids = ids[~taken[ids]]
+            needed = limit - len(results)
+            if len(ids) > needed:
+                ids = ids[np.argpartition(self.order[ids], needed - 1)[:needed]]
+            ids = ids[np.argsort(self.order[ids])]
+            taken[ids] = True
+            results.extend(ids.tolist())
+            return len(results) >= limit
+
+        lo, hi = _prefix_range(self.symbol_keys, compact)
+        exact = self.symbol_ids[lo:lo + 1] if lo < hi and self.symbol_keys[lo] == compact else []
+        done = take(np.asarray(exact, dtype=np.int64)) or take(self.symbol_ids[lo:hi])
+
+        if not done and len(compact) >= 2:
+            lo, hi = _prefix_range(self.isin_keys, compact)
+            done = take(self.isin_ids[lo:hi])
+
+        # Every query word must start some word of the name
+        if not done:
+            matches = self._name_prefix_ids(tokens[0])
+            for token in tokens[1:]:
+                if not len(matches):
+                    break
+                matches = np.intersect1d(matches, self._name_prefix_ids(token))
+            done = take(matches)
+
+        # Typo tolerance only when the exact tiers came up short
+        if not done and len(compact) >= 3:
+            ids, similarity = self._fuzzy_ids(tokens)
+            keep = ~taken[ids]
+            ids, similarity = ids[keep], similarity[keep]
+            results.extend(ids[np.lexsort((self.order[ids], -similarity))][:limit - len(results)].tolist())
+
+        return [self.stocks[idx] for idx in results]
+
+
+class StockSearchIndex:
+    """
+    In-memory type-ahead index over Stock symbol, name and ISIN.
+
+    Matches are ranked: exact symbol, symbol prefix, ISIN prefix, name word
+    prefixes (every query word must start a word of the name), then
+    trigram similarity for typos. The index is rebuilt from the database
+    on first use and after invalidate(); invalidations are published
+    through the cache so other processes rebuild too, checked at most every
+    SEARCH_INDEX_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        """Load every stock from the database into a fresh snapshot"""
+        from ..models import Stock
+
+        version = cache.get(SEARCH_INDEX_VERSION_KEY)
+        rows = Stock.objects.values_list('id', 'symbol', 'name', 'isin', 'sector')
+        snapshot = _Snapshot(rows)
+        with self._lock:
+            self._snapshot = snapshot
+            self._version = version
+            self._checked_at = time.monotonic()
+        logger.info(f"Stock search index rebuilt with {len(snapshot.stocks)} stocks")
+        return len(snapshot.stocks)
+
+    def invalidate(self):
+        """Rebuild this and every other process's index before its next search"""
+        cache.set(SEARCH_INDEX_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        with self._lock:
+            self._snapshot = None
+
+    def _current(self):
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            if cache.get(SEARCH_INDEX_VERSION_KEY) != self._version:
+                self._snapshot = None
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.rebuild()
+            snapshot = self._snapshot
+        return snapshot
+
+    def search(self, query, limit=10, sector=None):
+        """Best matching stocks (of sector, if given) as dicts with id, symbol, name, isin and sector"""
+        return self._current().search(query, limit, sector=sector)
+
+
+# Global instance
+stock_search_index = StockSearchIndex(
+    check_interval=getattr(settings, 'SEARCH_INDEX_CHECK_INTERVAL', 5.0),
+)
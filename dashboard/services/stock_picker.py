@@ -0,0 +1,106 @@
+import json
+import base64
+import binascii
+from .search_index import stock_search_index
+
+STOCK_PICKER_PAGE_SIZE = 25
+STOCK_PICKER_MAX_PAGE_SIZE = 50
+
+# Ranked search matches are paged out of at most this many results
+STOCK_PICKER_MAX_SEARCH_RESULTS = 500
+
+PICKER_FIELDS = ('id', 'symbol', 'name', 'sector')
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Position encoded by encode_cursor; raises ValueError for anything else"""
+    if not cursor:
+        return {}
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(position, dict):
+        raise ValueError('Invalid cursor')
+    return position
+
+
+def sector_choices():
+    """Distinct non-empty stock sectors for the picker's sector filter"""
+    from ..models import Stock
+
+    return list(
+        Stock.objects.exclude(sector__isnull=True).exclude(sector='')
+        .order_by('sector').values_list('sector', flat=True).distinct()
+    )
+
+
+def _browse(sector, position, limit):
+    """Keyset page over stocks in symbol order"""
+    from ..models import Stock
+
+    after = position.get('after')
+    if after is not None and not isinstance(after, str):
+        raise ValueError('Invalid cursor')
+    stocks = Stock.objects.order_by('symbol')
+    if sector:
+        stocks = stocks.filter(sector=sector)
+    if after:
+        stocks = stocks.filter(symbol__gt=after)
+    # One extra row tells whether there is a next page
+    rows = list(stocks.values(*PICKER_FIELDS)[:limit + 1])
+    next_position = {'after': rows[limit - 1]['symbol']} if len(rows) > limit else None
+    return rows[:limit], next_position
+
+
+def _search(query, sector, position, limit):
+    """Page of ranked search index matches"""
+    offset = position.get('offset', 0)
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError('Invalid cursor')
+    matches = stock_search_index.search(query, limit=STOCK_PICKER_MAX_SEARCH_RESULTS, sector=sector or None)
+    rows = [{field: stock[field] for field in PICKER_FIELDS} for stock in matches[offset:offset + limit]]
+    next_position = {'offset': offset + limit} if len(matches) > offset + limit else None
+    return rows, next_position
+
+
+def picker_page(user, query='', sector='', cursor='', limit=STOCK_PICKER_PAGE_SIZE, watchlist_id=None):
+    """
+    One page of stocks for the watchlist stock picker.
+
+    Without a query stocks are paged by symbol with a keyset cursor; with a
+    query they come ranked from the stock search index. Each row carries an
+    in_watchlist flag for the given watchlist of the user's, so the page
+    costs the same few queries however large the stock universe is.
+    Raises ValueError for a malformed cursor.
+    """
+    from ..models import Watchlist
+
+    position = decode_cursor(cursor)
+    limit = min(max(limit, 1), STOCK_PICKER_MAX_PAGE_SIZE)
+    query = query.strip()
+    if query:
+        rows, next_position = _search(query, sector, position, limit)
+    else:
+        rows, next_position = _browse(sector, position, limit)
+
+    in_watchlist = set()
+    if watchlist_id and rows:
+        in_watchlist = set(
+            Watchlist.stocks.through.objects.filter(
+                watchlist_id=watchlist_id,
+                watchlist__created_by=user,
+                stock_id__in=[row['id'] for row in rows],
+            ).values_list('stock_id', flat=True)
+        )
+    for row in rows:
+        row['in_watchlist'] = row['id'] in in_watchlist
+
+    return {
+        'results': rows,
+        'next_cursor': encode_cursor(next_position) if next_position else None,
+    }
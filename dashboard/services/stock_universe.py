@@ -0,0 +1,132 @@
+import logging
+from decimal import Decimal
+import pandas as pd
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from .panel_cache import invalidate_tags, stock_tag
+
+logger = logging.getLogger(__name__)
+
+NSE_EQUITY_LIST_URL = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
+
+# EQUITY_L.csv column -> Stock field
+CSV_COLUMNS = {
+    'SYMBOL': 'symbol',
+    'NAME OF COMPANY': 'name',
+    'ISIN NUMBER': 'isin',
+    'DATE OF LISTING': 'listing_date',
+    'FACE VALUE': 'face_value',
+}
+SYNC_FIELDS = ['name', 'isin', 'face_value', 'listing_date']
+
+ISIN_PATTERN = r'^[A-Z]{2}[A-Z0-9]{9}[0-9]$'
+CENT = Decimal('0.01')
+
+
+def parse_equity_list(df):
+    """
+    Validate and normalise an NSE equity list in bulk.
+
+    Returns (stocks, failed): stocks is a DataFrame with one row per valid
+    symbol and the Stock field names as columns, failed is a list of
+    (symbol, reason) for rejected rows.
+    """
+    df = df.rename(columns=lambda column: str(column).strip())
+    missing = [column for column in ('SYMBOL', 'NAME OF COMPANY', 'ISIN NUMBER') if column not in df.columns]
+    if missing:
+        raise ValueError(f"Equity list is missing columns: {', '.join(missing)}")
+    df = df.reindex(columns=list(CSV_COLUMNS)).rename(columns=CSV_COLUMNS)
+
+    for column in ('symbol', 'name', 'isin'):
+        df[column] = df[column].astype('string').str.strip()
+    df['symbol'] = df['symbol'].str.upper()
+    df['isin'] = df['isin'].str.upper()
+    df['name'] = df['name'].str.slice(0, 100)
+
+    listing_date = pd.to_datetime(df['listing_date'].astype('string').str.strip(), format='%d-%b-%Y', errors='coerce')
+    df['listing_date'] = listing_date.dt.date.astype(object).where(listing_date.notna(), None)
+    face_value = pd.to_numeric(df['face_value'], errors='coerce').round(2)
+    df['face_value'] = [None if pd.isna(value) else Decimal(str(value)).quantize(CENT) for value in face_value]
+
+    reasons = pd.Series(pd.NA, index=df.index, dtype='string')
+    required = df[['symbol', 'name', 'isin']].fillna('')
+    reasons = reasons.mask((required == '').any(axis=1) & reasons.isna(), 'missing required data')
+    reasons = reasons.mask((df['symbol'].str.len() > 20) & reasons.isna(), 'symbol too long')
+    reasons = reasons.mask(~df['isin'].fillna('').str.match(ISIN_PATTERN) & reasons.isna(), 'invalid ISIN')
+    reasons = reasons.mask(df['symbol'].duplicated() & reasons.isna(), 'duplicate symbol')
+    reasons = reasons.mask(df['isin'].duplicated() & reasons.isna(), 'duplicate ISIN')
+
+    bad = reasons.notna()
+    failed = list(zip(df.loc[bad, 'symbol'].fillna('').tolist(), reasons[bad].tolist()))
+    stocks = df.loc[~bad].astype({'symbol': object, 'name': object, 'isin': object}).reset_index(drop=True)
+    return stocks, failed
+
+
+def sync_stocks(stocks, chunk_size=500):
+    """
+    Bring Stock in line with a parsed equity list.
+
+    Existing rows are read in one query and diffed in memory; new and
+    changed rows are written with bulk_create/bulk_update, one transaction
+    per chunk; a chunk the database rejects is rolled back and its rows
+    counted as failed. Symbols that are not in the list are left alone.
+    Returns a dict of created/updated/unchanged/failed counts and the
+    failures.
+    """
+    from ..models import Stock
+
+    existing = {
+        row['symbol']: row
+        for row in Stock.objects.values('id', 'symbol', *SYNC_FIELDS)
+    }
+    isin_owner = {row['isin']: symbol for symbol, row in existing.items()}
+
+    to_create = []
+    to_update = []
+    failed = []
+    unchanged = 0
+    now = timezone.now()
+    for record in stocks.to_dict('records'):
+        symbol = record['symbol']
+        owner = isin_owner.get(record['isin'])
+        if owner is not None and owner != symbol:
+            failed.append((symbol, f"ISIN {record['isin']} belongs to {owner}"))
+            continue
+        values = {field: record[field] for field in SYNC_FIELDS}
+        current = existing.get(symbol)
+        if current is None:
+            to_create.append(Stock(symbol=symbol, **values))
+        elif any(current[field] != values[field] for field in SYNC_FIELDS):
+            to_update.append(Stock(id=current['id'], symbol=symbol, last_updated=now, **values))
+        else:
+            unchanged += 1
+
+    def write_chunks(rows, write):
+        written = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                with transaction.atomic():
+                    write(chunk)
+            except DatabaseError as e:
+                logger.error(f"Error writing stocks {chunk[0].symbol}..{chunk[-1].symbol}: {str(e)}")
+                failed.extend((stock.symbol, f"database error: {str(e)}") for stock in chunk)
+                continue
+            written.extend(chunk)
+        return written
+
+    created = write_chunks(to_create, Stock.objects.bulk_create)
+    updated = write_chunks(
+        to_update, lambda chunk: Stock.objects.bulk_update(chunk, SYNC_FIELDS + ['last_updated'])
+    )
+
+    # Bulk writes skip signals, so drop cached panels showing changed stocks here
+    invalidate_tags([stock_tag(stock.id) for stock in updated])
+
+    return {
+        'created': len(created),
+        'updated': len(updated),
+        'unchanged': unchanged,
+        'failed': len(failed),
+        'failures': failed,
+    }
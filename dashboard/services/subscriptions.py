@@ -0,0 +1,249 @@
+import os
+import time
+import uuid
+import socket
+import threading
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from .symbols import to_fyers_symbol
+from .quote_cache import MARKET_INDEX_SYMBOLS
+from .quote_hub import quote_hub
+
+logger = logging.getLogger(__name__)
+
+WATCHED_SYMBOLS_VERSION_KEY = 'watched_symbols_version'
+
+STREAM_DEMAND_PREFIX = 'quote_stream_demand_'
+STREAM_WORKERS_KEY = 'quote_stream_workers'
+
+
+def watched_symbols():
+    """Fyers symbols of every stock held in a portfolio or listed in a watchlist"""
+    from ..models import PortfolioHolding, Watchlist
+
+    held = PortfolioHolding.objects.values_list('stock__symbol', flat=True).distinct()
+    listed = Watchlist.stocks.through.objects.values_list('stock__symbol', flat=True).distinct()
+    return {to_fyers_symbol(symbol) for symbol in held} | {to_fyers_symbol(symbol) for symbol in listed}
+
+
+def worker_id():
+    """Name of this process, unique across the deployment"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def publish_stream_demand(worker, symbols, ttl):
+    """
+    Share the symbols a web worker's push clients watch with the process
+    holding the websocket. Each worker writes its own key, which expires
+    after ttl seconds unless published again, and lists itself in a
+    registry of workers; lost registry updates are repaired by the next
+    publish.
+    """
+    key = f"{STREAM_DEMAND_PREFIX}{worker}"
+    if not symbols:
+        cache.delete(key)
+        return
+    cache.set(key, sorted(symbols), timeout=ttl)
+    now = time.time()
+    workers = cache.get(STREAM_WORKERS_KEY) or {}
+    if workers.get(worker, 0) < now + ttl / 2:
+        workers = {name: expires for name, expires in workers.items() if expires > now}
+        workers[worker] = now + ttl
+        cache.set(STREAM_WORKERS_KEY, workers, timeout=None)
+
+
+def stream_demand():
+    """Symbols watched by the push clients of every web worker"""
+    workers = cache.get(STREAM_WORKERS_KEY) or {}
+    if not workers:
+        return set()
+    published = cache.get_many([f"{STREAM_DEMAND_PREFIX}{worker}" for worker in workers])
+    return set().union(*published.values())
+
+
+class SymbolSubscriptionManager:
+    """
+    Reference-counted symbol subscriptions for the upstream websocket.
+
+    Each demand source (market indices, portfolios and watchlists, connected
+    push clients) declares the full set of symbols it needs with
+    set_demand(); a symbol stays subscribed while at least one source
+    demands it. Changes are collected and sent by flush() as incremental
+    subscribe/unsubscribe frames of at most symbols_per_message symbols, so
+    a symbol demanded and dropped between flushes costs nothing upstream.
+    on_connect() replays the whole active set on every (re)connect.
+
+    A background thread flushes every flush_interval seconds, first
+    refreshing the push client demand from the quote hub and, when marked
+    stale, the database demand. Portfolios and watchlists change in any
+    process, so mark_stale() is published through the cache and checked
+    at most every check_interval seconds. With shared_clients the push
+    client demand also includes what the web workers published with
+    publish_stream_demand(), for a websocket held outside the web workers.
+    """
+
+    def __init__(self, symbols_per_message=100, flush_interval=1.0, hub=quote_hub, check_interval=5.0,
+                 shared_clients=False):
+        self.symbols_per_message = symbols_per_message
+        self.flush_interval = flush_interval
+        self.hub = hub
+        self.check_interval = check_interval
+        self.shared_clients = shared_clients
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._send = None
+        self._demand = {}         # source -> frozenset of symbols
+        self._refcounts = {}      # symbol -> number of sources demanding it
+        self._subscribed = set()  # symbols the upstream connection has been sent
+        self._database_stale = True
+        self._version = None
+        self._checked_at = 0.0
+
+        self.frames_sent = 0
+
+    def set_demand(self, source, symbols):
+        """Replace the symbols demanded by source"""
+        symbols = frozenset(symbols)
+        with self._lock:
+            previous = self._demand.get(source, frozenset())
+            if symbols == previous:
+                return
+            for symbol in symbols - previous:
+                self._refcounts[symbol] = self._refcounts.get(symbol, 0) + 1
+            for symbol in previous - symbols:
+                self._refcounts[symbol] -= 1
+                if not self._refcounts[symbol]:
+                    del self._refcounts[symbol]
+            if symbols:
+                self._demand[source] = symbols
+            else:
+                self._demand.pop(source, None)
+
+    def active_symbols(self):
+        with self._lock:
+            return set(self._refcounts)
+
+    def mark_stale(self):
+        """Reload portfolio and watchlist symbols in every process before its next flush"""
+        cache.set(WATCHED_SYMBOLS_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        self._database_stale = True
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if cache.get(WATCHED_SYMBOLS_VERSION_KEY) != self._version:
+            self._database_stale = True
+
+    def refresh(self):
+        """Pull demand from the quote hub and, if stale, the database"""
+        self.set_demand('market', MARKET_INDEX_SYMBOLS)
+        clients = self.hub.symbols()
+        if self.shared_clients:
+            clients |= stream_demand()
+        self.set_demand('clients', clients)
+        self._check_version()
+        if self._database_stale:
+            self._database_stale = False
+            try:
+                # Read before the symbols, so a change committed meanwhile triggers another load
+                version = cache.get(WATCHED_SYMBOLS_VERSION_KEY)
+                self.set_demand('database', watched_symbols())
+                self._version = version
+                self._checked_at = time.monotonic()
+            except Exception as e:
+                self._database_stale = True
+                logger.error(f"Error loading watched symbols: {str(e)}")
+
+    def _batches(self, symbols):
+        symbols = sorted(symbols)
+        for start in range(0, len(symbols), self.symbols_per_message):
+            yield symbols[start:start + self.symbols_per_message]
+
+    def flush(self):
+        """Send subscribe/unsubscribe frames for changes since the last flush; returns frames sent"""
+        with self._send_lock:
+            send = self._send
+            if send is None:
+                return 0
+            active = self.active_symbols()
+            added = active - self._subscribed
+            removed = self._subscribed - active
+            sent = 0
+            try:
+                for batch in self._batches(removed):
+                    send('unsubscribe', batch)
+                    self._subscribed.difference_update(batch)
+                    sent += 1
+                for batch in self._batches(added):
+                    send('subscribe', batch)
+                    self._subscribed.update(batch)
+                    sent += 1
+            except Exception as e:
+                logger.error(f"Error sending subscription frames: {str(e)}")
+            self.frames_sent += sent
+            return sent
+
+    def on_connect(self, send):
+        """
+        A connection is open: send(action, symbols) now delivers frames to
+        it. The new connection has no subscriptions, so the full active set
+        is sent.
+        """
+        with self._send_lock:
+            self._send = send
+            self._subscribed = set()
+        self.refresh()
+        return self.flush()
+
+    def on_disconnect(self):
+        with self._send_lock:
+            self._send = None
+            self._subscribed = set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            close_old_connections()
+            self.refresh()
+            self.flush()
+        close_old_connections()
+
+    def start(self):
+        """Start the periodic flush thread"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='symbol-subscriptions')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        """Counters for monitoring the manager"""
+        with self._lock:
+            return {
+                'active': len(self._refcounts),
+                'subscribed': len(self._subscribed),
+                'sources': {source: len(symbols) for source, symbols in self._demand.items()},
+                'frames_sent': self.frames_sent,
+            }
+
+
+# Global instance
+symbol_subscriptions = SymbolSubscriptionManager(
+    symbols_per_message=getattr(settings, 'FYERS_WS_SYMBOLS_PER_MESSAGE', 100),
+    flush_interval=getattr(settings, 'FYERS_WS_SUBSCRIPTION_INTERVAL', 1.0),
+    check_interval=getattr(settings, 'WATCHED_SYMBOLS_CHECK_INTERVAL', 5.0),
+    # Push clients live in the web workers when run_market_feed holds the websocket
+    shared_clients=getattr(settings, 'MARKET_DATA_INGESTION', 'thread') == 'command',
+)
@@ -0,0 +1,21 @@
+"""Conversions between Stock.symbol values and Fyers instrument symbols"""
+
+DEFAULT_EXCHANGE = 'NSE'
+DEFAULT_SERIES = 'EQ'
+
+
+def to_fyers_symbol(symbol, exchange=DEFAULT_EXCHANGE, series=DEFAULT_SERIES):
+    """'RELIANCE' -> 'NSE:RELIANCE-EQ'"""
+    return f"{exchange}:{symbol}-{series}"
+
+
+def to_stock_symbol(fyers_symbol):
+    """
+    'NSE:RELIANCE-EQ' -> 'RELIANCE'. Returns None for instruments that are
+    not equities, such as 'NSE:NIFTY50-INDEX'.
+    """
+    _, _, name = fyers_symbol.rpartition(':')
+    name, dash, series = name.rpartition('-')
+    if not dash or series != DEFAULT_SERIES:
+        return None
+    return name
@@ -0,0 +1,170 @@
+import threading
+import time
+import logging
+from collections import deque
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+BACKPRESSURE_BLOCK = 'block'
+BACKPRESSURE_DROP_OLDEST = 'drop_oldest'
+BACKPRESSURE_COALESCE = 'coalesce'
+BACKPRESSURE_MODES = (BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_OLDEST, BACKPRESSURE_COALESCE)
+
+
+def write_ticks(ticks):
+    """Default sink: insert a batch of ticks into the day-partitioned tick tables and refresh LatestStockPrice"""
+    from ..models import LatestStockPrice
+    from .tick_partitions import tick_partitions
+    tick_partitions.write(ticks)
+    LatestStockPrice.upsert_from_quotes(ticks)
+
+
+class TickBuffer:
+    """
+    Bounded in-memory buffer between the websocket thread and the database.
+
+    Ticks are queued with put() and written by a dedicated flusher thread in
+    batches of at most batch_size, either as soon as a full batch is waiting
+    or every flush_interval seconds. When the buffer is full the backpressure
+    mode decides what happens to a new tick:
+
+    - 'block': wait up to block_timeout seconds for space, then drop the tick
+    - 'drop_oldest': discard the oldest queued tick
+    - 'coalesce': replace the queued tick for the same symbol, falling back
+      to discarding the oldest tick if that symbol has nothing queued
+    """
+
+    def __init__(self, sink=None, capacity=10000, batch_size=500, flush_interval=1.0,
+                 backpressure=BACKPRESSURE_DROP_OLDEST, block_timeout=1.0):
+        if backpressure not in BACKPRESSURE_MODES:
+            raise ValueError(f"Unknown backpressure mode: {backpressure}")
+        self.sink = sink or write_ticks
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self.block_timeout = block_timeout
+
+        # Each queued entry is a one-item list so a coalesced tick can be
+        # swapped in place without losing its position in the queue.
+        self._queue = deque()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._thread = None
+        self._running = False
+
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+
+    def put(self, tick):
+        """Queue a tick for writing; returns False if the tick was dropped"""
+        symbol = tick.get('symbol')
+        with self._lock:
+            self.queued += 1
+            if len(self._queue) >= self.capacity:
+                if self.backpressure == BACKPRESSURE_COALESCE and symbol in self._pending:
+                    # The superseded tick counts as dropped
+                    self._pending[symbol][0] = tick
+                    self.dropped += 1
+                    return True
+                if not self._make_room():
+                    self.dropped += 1
+                    return False
+
+            entry = [tick]
+            self._queue.append(entry)
+            self._pending[symbol] = entry
+            if len(self._queue) >= self.batch_size:
+                self._not_empty.notify()
+            return True
+
+    def _make_room(self):
+        """Apply the backpressure policy to a full buffer (lock held)"""
+        if self.backpressure == BACKPRESSURE_BLOCK:
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._queue) >= self.capacity:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return False
+                self._not_full.wait(remaining)
+            return True
+
+        self._popleft()
+        self.dropped += 1
+        return True
+
+    def _popleft(self):
+        entry = self._queue.popleft()
+        symbol = entry[0].get('symbol')
+        if self._pending.get(symbol) is entry:
+            del self._pending[symbol]
+        return entry[0]
+
+    def _take_batch(self):
+        with self._lock:
+            batch = [self._popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if batch:
+                self._not_full.notify_all()
+            return batch
+
+    def flush(self):
+        """Write everything currently queued; returns the number of ticks written"""
+        written = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return written
+            try:
+                self.sink(batch)
+                written += len(batch)
+                with self._lock:
+                    self.flushed += len(batch)
+            except Exception as e:
+                logger.error(f"Error flushing {len(batch)} ticks: {str(e)}")
+                with self._lock:
+                    self.dropped += len(batch)
+
+    def _run(self):
+        while self._running:
+            with self._lock:
+                if len(self._queue) < self.batch_size:
+                    self._not_empty.wait(self.flush_interval)
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def start(self):
+        """Start the flusher thread"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='tick-buffer-flusher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the flusher thread and write whatever is still queued"""
+        with self._lock:
+            self._running = False
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        """Counters for monitoring the buffer"""
+        with self._lock:
+            return {
+                'queued': self.queued,
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'pending': len(self._queue),
+                'capacity': self.capacity,
+            }
@@ -0,0 +1,85 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TickCoalescer:
+    """
+    Keep only the newest tick per symbol and emit them once per interval.
+
+    offer() is called from the websocket thread and only replaces a dict
+    entry. A background thread hands the collected ticks to emit() as one
+    list every `interval` seconds, so a symbol ticking hundreds of times a
+    second produces at most one downstream write per interval while the
+    last tick before each emit is always delivered. An interval of 0
+    disables coalescing and every tick is emitted immediately.
+    """
+
+    def __init__(self, emit, interval=0.25):
+        self.emit = emit
+        self.interval = interval
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.received = 0
+        self.emitted = 0
+
+    def offer(self, tick):
+        """Record a tick, superseding any pending tick for the same symbol"""
+        if self.interval <= 0:
+            self.received += 1
+            self._emit([tick])
+            return
+        with self._lock:
+            self._latest[tick['symbol']] = tick
+            self.received += 1
+
+    def drain(self):
+        """Emit the pending ticks now; returns how many were emitted"""
+        with self._lock:
+            if not self._latest:
+                return 0
+            ticks = list(self._latest.values())
+            self._latest = {}
+        self._emit(ticks)
+        return len(ticks)
+
+    def _emit(self, ticks):
+        try:
+            self.emit(ticks)
+            self.emitted += len(ticks)
+        except Exception as e:
+            logger.error(f"Error emitting {len(ticks)} coalesced ticks: {str(e)}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.drain()
+
+    def start(self):
+        """Start the periodic emitter thread"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='tick-coalescer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the emitter thread and emit whatever is still pending"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.drain()
+
+    def stats(self):
+        """Counters for monitoring the coalescer"""
+        with self._lock:
+            return {
+                'received': self.received,
+                'emitted': self.emitted,
+                'pending': len(self._latest),
+            }
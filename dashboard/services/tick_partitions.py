@@ -0,0 +1,258 @@
+import threading
+import logging
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db import connections, transaction, DatabaseError
+from django.utils import timezone
+from .ticks import Tick, TICK_FIELDS, as_tick
+
+logger = logging.getLogger(__name__)
+
+TICK_TABLE = 'dashboard_tick'
+
+# Trading days are calendar days on the exchange's clock
+TRADING_TIME_ZONE = ZoneInfo(getattr(settings, 'TICK_PARTITION_TIME_ZONE', 'Asia/Kolkata'))
+
+ROLLUP_BATCH_SIZE = 1000
+
+
+def trading_day(timestamp):
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp.astimezone(TRADING_TIME_ZONE).date()
+
+
+def day_bounds(day):
+    """Aware [start, end) of a trading day"""
+    return (
+        datetime.combine(day, time.min, tzinfo=TRADING_TIME_ZONE),
+        datetime.combine(day + timedelta(days=1), time.min, tzinfo=TRADING_TIME_ZONE),
+    )
+
+
+class TickPartitions:
+    """
+    Tick storage partitioned by trading day.
+
+    On PostgreSQL the ticks live in a natively range-partitioned table with
+    one partition per day; elsewhere (SQLite) in one plain table per day.
+    Either way each day has its own (symbol, timestamp) index that stops
+    growing when the day ends, and old days are removed by dropping their
+    table instead of deleting rows. Columns mirror StockQuote.
+
+    write() routes each tick to its day's partition, creating it on first
+    use. rollup() fills in a day's IntradayBar rows of every intraday
+    resolution and expire() rolls up and drops the days outside the
+    retention window.
+    """
+
+    def __init__(self, using='default', table=TICK_TABLE):
+        self.using = using
+        self.table = table
+        self._known = set()
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    @property
+    def native(self):
+        """Whether the database partitions natively (PostgreSQL)"""
+        return self.connection.vendor == 'postgresql'
+
+    def partition_name(self, day):
+        return f"{self.table}_{day:%Y%m%d}"
+
+    def partitions(self):
+        """Days that have a partition, oldest first"""
+        prefix = f"{self.table}_"
+        days = []
+        for name in self.connection.introspection.table_names():
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and len(suffix) == 8 and suffix.isdigit():
+                days.append(datetime.strptime(suffix, '%Y%m%d').date())
+        return sorted(days)
+
+    def _columns_sql(self):
+        from ..models import StockQuote
+
+        quote = self.connection.ops.quote_name
+        return ', '.join(
+            f"{quote(name)} {StockQuote._meta.get_field(name).db_type(self.connection)} NOT NULL"
+            for name in TICK_FIELDS
+        )
+
+    def ensure_partition(self, day):
+        """Create the partition for day if it does not exist yet"""
+        if day in self._known:
+            return
+        quote = self.connection.ops.quote_name
+        name = self.partition_name(day)
+        with self._lock, self.connection.cursor() as cursor:
+            if self.native:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(self.table)} ({self._columns_sql()}) "
+                    f"PARTITION BY RANGE ({quote('timestamp')})"
+                )
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {quote(self.table + '_symbol_ts')} "
+                    f"ON {quote(self.table)} ({quote('symbol')}, {quote('timestamp')})"
+                )
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(self.table)} "
+                    f"FOR VALUES FROM (%s) TO (%s)",
+                    day_bounds(day)
+                )
+            else:
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {quote(name)} ({self._columns_sql()})")
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {quote(name + '_symbol_ts')} "
+                    f"ON {quote(name)} ({quote('symbol')}, {quote('timestamp')})"
+                )
+            self._known.add(day)
+
+    def write(self, ticks):
+        """Insert ticks into their days' partitions; returns the number written"""
+        by_day = {}
+        for tick in ticks:
+            tick = as_tick(tick)
+            by_day.setdefault(trading_day(tick.timestamp), []).append(tick)
+
+        quote = self.connection.ops.quote_name
+        adapt = self.connection.ops.adapt_datetimefield_value
+        written = 0
+        for day, day_ticks in by_day.items():
+            self.ensure_partition(day)
+            sql = (
+                f"INSERT INTO {quote(self.partition_name(day))} ({', '.join(quote(name) for name in TICK_FIELDS)}) "
+                f"VALUES ({', '.join(['%s'] * len(TICK_FIELDS))})"
+            )
+            rows = [
+                (tick.symbol, tick.ltp, tick.change, tick.change_percentage, tick.volume, adapt(tick.timestamp))
+                for tick in day_ticks
+            ]
+            try:
+                with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+                    cursor.executemany(sql, rows)
+            except DatabaseError:
+                # The partition may have been dropped or rolled back; recreate it next time
+                self._known.discard(day)
+                raise
+            written += len(rows)
+        return written
+
+    def _to_datetime(self, value):
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if settings.USE_TZ and timezone.is_naive(value):
+            value = value.replace(tzinfo=dt_timezone.utc)
+        return value
+
+    def ticks(self, day, symbols=None):
+        """Ticks of one trading day ordered by symbol, then time"""
+        if day not in self.partitions():
+            return
+        quote = self.connection.ops.quote_name
+        sql = f"SELECT {', '.join(quote(name) for name in TICK_FIELDS)} FROM {quote(self.partition_name(day))}"
+        params = []
+        if symbols is not None:
+            symbols = list(symbols)
+            if not symbols:
+                return
+            sql += f" WHERE {quote('symbol')} IN ({', '.join(['%s'] * len(symbols))})"
+            params = symbols
+        sql += f" ORDER BY {quote('symbol')}, {quote('timestamp')}"
+        # Server-side on PostgreSQL, so a day of ticks is streamed rather than loaded
+        with self.connection.chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            for symbol, ltp, change, change_percentage, volume, timestamp in cursor:
+                yield Tick(symbol, ltp, change, change_percentage, volume, self._to_datetime(timestamp))
+
+    def latest_ticks(self):
+        """Newest tick per symbol in the most recent partition"""
+        days = self.partitions()
+        if not days:
+            return []
+        latest = {}
+        for tick in self.ticks(days[-1]):
+            latest[tick.symbol] = tick
+        return list(latest.values())
+
+    def is_rolled_up(self, day):
+        from ..models import TickRollup
+
+        return TickRollup.objects.filter(day=day).exists()
+
+    def _complete_bars(self, symbol, day):
+        """Keys of the complete bars stored for a symbol on a day"""
+        from ..models import IntradayBar
+
+        start, end = day_bounds(day)
+        return set(IntradayBar.objects.filter(
+            symbol=symbol, start__gte=start, start__lt=end, partial=False
+        ).values_list('resolution', 'start'))
+
+    def rollup(self, day, force=False):
+        """
+        Fill in a day's intraday bars of every resolution from its ticks.
+        Bars that are missing or partial, such as minutes lost to a restart
+        or dropped as late, are written; complete bars from the live candle
+        aggregator, which saw every tick rather than the stored coalesced
+        ones, are kept unless force is set. Each day is rolled up once
+        (recorded in TickRollup) unless force is set. Returns the number of
+        bars written.
+        """
+        from ..models import IntradayBar, TickRollup
+        from .candles import bars_from_ticks
+
+        if not force and self.is_rolled_up(day):
+            return 0
+        written = 0
+        batch = []
+        symbol = None
+        complete = set()
+        with transaction.atomic(using=self.using):
+            for bar in bars_from_ticks(self.ticks(day)):
+                if bar.symbol != symbol:
+                    symbol = bar.symbol
+                    complete = set() if force else self._complete_bars(symbol, day)
+                if (bar.resolution, bar.start) in complete:
+                    continue
+                batch.append(bar)
+                if len(batch) >= ROLLUP_BATCH_SIZE:
+                    written += IntradayBar.upsert(batch)
+                    batch = []
+            written += IntradayBar.upsert(batch)
+            TickRollup.objects.update_or_create(day=day, defaults={'bars': written})
+        logger.info(f"Rolled up {written} intraday bars for {day}")
+        return written
+
+    def drop_partition(self, day):
+        quote = self.connection.ops.quote_name
+        with self._lock, self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {quote(self.partition_name(day))}")
+            self._known.discard(day)
+
+    def expire(self, retain_days, today=None):
+        """
+        Keep the partitions of the last retain_days days, today (a trading
+        day) included; roll up, then drop, every older one. Returns the
+        dropped days.
+        """
+        today = today or trading_day(timezone.now())
+        cutoff = today - timedelta(days=max(retain_days, 1) - 1)
+        dropped = []
+        for day in self.partitions():
+            if day >= cutoff:
+                break
+            self.rollup(day)
+            self.drop_partition(day)
+            dropped.append(day)
+            logger.info(f"Dropped tick partition for {day}")
+        return dropped
+
+
+# Global instance
+tick_partitions = TickPartitions()
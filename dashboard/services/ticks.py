@@ -0,0 +1,139 @@
+import json
+from collections import namedtuple
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TICK_FIELDS = ('symbol', 'ltp', 'change', 'change_percentage', 'volume', 'timestamp')
+_FIELD_INDEX = {name: index for index, name in enumerate(TICK_FIELDS)}
+
+# tuple.__new__ builds a record in C, skipping the generated namedtuple __new__
+_new = tuple.__new__
+
+
+class Tick(namedtuple('Tick', TICK_FIELDS)):
+    """
+    Fixed-layout record of one quote update holding only the fields the
+    pipeline uses. The cache stores it as a plain tuple (see cache_value),
+    which pickles without per-field keys. tick['ltp'] and tick.get('ltp')
+    also work, letting code written for quote dicts read records unchanged,
+    but hot paths should use attributes or unpacking.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, _FIELD_INDEX[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        index = _FIELD_INDEX.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+
+def tick_from_message(data, now=None):
+    """Tick for a decoded websocket market data message (or a quote dict)"""
+    return _new(Tick, (
+        data['symbol'],
+        data.get('ltp', 0),
+        data.get('change', 0),
+        data.get('change_percentage', 0),
+        data.get('volume', 0),
+        data.get('timestamp') or now or timezone.now(),
+    ))
+
+
+def as_tick(quote):
+    """Tick for a Tick, a cached plain tuple or a quote dict"""
+    if isinstance(quote, Tick):
+        return quote
+    if isinstance(quote, tuple):
+        return _new(Tick, quote)
+    return tick_from_message(quote)
+
+
+def cache_value(tick):
+    """Compact cache representation of a Tick: a plain tuple, pickled natively"""
+    return tuple(tick)
+
+
+def as_quote_dict(quote):
+    """Quote dict for a Tick or cached tuple (dicts are returned as is)"""
+    if isinstance(quote, tuple):
+        return dict(zip(TICK_FIELDS, quote))
+    return quote
+
+
+def _loads_decoder(loads):
+    def decode(message, now=None):
+        data = loads(message)
+        try:
+            return _new(Tick, (
+                data['symbol'],
+                data.get('ltp', 0),
+                data.get('change', 0),
+                data.get('change_percentage', 0),
+                data.get('volume', 0),
+                now or timezone.now(),
+            ))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Not a tick message: {str(e)}")
+    return decode
+
+
+DECODERS = {'json': _loads_decoder(json.loads)}
+
+if orjson is not None:
+    DECODERS['orjson'] = _loads_decoder(orjson.loads)
+
+if msgspec is not None:
+    class TickMessage(msgspec.Struct):
+        """The fields of a market data message that are kept; others are skipped while parsing"""
+        symbol: str
+        ltp: float = 0.0
+        change: float = 0.0
+        change_percentage: float = 0.0
+        volume: int = 0
+
+    _message_decoder = msgspec.json.Decoder(TickMessage)
+
+    def _decode_msgspec(message, now=None):
+        try:
+            m = _message_decoder.decode(message)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e))
+        return _new(Tick, (m.symbol, m.ltp, m.change, m.change_percentage, m.volume, now or timezone.now()))
+
+    DECODERS['msgspec'] = _decode_msgspec
+
+
+def tick_decoder_name(name='auto'):
+    """Decoder name resolved from a TICK_DECODER value: 'auto' picks the fastest installed"""
+    if name == 'auto':
+        return next(choice for choice in ('msgspec', 'orjson', 'json') if choice in DECODERS)
+    return name
+
+
+def get_tick_decoder(name='auto'):
+    """
+    Decoder turning a raw websocket message (str or bytes) into a Tick,
+    raising ValueError for anything that is not a tick. 'auto' picks the
+    fastest installed of msgspec, orjson and the stdlib json module.
+    """
+    name = tick_decoder_name(name)
+    if name not in DECODERS:
+        raise ValueError(f"Tick decoder not available: {name}")
+    return DECODERS[name]
+
+
+# Decoder used on the hot path
+decode_tick = get_tick_decoder(getattr(settings, 'TICK_DECODER', 'auto'))
@@ -0,0 +1,237 @@
+import time
+import uuid
+import threading
+import logging
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from .symbols import to_stock_symbol
+from .subscriptions import worker_id
+from .panel_cache import invalidate_tags, portfolio_tag
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+
+VALUATION_INDEX_VERSION_KEY = 'valuation_index_version'
+VALUATION_WRITER_KEY = 'valuation_writer'
+
+
+class ValuationEngine:
+    """
+    Keep PortfolioHolding.current_value and Portfolio.total_value in step
+    with live prices.
+
+    The engine holds a reverse index from stock to the holdings of that
+    stock, so a tick only re-values the holdings (and portfolios) that
+    contain the ticking symbol. Portfolio totals are adjusted by the delta
+    of each changed holding rather than re-summed. Changed rows are written
+    back with bulk_update every flush_interval seconds.
+
+    Portfolio.total_value is the market value of the holdings, excluding
+    cash, which is what the dashboard's returns calculation expects.
+
+    Holdings change in whichever process serves the request, so
+    invalidations are published through the cache and every engine checks
+    for one at most every check_interval seconds, as the search index does.
+
+    With single_writer (thread ingestion, where every worker values the
+    same ticks) only the process holding a writer lease in the cache writes
+    back; the others keep their values in memory and discard their changes.
+    """
+
+    def __init__(self, flush_interval=5.0, batch_size=500, check_interval=5.0,
+                 single_writer=False, writer_lease=30.0):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.check_interval = check_interval
+        self.single_writer = single_writer
+        self.writer_lease = writer_lease
+        self.worker = worker_id()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._index_stale = True
+        self._version = None
+        self._checked_at = 0.0
+
+        self._stock_ids = {}            # Stock.symbol -> stock id
+        self._holdings_by_stock = {}    # stock id -> {holding id: (portfolio id, quantity)}
+        self._holding_values = {}       # holding id -> current value
+        self._portfolio_totals = {}     # portfolio id -> total value
+        self._dirty_holdings = set()
+        self._dirty_portfolios = set()
+
+        self.revalued = 0
+        self.written = 0
+
+    def invalidate(self):
+        """Rebuild this and every other process's holdings index before its next price update"""
+        cache.set(VALUATION_INDEX_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        self._index_stale = True
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if cache.get(VALUATION_INDEX_VERSION_KEY) != self._version:
+            self._index_stale = True
+
+    def load(self):
+        """Build the stock -> holdings index from the database"""
+        from ..models import PortfolioHolding
+
+        # Read before the holdings, so a change committed meanwhile triggers another load
+        version = cache.get(VALUATION_INDEX_VERSION_KEY)
+        holdings = PortfolioHolding.objects.values_list(
+            'id', 'portfolio_id', 'stock_id', 'stock__symbol', 'quantity', 'current_value'
+        )
+        stock_ids = {}
+        holdings_by_stock = {}
+        holding_portfolios = {}
+        holding_values = {}
+        for holding_id, portfolio_id, stock_id, symbol, quantity, current_value in holdings:
+            stock_ids[symbol] = stock_id
+            holdings_by_stock.setdefault(stock_id, {})[holding_id] = (portfolio_id, quantity)
+            holding_portfolios[holding_id] = portfolio_id
+            holding_values[holding_id] = current_value
+
+        with self._lock:
+            # Values still waiting to be written are newer than the database
+            for holding_id in self._dirty_holdings:
+                if holding_id in holding_values:
+                    holding_values[holding_id] = self._holding_values[holding_id]
+            portfolio_totals = {}
+            for holding_id, value in holding_values.items():
+                portfolio_id = holding_portfolios[holding_id]
+                portfolio_totals[portfolio_id] = portfolio_totals.get(portfolio_id, Decimal('0')) + value
+            self._stock_ids = stock_ids
+            self._holdings_by_stock = holdings_by_stock
+            self._holding_values = holding_values
+            self._portfolio_totals = portfolio_totals
+            self._dirty_holdings &= set(holding_values)
+            self._dirty_portfolios &= set(portfolio_totals)
+            self._index_stale = False
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def on_prices(self, ticks):
+        """Re-value holdings of the stocks in a batch of ticks"""
+        self._check_version()
+        if self._index_stale:
+            self.load()
+        with self._lock:
+            for tick in ticks:
+                stock_id = self._stock_ids.get(to_stock_symbol(tick['symbol']))
+                holdings = self._holdings_by_stock.get(stock_id)
+                if not holdings:
+                    continue
+                price = Decimal(str(tick['ltp']))
+                for holding_id, (portfolio_id, quantity) in holdings.items():
+                    value = (quantity * price).quantize(CENT)
+                    previous = self._holding_values[holding_id]
+                    if value == previous:
+                        continue
+                    self._holding_values[holding_id] = value
+                    self._portfolio_totals[portfolio_id] += value - previous
+                    self._dirty_holdings.add(holding_id)
+                    self._dirty_portfolios.add(portfolio_id)
+                    self.revalued += 1
+
+    def owns_writes(self):
+        """Whether this process writes valuations back, taking or renewing the writer lease"""
+        if not self.single_writer:
+            return True
+        if cache.add(VALUATION_WRITER_KEY, self.worker, timeout=self.writer_lease):
+            return True
+        if cache.get(VALUATION_WRITER_KEY) != self.worker:
+            return False
+        cache.touch(VALUATION_WRITER_KEY, self.writer_lease)
+        return True
+
+    def flush(self):
+        """Write changed holding and portfolio values; returns rows written"""
+        from ..models import Portfolio, PortfolioHolding
+
+        if not self.owns_writes():
+            # The lease holder writes the same values from the same ticks
+            with self._lock:
+                self._dirty_holdings = set()
+                self._dirty_portfolios = set()
+            return 0
+
+        with self._lock:
+            holdings = [
+                PortfolioHolding(id=holding_id, current_value=self._holding_values[holding_id])
+                for holding_id in self._dirty_holdings
+            ]
+            portfolios = [
+                Portfolio(id=portfolio_id, total_value=self._portfolio_totals[portfolio_id])
+                for portfolio_id in self._dirty_portfolios
+            ]
+            self._dirty_holdings = set()
+            self._dirty_portfolios = set()
+
+        if not holdings and not portfolios:
+            return 0
+        try:
+            with transaction.atomic():
+                PortfolioHolding.objects.bulk_update(holdings, ['current_value'], batch_size=self.batch_size)
+                Portfolio.objects.bulk_update(portfolios, ['total_value'], batch_size=self.batch_size)
+        except Exception as e:
+            logger.error(f"Error writing portfolio valuations: {str(e)}")
+            with self._lock:
+                self._dirty_holdings.update(holding.id for holding in holdings)
+                self._dirty_portfolios.update(portfolio.id for portfolio in portfolios)
+            return 0
+        # Overview and holdings panels of these portfolios are stale now
+        invalidate_tags([portfolio_tag(portfolio.id) for portfolio in portfolios])
+        self.written += len(holdings) + len(portfolios)
+        return len(holdings) + len(portfolios)
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def start(self):
+        """Start the periodic writer thread"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='portfolio-valuation')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the writer thread and write pending valuations"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        if self.single_writer and cache.get(VALUATION_WRITER_KEY) == self.worker:
+            cache.delete(VALUATION_WRITER_KEY)
+
+    def stats(self):
+        """Counters for monitoring the engine"""
+        with self._lock:
+            return {
+                'holdings': len(self._holding_values),
+                'portfolios': len(self._portfolio_totals),
+                'revalued': self.revalued,
+                'written': self.written,
+                'pending': len(self._dirty_holdings) + len(self._dirty_portfolios),
+            }
+
+
+# Global instance
+valuation_engine = ValuationEngine(
+    flush_interval=getattr(settings, 'PORTFOLIO_VALUATION_INTERVAL', 5.0),
+    check_interval=getattr(settings, 'VALUATION_INDEX_CHECK_INTERVAL', 5.0),
+    single_writer=getattr(settings, 'MARKET_DATA_INGESTION', 'thread') == 'thread',
+    writer_lease=getattr(settings, 'VALUATION_WRITER_LEASE', 30.0),
+)
@@ -0,0 +1,145 @@
+import time
+import random
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0, rng=random):
+    """
+    Jittered exponential backoff: a uniform delay between base and
+    base * 2 ** attempt seconds, capped at cap. Jitter spreads out the
+    reconnects of many processes that lost the connection together.
+    """
+    ceiling = min(cap, base * 2 ** attempt)
+    return rng.uniform(min(base, ceiling), ceiling)
+
+
+class ConnectionSupervisor:
+    """
+    Own the lifecycle of one long-lived connection, such as a websocket.
+
+    A single supervisor thread creates the connection with connect(), runs
+    its blocking run_forever(**run_kwargs) on a worker thread and waits for
+    it to end before creating the next, so there is never more than one
+    live connection. Connection callbacks must not reconnect themselves;
+    they only need to call touch() whenever data (or a pong) arrives.
+
+    If nothing arrives for heartbeat_timeout seconds the connection is
+    treated as stale and closed. After a connection ends the supervisor
+    waits a jittered exponential backoff before reconnecting; the backoff
+    resets once a connection has stayed up for stable_after seconds.
+    Subscriptions are replayed by the connection's own open handler.
+    """
+
+    def __init__(self, connect, run_kwargs=None, base_delay=1.0, max_delay=60.0, heartbeat_timeout=30.0,
+                 stable_after=60.0, check_interval=1.0, name='connection-supervisor'):
+        self.connect = connect
+        self.run_kwargs = run_kwargs or {}
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.heartbeat_timeout = heartbeat_timeout
+        self.stable_after = stable_after
+        self.check_interval = check_interval
+        self.name = name
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._connection = None
+        self._last_seen = 0.0
+
+        self.connects = 0
+        self.failures = 0
+        self.stale_closes = 0
+
+    @property
+    def connection(self):
+        """The live connection, if any"""
+        return self._connection
+
+    def touch(self):
+        """Record that the connection delivered something"""
+        self._last_seen = time.monotonic()
+
+    def _is_stale(self):
+        return bool(self.heartbeat_timeout) and time.monotonic() - self._last_seen > self.heartbeat_timeout
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception as e:
+            logger.error(f"{self.name}: error closing connection: {str(e)}")
+
+    def _run_once(self):
+        """Create and run one connection until it ends; returns how long it lasted"""
+        started = time.monotonic()
+        try:
+            connection = self.connect()
+        except Exception as e:
+            logger.error(f"{self.name}: connect failed: {str(e)}")
+            return 0.0
+
+        self._connection = connection
+        self.connects += 1
+        self.touch()
+        runner = threading.Thread(
+            target=connection.run_forever, kwargs=self.run_kwargs, name=f'{self.name}-run', daemon=True
+        )
+        runner.start()
+        closing = False
+        while runner.is_alive():
+            runner.join(self.check_interval)
+            if closing or not runner.is_alive():
+                continue
+            if self._stop_event.is_set():
+                closing = True
+                self._close(connection)
+            elif self._is_stale():
+                logger.warning(f"{self.name}: no data for {self.heartbeat_timeout}s, closing stale connection")
+                self.stale_closes += 1
+                closing = True
+                self._close(connection)
+        self._connection = None
+        return time.monotonic() - started
+
+    def _run(self):
+        attempt = 0
+        while not self._stop_event.is_set():
+            lifetime = self._run_once()
+            if self._stop_event.is_set():
+                break
+            if lifetime >= self.stable_after:
+                attempt = 0
+            self.failures += 1
+            delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+            attempt += 1
+            logger.info(f"{self.name}: reconnecting in {delay:.1f}s (attempt {attempt})")
+            self._stop_event.wait(delay)
+
+    def start(self):
+        """Start the supervisor thread; calling it again is a no-op"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Close the connection and stop reconnecting"""
+        self._stop_event.set()
+        connection = self._connection
+        if connection is not None:
+            self._close(connection)
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        """Counters for monitoring the supervisor"""
+        return {
+            'connected': self._connection is not None,
+            'connects': self.connects,
+            'failures': self.failures,
+            'stale_closes': self.stale_closes,
+        }
@@ -0,0 +1,106 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.db import transaction
+from .models import (
+    Stock, StockPrice, StockQuote, LatestStockPrice, Portfolio, PortfolioHolding,
+    Transaction, PortfolioPerformance, AssetAllocation, Watchlist
+)
+from .services.valuation import valuation_engine
+from .services.search_index import stock_search_index
+from .services.subscriptions import symbol_subscriptions
+from .services.panel_cache import (
+    invalidate_on_commit, portfolio_tag, transactions_tag, allocation_tag,
+    performance_tag, stock_tag, watchlists_tag
+)
+
+
+@receiver(post_save, sender=StockPrice)
+def update_latest_price_from_bar(sender, instance, **kwargs):
+    """Keep LatestStockPrice current when a daily bar is saved"""
+    LatestStockPrice.upsert_from_prices([instance])
+
+
+@receiver(post_save, sender=StockQuote)
+def update_latest_price_from_quote(sender, instance, **kwargs):
+    """Keep LatestStockPrice current when a single quote is saved"""
+    LatestStockPrice.upsert_from_quotes([instance])
+
+
+@receiver(post_save, sender=PortfolioHolding)
+@receiver(post_delete, sender=PortfolioHolding)
+def invalidate_valuation_index(sender, instance, **kwargs):
+    """Holdings changed, so every process's valuation stock -> holdings index is stale"""
+    transaction.on_commit(valuation_engine.invalidate)
+    transaction.on_commit(symbol_subscriptions.mark_stale)
+    invalidate_on_commit([portfolio_tag(instance.portfolio_id)])
+
+
+# Panel cache invalidation
+
+@receiver(post_save, sender=Portfolio)
+@receiver(post_delete, sender=Portfolio)
+def invalidate_portfolio_panels(sender, instance, **kwargs):
+    invalidate_on_commit([portfolio_tag(instance.pk)])
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_transaction_panels(sender, instance, **kwargs):
+    invalidate_on_commit([transactions_tag(instance.portfolio_id)])
+
+
+@receiver(post_save, sender=PortfolioPerformance)
+@receiver(post_delete, sender=PortfolioPerformance)
+def invalidate_performance_panels(sender, instance, **kwargs):
+    invalidate_on_commit([
+        performance_tag(instance.portfolio_id),
+        performance_tag(instance.portfolio_id, instance.date),
+    ])
+
+
+@receiver(post_save, sender=AssetAllocation)
+@receiver(post_delete, sender=AssetAllocation)
+def invalidate_allocation_panels(sender, instance, **kwargs):
+    invalidate_on_commit([allocation_tag(instance.portfolio_id)])
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_stock_panels(sender, instance, **kwargs):
+    invalidate_on_commit([stock_tag(instance.pk)])
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_search_index(sender, instance, **kwargs):
+    """Stocks changed, so every process's search index is stale"""
+    transaction.on_commit(stock_search_index.invalidate)
+
+
+@receiver(post_save, sender=Watchlist)
+@receiver(post_delete, sender=Watchlist)
+def invalidate_watchlist_panels(sender, instance, **kwargs):
+    if instance.created_by_id:
+        invalidate_on_commit([watchlists_tag(instance.created_by_id)])
+
+
+@receiver(post_delete, sender=Watchlist)
+def refresh_watched_symbols(sender, instance, **kwargs):
+    """Deleting a watchlist cascades to its stock rows without m2m_changed"""
+    transaction.on_commit(symbol_subscriptions.mark_stale)
+
+
+@receiver(m2m_changed, sender=Watchlist.stocks.through)
+def invalidate_watchlist_stock_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    """Stock counts changed for the owners of the affected watchlists"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    # The streamed symbol set follows watchlist contents
+    transaction.on_commit(symbol_subscriptions.mark_stale)
+    if not reverse:
+        owners = [instance.created_by_id]
+    elif action == 'pre_clear':
+        owners = instance.watchlists.values_list('created_by_id', flat=True)
+    else:
+        owners = Watchlist.objects.filter(pk__in=pk_set).values_list('created_by_id', flat=True)
+    invalidate_on_commit([watchlists_tag(user_id) for user_id in set(owners) if user_id])
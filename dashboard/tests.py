@@ -1,3 +1,1467 @@
-from django.test import TestCase
+import json
+import asyncio
+import numpy as np
+import pandas as pd
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from decimal import Decimal
+from django.core.cache import cache
+from io import StringIO
+from django.db import connection
+from django.core.management import call_command, CommandError
+from asgiref.sync import async_to_sync
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User
+from .models import (
+    Stock, StockPrice, LatestStockPrice, IntradayBar, Portfolio, PortfolioHolding,
+    Transaction, Watchlist, PortfolioPerformance
+)
+from .services.tick_buffer import TickBuffer
+from .services.tick_coalescer import TickCoalescer
+from .services.quote_table import QuoteTable
+from .services.quote_cache import get_quotes, quote_cache_key
+from .services.fyers_client import FyersClient
+from .services.ohlcv_store import OHLCVStore
+from .services.valuation import ValuationEngine
+from .services.dashboard_data import DASHBOARD_QUERY_BUDGET, holdings_panel
+from .services.panel_cache import get_panel, invalidate_tags
+from .services.stock_universe import parse_equity_list, sync_stocks
+from .services.price_backfill import FixtureHistorySource, backfill_prices
+from .services.sample_market import simulate_ohlcv
+from .services.search_index import StockSearchIndex, stock_search_index
+from .services.live_prices import live_prices
+from .services.quote_hub import QuoteHub, quote_hub
+from .services.subscriptions import SymbolSubscriptionManager
+from .services.ws_supervisor import ConnectionSupervisor, backoff_delay
+from .services.market_feed import MarketFeed, publish_quotes
+from .services.ticks import DECODERS, Tick, get_tick_decoder, tick_decoder_name
+from .services.tick_partitions import TickPartitions, TRADING_TIME_ZONE, tick_partitions, trading_day
+from .services.quote_relay import QuoteRelay
+from .services.candles import CandleAggregator, intraday_candles
 
-# Create your tests here.
+
+def make_tick(symbol, ltp=100, volume=1000):
+    return {
+        'symbol': symbol,
+        'ltp': ltp,
+        'change': 1,
+        'change_percentage': 1,
+        'volume': volume,
+        'timestamp': timezone.now(),
+    }
+
+
+class TickBufferTests(TestCase):
+    def test_flush_writes_in_batches(self):
+        batches = []
+        buffer = TickBuffer(sink=batches.append, batch_size=3)
+        for i in range(7):
+            buffer.put(make_tick(f"NSE:S{i}-EQ"))
+        self.assertEqual(buffer.flush(), 7)
+        self.assertEqual([len(b) for b in batches], [3, 3, 1])
+        self.assertEqual(buffer.stats()['flushed'], 7)
+
+    def test_drop_oldest_when_full(self):
+        batches = []
+        buffer = TickBuffer(sink=batches.append, capacity=2, backpressure='drop_oldest')
+        for symbol in ['A', 'B', 'C']:
+            buffer.put(make_tick(symbol))
+        buffer.flush()
+        self.assertEqual([t['symbol'] for t in batches[0]], ['B', 'C'])
+        self.assertEqual(buffer.stats()['dropped'], 1)
+
+    def test_coalesce_replaces_pending_tick_for_symbol(self):
+        batches = []
+        buffer = TickBuffer(sink=batches.append, capacity=2, backpressure='coalesce')
+        buffer.put(make_tick('A', ltp=1))
+        buffer.put(make_tick('B', ltp=1))
+        buffer.put(make_tick('A', ltp=2))
+        buffer.flush()
+        self.assertEqual([(t['symbol'], t['ltp']) for t in batches[0]], [('A', 2), ('B', 1)])
+        stats = buffer.stats()
+        self.assertEqual((stats['queued'], stats['flushed'], stats['dropped']), (3, 2, 1))
+
+    def test_block_drops_after_timeout_when_not_drained(self):
+        writing = threading.Event()
+        release = threading.Event()
+
+        def stuck_sink(ticks):
+            writing.set()
+            release.wait(5)
+
+        buffer = TickBuffer(sink=stuck_sink, capacity=1, batch_size=1, flush_interval=0.01,
+                            backpressure='block', block_timeout=0.05)
+        buffer.start()
+        self.addCleanup(buffer.stop)
+        self.addCleanup(release.set)
+        self.assertTrue(buffer.put(make_tick('A')))
+        self.assertTrue(writing.wait(5))
+        # The flusher is stuck writing A, so B fills the buffer and C waits, then drops
+        self.assertTrue(buffer.put(make_tick('B')))
+        started = time.monotonic()
+        self.assertFalse(buffer.put(make_tick('C')))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(buffer.stats()['dropped'], 1)
+
+
+class TickCoalescerTests(TestCase):
+    def test_keeps_only_newest_tick_per_symbol(self):
+        emitted = []
+        coalescer = TickCoalescer(emitted.extend, interval=0.25)
+        for ltp in range(100):
+            coalescer.offer(make_tick('NSE:RELIANCE-EQ', ltp=ltp))
+        coalescer.offer(make_tick('NSE:TCS-EQ', ltp=5))
+        self.assertEqual(coalescer.drain(), 2)
+        self.assertEqual({t['symbol']: t['ltp'] for t in emitted}, {'NSE:RELIANCE-EQ': 99, 'NSE:TCS-EQ': 5})
+        self.assertEqual(coalescer.drain(), 0)
+
+    def test_stop_emits_final_state(self):
+        emitted = []
+        coalescer = TickCoalescer(emitted.extend, interval=60)
+        coalescer.start()
+        coalescer.offer(make_tick('NSE:INFY-EQ', ltp=1500))
+        coalescer.stop()
+        self.assertEqual([t['ltp'] for t in emitted], [1500])
+
+    def test_zero_interval_passes_every_tick_through(self):
+        emitted = []
+        coalescer = TickCoalescer(emitted.extend, interval=0)
+        coalescer.offer(make_tick('A', ltp=1))
+        coalescer.offer(make_tick('A', ltp=2))
+        self.assertEqual([t['ltp'] for t in emitted], [1, 2])
+
+
+class QuoteTableTests(TestCase):
+    def test_snapshot_returns_aligned_columns(self):
+        table = QuoteTable(capacity=2)
+        table.update_many([make_tick(f"NSE:S{i}-EQ", ltp=i, volume=i * 10) for i in range(5)])
+        table.update(make_tick('NSE:S1-EQ', ltp=42, volume=11))
+        snap = table.snapshot(['NSE:S3-EQ', 'NSE:MISSING-EQ', 'NSE:S1-EQ'])
+        self.assertEqual(snap['found'].tolist(), [True, False, True])
+        self.assertEqual(snap['ltp'].tolist(), [3, 0, 42])
+        self.assertEqual(snap['volume'].tolist(), [30, 0, 11])
+        self.assertEqual(len(table), 5)
+
+    def test_get_many_skips_unknown_symbols(self):
+        table = QuoteTable()
+        tick = make_tick('NSE:TCS-EQ', ltp=Decimal('3500.25'))
+        table.update(tick)
+        quotes = table.get_many(['NSE:TCS-EQ', 'NSE:INFY-EQ'])
+        self.assertEqual(list(quotes), ['NSE:TCS-EQ'])
+        self.assertEqual(quotes['NSE:TCS-EQ']['ltp'], 3500.25)
+        self.assertEqual(quotes['NSE:TCS-EQ']['timestamp'].timestamp(), tick['timestamp'].timestamp())
+
+    def test_new_symbol_is_not_visible_before_its_values(self):
+        readers, seen = [], []
+
+        class ObservedTable(QuoteTable):
+            def _row_for(self, symbol):
+                row = super()._row_for(symbol)
+                # A reader arriving between interning and writing must not see an empty row
+                reader = threading.Thread(target=lambda: seen.append(self.get_many([symbol])))
+                reader.start()
+                reader.join(0.05)
+                readers.append(reader)
+                return row
+
+        table = ObservedTable()
+        table.update(make_tick('NSE:NEW-EQ', ltp=7))
+        readers[0].join(5)
+        self.assertEqual(seen[0]['NSE:NEW-EQ']['ltp'], 7)
+
+    def test_reader_falls_back_to_the_lock_after_retries(self):
+        table = QuoteTable()
+        table.update(make_tick('NSE:TCS-EQ', ltp=5))
+        table._seq += 1  # a sequence that never settles, as under a constant stream of writes
+        self.assertEqual(table.get_many(['NSE:TCS-EQ'])['NSE:TCS-EQ']['ltp'], 5)
+
+
+class QuoteCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.fetched = []
+
+    def fetch(self, symbols):
+        self.fetched.append(list(symbols))
+        return {'s': 'ok', 'd': [
+            {'n': symbol, 's': 'ok', 'v': {'lp': 10, 'ch': 1, 'chp': 10, 'volume': 5}}
+            for symbol in symbols if symbol != 'NSE:UNKNOWN-EQ'
+        ]}
+
+    def test_fetches_only_misses_in_one_call(self):
+        cache.set(quote_cache_key('NSE:TCS-EQ'), make_tick('NSE:TCS-EQ', ltp=3500))
+        quotes, missing = get_quotes(['NSE:TCS-EQ', 'NSE:INFY-EQ', 'NSE:UNKNOWN-EQ'], fetch=self.fetch)
+        self.assertEqual(self.fetched, [['NSE:INFY-EQ', 'NSE:UNKNOWN-EQ']])
+        self.assertEqual(quotes['NSE:TCS-EQ']['ltp'], 3500)
+        self.assertEqual(quotes['NSE:INFY-EQ']['ltp'], 10)
+        self.assertEqual(missing, ['NSE:UNKNOWN-EQ'])
+
+        # Fetched quotes are cached for the next caller
+        get_quotes(['NSE:TCS-EQ', 'NSE:INFY-EQ'], fetch=self.fetch)
+        self.assertEqual(len(self.fetched), 1)
+
+    def test_stale_entries_are_refetched(self):
+        tick = make_tick('NSE:TCS-EQ', ltp=3500)
+        tick['timestamp'] = timezone.now() - timedelta(seconds=30)
+        cache.set(quote_cache_key('NSE:TCS-EQ'), tick)
+        quotes, _ = get_quotes(['NSE:TCS-EQ'], max_age=60, fetch=self.fetch)
+        self.assertEqual(quotes['NSE:TCS-EQ']['ltp'], 3500)
+        quotes, _ = get_quotes(['NSE:TCS-EQ'], max_age=10, fetch=self.fetch)
+        self.assertEqual(quotes['NSE:TCS-EQ']['ltp'], 10)
+
+
+class StubFyersHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits.append(self.path)
+            server.client_ports.add(self.client_address[1])
+        time.sleep(server.delay)
+        body = json.dumps({'s': 'ok', 'd': [{'n': 'NSE:TCS-EQ', 's': 'ok', 'v': {'lp': 3500}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FyersClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubFyersHandler)
+        self.server.lock = threading.Lock()
+        self.server.hits = []
+        self.server.client_ports = set()
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = FyersClient(
+            base_url=f"http://127.0.0.1:{self.server.server_port}", app_id='APP', access_token='TOKEN'
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_concurrent_identical_requests_share_one_upstream_call(self):
+        self.server.delay = 0.2
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.client.get_quotes(['NSE:TCS-EQ'])))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.server.hits), 1)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.client.stats()['shared_calls'], 4)
+
+    def test_sequential_requests_reuse_connection(self):
+        for _ in range(3):
+            self.client.get_quotes(['NSE:TCS-EQ'])
+        self.assertEqual(len(self.server.hits), 3)
+        self.assertEqual(len(self.server.client_ports), 1)
+
+
+def make_price(stock, date, close):
+    return StockPrice.objects.create(
+        stock=stock, date=date, open_price=close, high_price=close, low_price=close,
+        close_price=close, adjusted_close=close, volume=1000
+    )
+
+
+class LatestPricesTests(TestCase):
+    def test_single_query_for_many_stocks(self):
+        today = timezone.now().date()
+        stocks = [
+            Stock.objects.create(symbol=f'S{i}', name=f'Stock {i}', isin=f'ISIN{i:08d}')
+            for i in range(4)
+        ]
+        for i, stock in enumerate(stocks[:3]):
+            for day in range(3):
+                make_price(stock, today - timedelta(days=day), Decimal(i * 10 + day))
+
+        with self.assertNumQueries(1):
+            latest = StockPrice.get_latest_prices(stocks)
+        self.assertEqual(
+            {stock_id: price.close_price for stock_id, price in latest.items()},
+            {stocks[0].id: 0, stocks[1].id: 10, stocks[2].id: 20}
+        )
+        self.assertEqual(StockPrice.get_latest_prices(Stock.objects.filter(symbol='S1')), {stocks[1].id: latest[stocks[1].id]})
+
+
+class LatestStockPriceTests(TestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(symbol='RELIANCE', name='Reliance Industries', isin='INE002A01018')
+        self.today = timezone.now().date()
+
+    def test_stock_price_save_updates_latest_price(self):
+        make_price(self.stock, self.today - timedelta(days=1), Decimal('2500'))
+        make_price(self.stock, self.today - timedelta(days=2), Decimal('2400'))
+        stock = Stock.objects.select_related('latest_price').get(pk=self.stock.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(stock.current_price, Decimal('2500'))
+
+    def test_newer_live_quote_wins_and_older_is_ignored(self):
+        make_price(self.stock, self.today - timedelta(days=1), Decimal('2500'))
+        LatestStockPrice.upsert_from_quotes([make_tick('NSE:RELIANCE-EQ', ltp=Decimal('2550.25'))])
+        self.assertEqual(LatestStockPrice.objects.get(stock=self.stock).source, 'live')
+
+        stale = make_tick('NSE:RELIANCE-EQ', ltp=Decimal('1'))
+        stale['timestamp'] -= timedelta(days=3)
+        self.assertEqual(LatestStockPrice.upsert_from_quotes([stale, make_tick('NSE:NIFTY50-INDEX')]), 0)
+        self.assertEqual(Stock.objects.get(pk=self.stock.pk).current_price, Decimal('2550.25'))
+
+    def test_stock_without_price(self):
+        self.assertIsNone(self.stock.current_price)
+
+
+class ValuationEngineTests(TestCase):
+    def setUp(self):
+        self.tcs = Stock.objects.create(symbol='TCS', name='Tata Consultancy Services', isin='INE467B01029')
+        self.infy = Stock.objects.create(symbol='INFY', name='Infosys', isin='INE009A01021')
+        self.portfolios = []
+        for i in range(2):
+            portfolio = Portfolio.objects.create(user=User.objects.create(username=f'user{i}'))
+            for stock in (self.tcs, self.infy):
+                PortfolioHolding.objects.create(
+                    portfolio=portfolio, stock=stock, quantity=Decimal(i + 1), average_cost=100,
+                    total_invested=100 * (i + 1), current_value=100 * (i + 1)
+                )
+            self.portfolios.append(portfolio)
+
+    def test_revalues_only_holdings_of_ticking_stock(self):
+        engine = ValuationEngine()
+        engine.on_prices([make_tick('NSE:TCS-EQ', ltp=150), make_tick('NSE:SBIN-EQ', ltp=500)])
+        self.assertEqual(engine.stats()['revalued'], 2)
+        with self.assertNumQueries(4):  # atomic savepoint pair plus one UPDATE per table
+            self.assertEqual(engine.flush(), 4)
+
+        values = dict(PortfolioHolding.objects.filter(stock=self.tcs).values_list('portfolio_id', 'current_value'))
+        self.assertEqual(values, {self.portfolios[0].id: 150, self.portfolios[1].id: 300})
+        self.assertEqual(
+            sorted(Portfolio.objects.values_list('total_value', flat=True)), [Decimal('250'), Decimal('500')]
+        )
+        self.assertEqual(PortfolioHolding.objects.get(portfolio=self.portfolios[0], stock=self.infy).current_value, 100)
+        self.assertEqual(engine.flush(), 0)
+
+    def test_holding_changes_in_another_process_reload_the_index(self):
+        cache.clear()
+        engine = ValuationEngine(check_interval=60)
+        engine.on_prices([make_tick('NSE:TCS-EQ', ltp=150)])
+        engine.flush()
+
+        # The signal invalidates the global engine, standing in for another process's
+        with self.captureOnCommitCallbacks(execute=True):
+            PortfolioHolding.objects.filter(portfolio=self.portfolios[0], stock=self.tcs).update(quantity=10)
+            PortfolioHolding.objects.get(portfolio=self.portfolios[0], stock=self.tcs).save()
+        engine.on_prices([make_tick('NSE:TCS-EQ', ltp=160)])
+        self.assertEqual(engine.flush(), 4)  # still within check_interval, old quantities
+
+        engine.check_interval = 0
+        engine.on_prices([make_tick('NSE:TCS-EQ', ltp=170)])
+        engine.flush()
+        holding = PortfolioHolding.objects.get(portfolio=self.portfolios[0], stock=self.tcs)
+        self.assertEqual(holding.current_value, 1700)
+
+    def test_only_the_lease_holder_writes_with_single_writer(self):
+        cache.clear()
+        engines = [ValuationEngine(single_writer=True) for _ in range(2)]
+        engines[1].worker = 'other-host:1'
+        for engine in engines:
+            engine.on_prices([make_tick('NSE:TCS-EQ', ltp=150)])
+        self.assertEqual(engines[0].flush(), 4)
+        self.assertEqual(engines[1].flush(), 0)
+        self.assertEqual(engines[1].stats()['pending'], 0)
+
+        # The lease passes on when its holder stops
+        engines[0].stop()
+        engines[1].on_prices([make_tick('NSE:TCS-EQ', ltp=160)])
+        self.assertEqual(engines[1].flush(), 4)
+
+
+class DashboardQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='secret')
+        self.portfolio = Portfolio.objects.create(user=self.user, total_value=1000, cash_balance=500)
+        self.client.login(username='trader', password='secret')
+        self.stock_count = 0
+        cache.clear()
+
+    def add_data(self, count):
+        """Add stocks with holdings, transactions, watchlists and performance rows"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._add_data(count)
+
+    def _add_data(self, count):
+        today = timezone.localdate()
+        for i in range(self.stock_count, self.stock_count + count):
+            stock = Stock.objects.create(symbol=f'STK{i}', name=f'Stock {i}', isin=f'INE{i:09d}')
+            PortfolioHolding.objects.create(
+                portfolio=self.portfolio, stock=stock, quantity=1, average_cost=100,
+                total_invested=100, current_value=110
+            )
+            Transaction.objects.create(
+                portfolio=self.portfolio, stock=stock, transaction_type='BUY',
+                quantity=1, price_per_share=100, total_amount=100
+            )
+            watchlist = Watchlist.objects.create(name=f'List {i}', created_by=self.user)
+            watchlist.stocks.add(stock)
+            PortfolioPerformance.objects.create(
+                portfolio=self.portfolio, date=today - timedelta(days=i), total_value=1000,
+                daily_change=0, daily_change_percentage=0
+            )
+        self.stock_count += count
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_bounded_and_constant(self):
+        self.add_data(3)
+        small = self.count_queries()
+        self.add_data(40)
+        cache.clear()
+        self.assertEqual(self.count_queries(), small)
+        self.assertLessEqual(small, DASHBOARD_QUERY_BUDGET)
+
+    def test_cached_panels_skip_the_database(self):
+        self.add_data(3)
+        cold = self.count_queries()
+        self.assertEqual(self.count_queries(), 2)  # session and user only
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                portfolio=self.portfolio, stock=Stock.objects.first(), transaction_type='SELL',
+                quantity=1, price_per_share=120, total_amount=120
+            )
+        # Only the recent transactions panel is rebuilt
+        self.assertEqual(self.count_queries(), 3)
+        self.assertLess(self.count_queries(), cold)
+
+    def test_price_updates_invalidate_holdings(self):
+        self.add_data(2)
+        stock = Stock.objects.get(symbol='STK0')
+        self.assertIsNone(holdings_panel(self.user, self.portfolio.pk)[0].stock.current_price)
+        with self.captureOnCommitCallbacks(execute=True):
+            LatestStockPrice.upsert_from_quotes([make_tick('NSE:STK0-EQ', ltp=Decimal('123.45'))])
+        holdings = {h.stock_id: h for h in holdings_panel(self.user, self.portfolio.pk)}
+        self.assertEqual(holdings[stock.pk].stock.current_price, Decimal('123.45'))
+
+
+class PanelCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.rows = ['old']
+
+    def build(self, invalidate=False):
+        value = list(self.rows)
+        if invalidate:
+            # A write commits after the panel read its rows but before it is stored
+            self.rows = ['new']
+            invalidate_tags(['portfolio:1'])
+        return value, ['portfolio:1']
+
+    def test_invalidation_during_rebuild_is_not_lost(self):
+        self.assertEqual(get_panel('panel_1:test', self.build), ['old'])
+        invalidate_tags(['portfolio:1'])
+        self.assertEqual(get_panel('panel_1:test', lambda: self.build(invalidate=True)), ['old'])
+        self.assertEqual(get_panel('panel_1:test', self.build), ['new'])
+        self.assertEqual(get_panel('panel_1:test', lambda: (['unused'], [])), ['new'])
+
+    def test_tags_survive_an_expired_entry(self):
+        get_panel('panel_1:test', self.build)
+        cache.delete('panel_1:test')
+        self.assertEqual(get_panel('panel_1:test', lambda: self.build(invalidate=True)), ['old'])
+        self.assertEqual(get_panel('panel_1:test', self.build), ['new'])
+
+
+class StockUniverseTests(TestCase):
+    def equity_list(self, rows):
+        columns = ['SYMBOL', 'NAME OF COMPANY', ' SERIES', ' DATE OF LISTING', ' ISIN NUMBER', ' FACE VALUE']
+        return pd.DataFrame(rows, columns=columns, dtype=str)
+
+    def test_parse_rejects_invalid_rows(self):
+        stocks, failed = parse_equity_list(self.equity_list([
+            ['TCS', 'Tata Consultancy Services', 'EQ', '25-AUG-2004', 'INE467B01029', '1'],
+            ['INFY', 'Infosys', 'EQ', 'not a date', 'INE009A01021', 'x'],
+            ['BAD', 'Bad Isin', 'EQ', '01-JAN-2000', 'NOTANISIN', '10'],
+            ['TCS', 'Duplicate', 'EQ', '01-JAN-2000', 'INE000A01010', '10'],
+            [None, 'No Symbol', 'EQ', '01-JAN-2000', 'INE000A01028', '10'],
+        ]))
+        self.assertEqual(stocks['symbol'].tolist(), ['TCS', 'INFY'])
+        self.assertEqual(stocks['face_value'].tolist(), [Decimal('1.00'), None])
+        self.assertIsNone(stocks['listing_date'][1])
+        self.assertEqual([reason for _, reason in failed], ['invalid ISIN', 'duplicate symbol', 'missing required data'])
+
+    def test_sync_diffs_against_existing_stocks(self):
+        Stock.objects.create(symbol='TCS', name='Old Name', isin='INE467B01029')
+        Stock.objects.create(symbol='INFY', name='Infosys', isin='INE009A01021', face_value=5)
+        Stock.objects.create(symbol='OLD', name='Old Listing', isin='INE000A01010')
+        stocks, _ = parse_equity_list(self.equity_list([
+            ['TCS', 'Tata Consultancy Services', 'EQ', '25-AUG-2004', 'INE467B01029', '1'],
+            ['INFY', 'Infosys', 'EQ', '', 'INE009A01021', '5'],
+            ['SBIN', 'State Bank of India', 'EQ', '01-MAR-1995', 'INE062A01020', '1'],
+            ['RENAMED', 'Old Listing', 'EQ', '', 'INE000A01010', '5'],
+        ]))
+        with self.assertNumQueries(7):  # read, create and update each in a savepoint
+            result = sync_stocks(stocks)
+        self.assertEqual(
+            {key: result[key] for key in ('created', 'updated', 'unchanged', 'failed')},
+            {'created': 1, 'updated': 1, 'unchanged': 1, 'failed': 1}
+        )
+        self.assertEqual(Stock.objects.get(symbol='TCS').name, 'Tata Consultancy Services')
+        self.assertEqual(sync_stocks(stocks)['unchanged'], 3)
+
+    def test_sync_counts_rejected_chunks_as_failed(self):
+        # Bypasses parse_equity_list, which would catch the duplicate ISIN
+        stocks = pd.DataFrame([
+            {'symbol': 'TCS', 'name': 'Tata Consultancy Services', 'isin': 'INE467B01029',
+             'face_value': None, 'listing_date': None},
+            {'symbol': 'TCS2', 'name': 'Duplicate', 'isin': 'INE467B01029',
+             'face_value': None, 'listing_date': None},
+            {'symbol': 'INFY', 'name': 'Infosys', 'isin': 'INE009A01021',
+             'face_value': None, 'listing_date': None},
+        ])
+        result = sync_stocks(stocks, chunk_size=1)
+        self.assertEqual((result['created'], result['failed']), (2, 1))
+        self.assertEqual(result['failures'][0][0], 'TCS2')
+        self.assertEqual(sorted(Stock.objects.values_list('symbol', flat=True)), ['INFY', 'TCS'])
+
+
+class PriceBackfillTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.tcs = Stock.objects.create(symbol='TCS', name='Tata Consultancy Services', isin='INE467B01029')
+        self.infy = Stock.objects.create(symbol='INFY', name='Infosys', isin='INE009A01021')
+        # Fyers daily candles are stamped at midnight IST
+        candles = [
+            [1704047400, 3790.0, 3810.5, 3770.25, 3800.123, 100],  # 2024-01-01
+            [1704133800, 3800.0, 3850.0, 3795.0, 3840.0, 200],     # 2024-01-02
+            [1704220200, 3840.0, 3860.0, 3820.0, 3825.5, 300],     # 2024-01-03
+        ]
+        with open(f"{self.tmp.name}/TCS.json", 'w') as f:
+            json.dump({'s': 'ok', 'candles': candles}, f)
+        with open(f"{self.tmp.name}/INFY.csv", 'w') as f:
+            f.write("date,open,high,low,close,volume\n2024-01-02,1500,1510,1490,1505,10\n")
+        self.source = FixtureHistorySource(self.tmp.name)
+
+    def test_backfill_upserts_and_resumes(self):
+        start, end = timezone.datetime(2024, 1, 1).date(), timezone.datetime(2024, 1, 2).date()
+        stats = backfill_prices([self.tcs, self.infy], self.source, start_date=start, end_date=end, workers=2)
+        self.assertEqual((stats['fetched'], stats['rows'], stats['failed']), (2, 3, 0))
+        first = StockPrice.objects.get(stock=self.tcs, date=start)
+        self.assertEqual(first.close_price, Decimal('3800.12'))
+        self.assertEqual(first.adjusted_close, first.close_price)
+        self.assertEqual(Stock.objects.get(pk=self.infy.pk).current_price, Decimal('1505'))
+
+        # Resumes after the last stored bar, so only 2024-01-03 is new for TCS
+        stats = backfill_prices([self.tcs, self.infy], self.source, start_date=start, end_date=end + timedelta(days=1))
+        self.assertEqual(stats['rows'], 1)
+        self.assertEqual(StockPrice.objects.filter(stock=self.tcs).count(), 3)
+        self.assertEqual(Stock.objects.get(pk=self.tcs.pk).current_price, Decimal('3825.50'))
+
+    def test_write_failure_counts_only_that_stock(self):
+        # A price too large for the column is rejected when the rows are written
+        with open(f"{self.tmp.name}/INFY.csv", 'w') as f:
+            f.write("date,open,high,low,close,volume\n2024-01-02,1500,1510,1490,1e20,10\n")
+        reported = []
+        stats = backfill_prices(
+            [self.tcs, self.infy], self.source, workers=2,
+            start_date=timezone.datetime(2024, 1, 1).date(), end_date=timezone.datetime(2024, 1, 3).date(),
+            progress=lambda stock, rows, error: reported.append((stock.symbol, rows, error is not None)),
+        )
+        self.assertEqual((stats['fetched'], stats['failed'], stats['rows']), (1, 1, 3))
+        self.assertEqual(sorted(reported), [('INFY', 0, True), ('TCS', 3, False)])
+        self.assertFalse(StockPrice.objects.filter(stock=self.infy).exists())
+        self.assertEqual(StockPrice.objects.filter(stock=self.tcs).count(), 3)
+
+
+class SampleMarketTests(TestCase):
+    def test_simulated_bars_are_consistent_and_correlated_by_sector(self):
+        bars = simulate_ohlcv([0] * 20 + [1] * 20, 250, start_prices=[100] * 40, seed=7, sector_weight=0.5)
+        self.assertEqual(bars['close'].shape, (40, 250))
+        self.assertTrue((bars['high'] >= np.maximum(bars['open'], bars['close'])).all())
+        self.assertTrue((bars['low'] <= np.minimum(bars['open'], bars['close'])).all())
+        self.assertTrue((bars['low'] > 0).all())
+
+        correlation = np.corrcoef(np.diff(np.log(bars['close']), axis=1))
+        same_sector = correlation[:20, :20][np.triu_indices(20, 1)].mean()
+        other_sector = correlation[:20, 20:].mean()
+        self.assertGreater(same_sector, other_sector + 0.2)
+
+    def test_setup_sample_data_at_scale(self):
+        call_command('setup_sample_data', stocks=20, days=15, users=5, holdings=3, transactions=2,
+                     watchlists=2, seed=1, stdout=StringIO())
+        self.assertEqual(StockPrice.objects.count(), 30 * 15)
+        self.assertEqual(LatestStockPrice.objects.count(), 30)
+        self.assertEqual(PortfolioHolding.objects.count(), 7 * 3)
+        self.assertEqual(Transaction.objects.count(), 7 * 3 * 2)
+        self.assertEqual(Watchlist.objects.filter(created_by__username__startswith='loadtest').count(), 10)
+
+        # Runs again without duplicating anything, keeping the stored prices
+        call_command('setup_sample_data', stocks=20, days=15, users=6, holdings=3, seed=2, stdout=StringIO())
+        self.assertEqual(StockPrice.objects.count(), 30 * 15)
+        self.assertEqual(PortfolioHolding.objects.count(), 8 * 3)
+        latest = StockPrice.get_latest_prices(Stock.objects.all())
+        self.assertEqual(
+            dict(LatestStockPrice.objects.values_list('stock_id', 'price')),
+            {stock_id: price.close_price for stock_id, price in latest.items()}
+        )
+        for holding in PortfolioHolding.objects.filter(portfolio__user__username='loadtest000005'):
+            close = latest[holding.stock_id].close_price
+            self.assertEqual(holding.current_value, (holding.quantity * close).quantize(Decimal('0.01')))
+
+
+class StockSearchIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for symbol, name, isin in [
+            ('TCS', 'Tata Consultancy Services Ltd.', 'INE467B01029'),
+            ('TATAMOTORS', 'Tata Motors Ltd.', 'INE155A01022'),
+            ('TATASTEEL', 'Tata Steel Ltd.', 'INE081A01020'),
+            ('RELIANCE', 'Reliance Industries Ltd.', 'INE002A01018'),
+            ('TITAN', 'Titan Company Ltd.', 'INE280A01028'),
+        ]:
+            Stock.objects.create(symbol=symbol, name=name, isin=isin)
+        self.index = StockSearchIndex()
+
+    def symbols(self, query, limit=10):
+        return [stock['symbol'] for stock in self.index.search(query, limit)]
+
+    def test_symbol_prefix_ranks_above_name(self):
+        self.assertEqual(self.symbols('tata'), ['TATASTEEL', 'TATAMOTORS', 'TCS'])
+        self.assertEqual(self.symbols('TCS')[0], 'TCS')
+        self.assertEqual(self.symbols('tata mot'), ['TATAMOTORS'])
+        self.assertEqual(self.symbols('INE002'), ['RELIANCE'])
+
+    def test_fuzzy_match_tolerates_typos(self):
+        self.assertEqual(self.symbols('relaince')[0], 'RELIANCE')
+
+    def test_signals_keep_index_in_sync(self):
+        self.assertEqual(self.symbols('infy'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Stock.objects.create(symbol='INFY', name='Infosys Ltd.', isin='INE009A01021')
+        self.assertEqual(self.symbols('infy'), [])  # other processes notice after check_interval
+        self.index.check_interval = 0
+        self.assertEqual(self.symbols('infy'), ['INFY'])
+
+    def test_search_stocks_view(self):
+        user = User.objects.create_user(username='trader', password='secret')
+        self.client.force_login(user)
+        stock_search_index.invalidate()
+        results = self.client.get(reverse('dashboard:search_stocks'), {'q': 'titan'}).json()['results']
+        self.assertEqual(results, [{'id': results[0]['id'], 'symbol': 'TITAN', 'name': 'Titan Company Ltd.', 'price': None}])
+
+
+class StockPickerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        stock_search_index.invalidate()
+        self.user = User.objects.create_user(username='trader', password='secret')
+        self.client.force_login(self.user)
+        self.stocks = [
+            Stock.objects.create(
+                symbol=f'STK{i:02d}', name=f'Stock {i}', isin=f'INE{i:09d}',
+                sector='Banking' if i % 2 else 'IT'
+            )
+            for i in range(30)
+        ]
+        self.watchlist = Watchlist.objects.create(name='Mine', created_by=self.user)
+        self.watchlist.stocks.add(self.stocks[0], self.stocks[3])
+
+    def pages(self, **params):
+        """Follow next_cursor to the end, returning every page"""
+        pages = []
+        cursor = ''
+        while cursor is not None:
+            data = self.client.get(reverse('dashboard:stock_picker'), {**params, 'cursor': cursor}).json()
+            pages.append(data['results'])
+            cursor = data['next_cursor']
+        return pages
+
+    def test_cursor_pages_cover_every_stock_once(self):
+        pages = self.pages(limit=12)
+        self.assertEqual([len(page) for page in pages], [12, 12, 6])
+        symbols = [row['symbol'] for page in pages for row in page]
+        self.assertEqual(symbols, sorted(stock.symbol for stock in self.stocks))
+        self.assertEqual(set(pages[0][0]), {'id', 'symbol', 'name', 'sector', 'in_watchlist'})
+
+    def test_search_and_sector_filter(self):
+        pages = self.pages(q='stk1', sector='IT', limit=4)
+        rows = [row for page in pages for row in page]
+        self.assertEqual({row['sector'] for row in rows}, {'IT'})
+        # Symbol prefix matches rank ahead of the fuzzy tail
+        self.assertEqual([row['symbol'] for row in rows[:5]], ['STK10', 'STK12', 'STK14', 'STK16', 'STK18'])
+        self.assertEqual(len(rows), 15)
+
+    def test_sector_is_filtered_before_the_result_limit(self):
+        matches = stock_search_index.search('stk', limit=5, sector='Banking')
+        self.assertEqual([stock['symbol'] for stock in matches], ['STK01', 'STK03', 'STK05', 'STK07', 'STK09'])
+        self.assertEqual(stock_search_index.search('stk', limit=5, sector='Energy'), [])
+
+    def test_in_watchlist_flags_only_for_own_watchlists(self):
+        rows = self.pages(watchlist=self.watchlist.pk, limit=5)[0]
+        self.assertEqual([row['in_watchlist'] for row in rows], [True, False, False, True, False])
+
+        other = User.objects.create_user(username='other', password='secret')
+        self.client.force_login(other)
+        rows = self.pages(watchlist=self.watchlist.pk, limit=5)[0]
+        self.assertFalse(any(row['in_watchlist'] for row in rows))
+
+    def test_page_cost_is_independent_of_universe_size(self):
+        url = reverse('dashboard:stock_picker')
+        with CaptureQueriesContext(connection) as queries:
+            small = self.client.get(url, {'watchlist': self.watchlist.pk, 'limit': 10})
+        for i in range(30, 200):
+            Stock.objects.create(symbol=f'ZZ{i:03d}', name=f'Stock {i}', isin=f'INE{i:09d}')
+        with CaptureQueriesContext(connection) as more_queries:
+            large = self.client.get(url, {'watchlist': self.watchlist.pk, 'limit': 10})
+        self.assertEqual(len(large.content), len(small.content))
+        self.assertEqual(len(more_queries), len(queries))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('dashboard:stock_picker'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_edit_form_renders_only_selected_stocks(self):
+        response = self.client.get(reverse('dashboard:watchlist:edit', args=[self.watchlist.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'name="stocks"', count=2)
+        self.assertNotContains(response, 'STK01')
+
+        response = self.client.get(reverse('dashboard:watchlist:create'))
+        self.assertNotContains(response, 'name="stocks"')
+
+
+class WatchlistQuerySetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='secret')
+        self.client.force_login(self.user)
+        self.stocks = [
+            Stock.objects.create(symbol=f'STK{i:02d}', name=f'Stock {i}', isin=f'INE{i:09d}')
+            for i in range(8)
+        ]
+        cache.clear()
+
+    def add_watchlists(self, count):
+        for i in range(Watchlist.objects.count(), Watchlist.objects.count() + count):
+            watchlist = Watchlist.objects.create(name=f'List {i}', created_by=self.user)
+            watchlist.stocks.add(*self.stocks[:i % 8 + 1])
+            watchlist.subscribers.add(self.user)
+
+    def test_counts_and_preview_stocks(self):
+        watchlist = Watchlist.objects.create(name='Big', created_by=self.user)
+        watchlist.stocks.add(*reversed(self.stocks))
+        other = User.objects.create_user(username='other', password='secret')
+        watchlist.subscribers.add(self.user, other)
+        Watchlist.objects.create(name='Empty', created_by=self.user)
+
+        with self.assertNumQueries(2):
+            watchlists = {w.name: w for w in Watchlist.objects.with_counts().with_preview_stocks(3)}
+            big, empty = watchlists['Big'], watchlists['Empty']
+            self.assertEqual((big.stock_count, big.subscriber_count), (8, 2))
+            self.assertEqual((empty.stock_count, empty.subscriber_count), (0, 0))
+            self.assertEqual([stock.symbol for stock in big.preview_stocks], ['STK00', 'STK01', 'STK02'])
+            self.assertEqual(empty.preview_stocks, [])
+        self.assertEqual(Watchlist.objects.get(name='Big').subscriber_count, 2)
+
+    def test_list_page_query_count_is_constant(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('dashboard:watchlist:list'))
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        self.add_watchlists(3)
+        small = count_queries()
+        self.add_watchlists(60)
+        cache.clear()
+        self.assertEqual(count_queries(), small)
+
+
+class WatchlistDetailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='trader', password='secret')
+        self.client.force_login(self.user)
+        self.stocks = {
+            symbol: Stock.objects.create(symbol=symbol, name=symbol.title(), isin=f'INE{i:09d}')
+            for i, symbol in enumerate(['AAA', 'BBB', 'CCC', 'DDD'])
+        }
+        self.watchlist = Watchlist.objects.create(name='Mine', created_by=self.user)
+        self.watchlist.stocks.add(*self.stocks.values())
+        now = timezone.now()
+        LatestStockPrice.objects.bulk_create([
+            LatestStockPrice(stock=self.stocks['AAA'], price=10, change=1, change_percentage=10,
+                             volume=500, as_of=now, source='eod'),
+            LatestStockPrice(stock=self.stocks['BBB'], price=20, change=-1, change_percentage=-5,
+                             volume=100, as_of=now, source='eod'),
+        ])
+
+    def test_live_quotes_take_precedence(self):
+        table = QuoteTable()
+        table.update(make_tick('NSE:AAA-EQ', ltp=11.5, volume=900))
+        cache.set(quote_cache_key('NSE:CCC-EQ'), make_tick('NSE:CCC-EQ', ltp=30, volume=300))
+        stocks = Stock.objects.select_related('latest_price').order_by('symbol')
+        with self.assertNumQueries(1):
+            prices = live_prices(stocks, table=table)
+        self.assertEqual(prices[self.stocks['AAA'].pk]['price'], Decimal('11.5'))
+        self.assertEqual(prices[self.stocks['AAA'].pk]['source'], 'live')
+        self.assertEqual(prices[self.stocks['BBB'].pk]['price'], Decimal('20'))
+        self.assertEqual(prices[self.stocks['CCC'].pk]['volume'], 300)
+        self.assertNotIn(self.stocks['DDD'].pk, prices)
+
+    def test_stale_table_quotes_are_not_live(self):
+        table = QuoteTable()
+        table.update({**make_tick('NSE:AAA-EQ', ltp=11.5), 'timestamp': timezone.now() - timedelta(minutes=10)})
+        stocks = Stock.objects.select_related('latest_price').order_by('symbol')
+        prices = live_prices(stocks, max_age=60, table=table)
+        self.assertEqual(prices[self.stocks['AAA'].pk]['price'], Decimal('10'))
+        self.assertEqual(prices[self.stocks['AAA'].pk]['source'], 'eod')
+
+    def test_sorting(self):
+        url = reverse('dashboard:watchlist:detail', args=[self.watchlist.pk])
+        response = self.client.get(url, {'sort': '-change_percentage'})
+        symbols = [row['stock'].symbol for row in response.context['stocks_with_prices']]
+        self.assertEqual(symbols, ['AAA', 'BBB', 'CCC', 'DDD'])
+        response = self.client.get(url, {'sort': 'volume'})
+        symbols = [row['stock'].symbol for row in response.context['stocks_with_prices']]
+        self.assertEqual(symbols, ['BBB', 'AAA', 'CCC', 'DDD'])
+        response = self.client.get(url, {'sort': 'bogus'})
+        self.assertEqual(response.context['sort'], 'symbol')
+
+    def test_global_watchlist_subscriber_check(self):
+        owner = User.objects.create_user(username='owner', password='secret')
+        shared = Watchlist.objects.create(name='Shared', created_by=owner, is_global=True)
+        shared.subscribers.add(self.user, owner)
+        response = self.client.get(reverse('dashboard:watchlist:detail', args=[shared.pk]))
+        self.assertTrue(response.context['is_subscriber'])
+        self.assertFalse(response.context['is_owner'])
+
+        private = Watchlist.objects.create(name='Private', created_by=owner)
+        response = self.client.get(reverse('dashboard:watchlist:detail', args=[private.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class QuoteHubTests(TestCase):
+    def test_fan_out_keeps_newest_tick_per_symbol(self):
+        async def scenario():
+            hub = QuoteHub()
+            first = hub.subscribe(['NSE:AAA-EQ', 'NSE:BBB-EQ'])
+            second = hub.subscribe(['NSE:BBB-EQ'])
+            self.assertEqual(hub.symbols(), {'NSE:AAA-EQ', 'NSE:BBB-EQ'})
+
+            hub.publish([make_tick('NSE:AAA-EQ', ltp=1), make_tick('NSE:BBB-EQ', ltp=2), make_tick('NSE:CCC-EQ')])
+            hub.publish([make_tick('NSE:AAA-EQ', ltp=3)])
+            batch = await first.next_batch(1)
+            self.assertEqual({tick['symbol']: tick['ltp'] for tick in batch}, {'NSE:AAA-EQ': 3, 'NSE:BBB-EQ': 2})
+            self.assertEqual([tick['ltp'] for tick in await second.next_batch(1)], [2])
+            self.assertEqual(await second.next_batch(0.01), [])
+
+            first.close()
+            second.close()
+            self.assertEqual(hub.symbols(), set())
+            self.assertEqual(hub.subscriber_count(), 0)
+
+        async_to_sync(scenario)()
+
+    def test_publish_from_another_thread_wakes_subscriber(self):
+        async def scenario():
+            hub = QuoteHub()
+            subscription = hub.subscribe(['NSE:AAA-EQ'])
+            threading.Timer(0.05, hub.publish, args=[[make_tick('NSE:AAA-EQ', ltp=7)]]).start()
+            batch = await subscription.next_batch(2)
+            subscription.close()
+            return batch
+
+        self.assertEqual([tick['ltp'] for tick in async_to_sync(scenario)()], [7])
+
+
+class QuoteStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='trader', password='secret')
+
+    def test_requires_login_and_symbols(self):
+        self.assertEqual(self.client.get(reverse('dashboard:quote_stream'), {'symbols': 'AAA'}).status_code, 401)
+        self.async_client.force_login(self.user)
+        response = async_to_sync(self.async_client.get)(reverse('dashboard:quote_stream'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_wsgi_requests_are_not_streamed(self):
+        self.client.force_login(self.user)
+        watchlist = Watchlist.objects.create(name='Live', created_by=self.user)
+        watchlist.stocks.add(Stock.objects.create(symbol='AAA', name='AAA Ltd.', isin='INE000000AAA'))
+        self.assertEqual(self.client.get(reverse('dashboard:quote_stream'), {'symbols': 'AAA'}).status_code, 501)
+        # Pages leave live quotes off, so browsers do not open a stream that cannot stream
+        page = self.client.get(reverse('dashboard:watchlist:detail', args=[watchlist.id]))
+        self.assertContains(page, 'data-stock-symbol="AAA"')
+        self.assertNotContains(page, 'data-stream-url')
+        self.async_client.force_login(self.user)
+        page = async_to_sync(self.async_client.get)(reverse('dashboard:watchlist:detail', args=[watchlist.id]))
+        self.assertContains(page, 'data-stream-url')
+
+    def test_stream_sends_snapshot_then_published_quotes(self):
+        self.async_client.force_login(self.user)
+        cache.set(quote_cache_key('NSE:AAA-EQ'), make_tick('NSE:AAA-EQ', ltp=10))
+
+        async def read_stream():
+            response = await self.async_client.get(reverse('dashboard:quote_stream'), {'symbols': 'AAA,NSE:NIFTY50-INDEX'})
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            frames = []
+            async for chunk in response.streaming_content:
+                frames.append(chunk.decode())
+                if len(frames) == 2:
+                    quote_hub.publish([make_tick('NSE:NIFTY50-INDEX', ltp=22000)])
+                if len(frames) == 3:
+                    break
+            return frames
+
+        frames = async_to_sync(read_stream)()
+        snapshot = json.loads(frames[1].split('data: ', 1)[1])
+        self.assertEqual([(q['symbol'], q['ltp']) for q in snapshot], [('AAA', 10)])
+        pushed = json.loads(frames[2].split('data: ', 1)[1])
+        self.assertEqual([(q['symbol'], q['ltp']) for q in pushed], [('NSE:NIFTY50-INDEX', 22000)])
+        self.assertEqual(quote_hub.symbols(), set())
+
+
+class SymbolSubscriptionManagerTests(TestCase):
+    def setUp(self):
+        self.frames = []
+        self.manager = SymbolSubscriptionManager(symbols_per_message=2, hub=QuoteHub())
+
+    def send(self, action, symbols):
+        self.frames.append((action, symbols))
+
+    def test_refcounted_incremental_frames(self):
+        self.manager.set_demand('a', ['X', 'Y', 'Z'])
+        self.manager.set_demand('b', ['Y'])
+        self.manager.on_connect(self.send)
+        self.assertEqual(self.frames[-2:], [('subscribe', ['X', 'Y']), ('subscribe', ['Z'])])
+
+        self.frames.clear()
+        self.manager.set_demand('a', ['X'])
+        self.manager.set_demand('c', ['W'])
+        self.manager.set_demand('c', [])  # demanded and dropped between flushes
+        self.assertEqual(self.manager.flush(), 1)
+        self.assertEqual(self.frames, [('unsubscribe', ['Z'])])  # Y is still demanded by b
+
+        self.frames.clear()
+        self.assertEqual(self.manager.flush(), 0)
+
+    def test_reconnect_replays_active_set(self):
+        self.manager.set_demand('a', ['X'])
+        self.manager.on_connect(self.send)
+        self.manager.on_disconnect()
+        self.manager.set_demand('a', ['X', 'Y'])
+        self.assertEqual(self.manager.flush(), 0)  # nothing to send to
+
+        self.frames.clear()
+        self.manager.on_connect(self.send)
+        subscribed = {symbol for action, batch in self.frames for symbol in batch if action == 'subscribe'}
+        self.assertTrue({'X', 'Y', 'NSE:NIFTY50-INDEX'} <= subscribed)
+
+    def test_failed_frames_are_retried(self):
+        self.manager.set_demand('a', ['X'])
+
+        def broken(action, symbols):
+            raise ConnectionError('socket closed')
+
+        self.manager.on_connect(broken)
+        self.assertEqual(self.manager.stats()['subscribed'], 0)
+        self.manager.on_connect(self.send)
+        self.assertIn('X', {symbol for _, batch in self.frames for symbol in batch})
+
+    def test_demand_follows_clients_and_database(self):
+        stock = Stock.objects.create(symbol='TCS', name='Tata Consultancy Services', isin='INE467B01029')
+        user = User.objects.create_user(username='trader', password='secret')
+        Watchlist.objects.create(name='Mine', created_by=user).stocks.add(stock)
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = self.manager.hub.subscribe(['NSE:INFY-EQ'], loop=loop)
+        self.manager.refresh()
+        self.assertTrue({'NSE:TCS-EQ', 'NSE:INFY-EQ', 'NSE:NIFTY50-INDEX'} <= self.manager.active_symbols())
+        subscription.close()
+        self.manager.refresh()
+        self.assertNotIn('NSE:INFY-EQ', self.manager.active_symbols())
+
+    def test_watchlist_changes_in_another_process_are_picked_up(self):
+        cache.clear()
+        self.manager.check_interval = 60
+        self.manager.refresh()
+        user = User.objects.create_user(username='trader', password='secret')
+        watchlist = Watchlist.objects.create(name='Mine', created_by=user)
+
+        # The signal marks the global manager stale, standing in for another process's
+        with self.captureOnCommitCallbacks(execute=True):
+            watchlist.stocks.add(Stock.objects.create(symbol='SBIN', name='State Bank of India', isin='INE062A01020'))
+        self.manager.refresh()
+        self.assertNotIn('NSE:SBIN-EQ', self.manager.active_symbols())  # still within check_interval
+        self.manager.check_interval = 0
+        self.manager.refresh()
+        self.assertIn('NSE:SBIN-EQ', self.manager.active_symbols())
+
+    def test_deleting_a_watchlist_drops_its_symbols(self):
+        cache.clear()
+        self.manager.check_interval = 0
+        user = User.objects.create_user(username='trader', password='secret')
+        watchlist = Watchlist.objects.create(name='Mine', created_by=user)
+        watchlist.stocks.add(Stock.objects.create(symbol='SBIN', name='State Bank of India', isin='INE062A01020'))
+        self.manager.refresh()
+        self.assertIn('NSE:SBIN-EQ', self.manager.active_symbols())
+
+        # The cascade to the through rows sends no m2m_changed
+        with self.captureOnCommitCallbacks(execute=True):
+            watchlist.delete()
+        self.manager.refresh()
+        self.assertNotIn('NSE:SBIN-EQ', self.manager.active_symbols())
+
+
+class FakeConnection:
+    """Socket stand-in whose run_forever blocks until close()"""
+    live = 0
+    most_live = 0
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def run_forever(self):
+        with FakeConnection.lock:
+            FakeConnection.live += 1
+            FakeConnection.most_live = max(FakeConnection.most_live, FakeConnection.live)
+        self.closed.wait(5)
+        with FakeConnection.lock:
+            FakeConnection.live -= 1
+
+    def close(self):
+        self.closed.set()
+
+
+class ConnectionSupervisorTests(TestCase):
+    def setUp(self):
+        FakeConnection.live = FakeConnection.most_live = 0
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_backoff_grows_with_jitter_and_cap(self):
+        for attempt in range(10):
+            ceiling = min(8.0, 0.5 * 2 ** attempt)
+            for _ in range(20):
+                self.assertTrue(0.5 <= backoff_delay(attempt, base=0.5, cap=8.0) <= ceiling)
+
+    def test_stale_connection_is_replaced_one_at_a_time(self):
+        supervisor = ConnectionSupervisor(
+            FakeConnection, base_delay=0.01, max_delay=0.02, heartbeat_timeout=0.05, check_interval=0.01
+        )
+        supervisor.start()
+        self.wait_for(lambda: supervisor.connects >= 3)
+        supervisor.stop()
+        self.assertGreaterEqual(supervisor.stale_closes, 2)
+        self.assertEqual(FakeConnection.most_live, 1)
+        self.wait_for(lambda: FakeConnection.live == 0)
+
+    def test_touched_connection_stays_open_and_connect_errors_back_off(self):
+        attempts = []
+
+        def connect():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError('refused')
+            return FakeConnection()
+
+        supervisor = ConnectionSupervisor(
+            connect, base_delay=0.01, max_delay=0.02, heartbeat_timeout=0.2, check_interval=0.01
+        )
+        supervisor.start()
+        self.wait_for(lambda: supervisor.connection is not None)
+        for _ in range(30):
+            supervisor.touch()
+            time.sleep(0.01)
+        stats = supervisor.stats()
+        supervisor.stop()
+        self.assertEqual((stats['connects'], stats['failures'], stats['stale_closes']), (1, 1, 0))
+        self.assertTrue(stats['connected'])
+
+
+class TickDecoderTests(TestCase):
+    def test_decoders_keep_only_tick_fields(self):
+        now = timezone.now()
+        message = json.dumps({'symbol': 'NSE:TCS-EQ', 'ltp': 3500.5, 'volume': 10, 'open_price': 3400})
+        for name, decode in DECODERS.items():
+            with self.subTest(decoder=name):
+                tick = decode(message, now)
+                self.assertEqual(tick, Tick('NSE:TCS-EQ', 3500.5, 0, 0, 10, now))
+                self.assertEqual(decode(message.encode(), now), tick)
+                for bad in ('not json', '[1, 2]', '{"ltp": 1}'):
+                    with self.assertRaises(ValueError):
+                        decode(bad, now)
+        self.assertIs(get_tick_decoder(), DECODERS[tick_decoder_name()])
+        with self.assertRaises(ValueError):
+            get_tick_decoder('simdjson')
+
+    def test_tick_reads_like_a_quote_dict(self):
+        tick = Tick('NSE:TCS-EQ', 3500.5, 1, 0.1, 10, timezone.now())
+        self.assertEqual((tick['ltp'], tick.get('volume'), tick.get('open_price', 'n/a')), (3500.5, 10, 'n/a'))
+        self.assertEqual(tick[0], 'NSE:TCS-EQ')
+
+    def test_published_ticks_are_cached_compactly(self):
+        cache.clear()
+        tick = Tick('NSE:TICKCACHE-EQ', 12.5, 1, 0.1, 10, timezone.now())
+        publish_quotes([tick], TickBuffer(sink=lambda ticks: None))
+        self.assertIs(type(cache.get(quote_cache_key('NSE:TICKCACHE-EQ'))), tuple)
+        quotes, missing = get_quotes(['NSE:TICKCACHE-EQ'])
+        self.assertEqual(quotes['NSE:TICKCACHE-EQ'], tick._asdict())
+
+
+class FakeFeedSocket:
+    """Async websocket stand-in that replays messages, then stays quiet"""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.sent = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def recv(self):
+        if self.messages:
+            return self.messages.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(self, frame):
+        self.sent.append(json.loads(frame))
+
+
+class MarketFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_coalesces_and_publishes(self):
+        socket = FakeFeedSocket([
+            json.dumps({'symbol': 'NSE:FEEDA-EQ', 'ltp': 10}),
+            json.dumps({'symbol': 'NSE:FEEDA-EQ', 'ltp': 11}),
+            json.dumps({'symbol': 'NSE:FEEDB-EQ', 'ltp': 20}),
+            'not json',
+        ])
+        written = []
+        bars = []
+        subscriptions = SymbolSubscriptionManager(hub=QuoteHub())
+        subscriptions.set_demand('test', ['NSE:FEEDA-EQ'])
+        feed = MarketFeed(
+            'wss://feed.test', connect=lambda url, **kwargs: socket,
+            tick_buffer=TickBuffer(sink=written.extend, flush_interval=0.01),
+            subscriptions=subscriptions, candles=CandleAggregator(resolutions=[1], sink=bars.extend),
+            coalesce_interval=0.01,
+        )
+
+        async def scenario():
+            stop = asyncio.Event()
+            task = asyncio.create_task(feed.run(stop))
+            for _ in range(500):
+                await asyncio.sleep(0.01)
+                if feed.published >= 2 and socket.sent:
+                    break
+            stop.set()
+            await task
+
+        async_to_sync(scenario)()
+        stats = feed.stats()
+        self.assertEqual((stats['connects'], stats['received'], stats['published'], stats['decode_errors']), (1, 3, 2, 1))
+        self.assertEqual(get_quotes(['NSE:FEEDA-EQ'])[0]['NSE:FEEDA-EQ']['ltp'], 11)
+        self.assertEqual(sorted(tick['ltp'] for tick in written), [11, 20])
+        self.assertIn('NSE:FEEDA-EQ', socket.sent[0]['symbol'])
+        self.assertTrue(socket.sent[0]['subscribe'])
+        # Candles see every tick, not only the coalesced ones; stopping the feed writes the open bars
+        self.assertEqual(sorted((bar.symbol, bar.open_price, bar.close_price) for bar in bars),
+                         [('NSE:FEEDA-EQ', 10, 11), ('NSE:FEEDB-EQ', 20, 20)])
+
+    def test_relay_publishes_new_cached_quotes_once(self):
+        hub = QuoteHub()
+        relay = QuoteRelay(hub=hub)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = hub.subscribe(['NSE:RELAY-EQ'], loop=loop)
+        self.assertEqual(relay.poll(), 0)
+
+        cache.set('stock_quote_NSE:RELAY-EQ', make_tick('NSE:RELAY-EQ', ltp=42))
+        self.assertEqual(relay.poll(), 1)
+        self.assertEqual(relay.poll(), 0)
+        self.assertEqual([tick['ltp'] for tick in subscription.take()], [42])
+
+    def test_push_client_symbols_reach_the_feed_process(self):
+        hub = QuoteHub()
+        relay = QuoteRelay(hub=hub)
+        feed_subscriptions = SymbolSubscriptionManager(hub=QuoteHub(), shared_clients=True)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = hub.subscribe(['NSE:SSEONLY-EQ'], loop=loop)
+
+        relay.poll()
+        feed_subscriptions.refresh()
+        self.assertIn('NSE:SSEONLY-EQ', feed_subscriptions.active_symbols())
+
+        subscription.close()
+        relay.poll()
+        feed_subscriptions.refresh()
+        self.assertNotIn('NSE:SSEONLY-EQ', feed_subscriptions.active_symbols())
+
+    def test_command_refuses_a_process_local_cache(self):
+        with self.assertRaisesMessage(CommandError, 'shared with the web workers'):
+            call_command('run_market_feed', url='wss://feed.test', stdout=StringIO())
+
+
+class TickPartitionsTests(TestCase):
+    def setUp(self):
+        self.store = TickPartitions(table='dashboard_testtick')
+        self.day = date(2026, 10, 16)
+
+    def at(self, day, hour, minute, second=0):
+        return datetime.combine(day, datetime.min.time(), tzinfo=TRADING_TIME_ZONE).replace(
+            hour=hour, minute=minute, second=second
+        )
+
+    def test_ticks_are_routed_to_day_partitions(self):
+        previous = self.day - timedelta(days=1)
+        self.store.write([
+            Tick('NSE:B-EQ', 20, 0, 0, 5, self.at(self.day, 9, 20)),
+            Tick('NSE:A-EQ', 10, 0, 0, 5, self.at(self.day, 9, 16)),
+            Tick('NSE:A-EQ', 11, 0, 0, 6, self.at(self.day, 9, 15)),
+            Tick('NSE:A-EQ', 9, 0, 0, 1, self.at(previous, 10, 0)),
+        ])
+        self.assertEqual(self.store.partitions(), [previous, self.day])
+        ticks = list(self.store.ticks(self.day))
+        self.assertEqual([(tick.symbol, tick.ltp) for tick in ticks], [('NSE:A-EQ', 11), ('NSE:A-EQ', 10), ('NSE:B-EQ', 20)])
+        self.assertEqual(ticks[0].timestamp, self.at(self.day, 9, 15))
+        self.assertEqual([tick.ltp for tick in self.store.ticks(self.day, symbols=['NSE:B-EQ'])], [20])
+        # 23:30 UTC on the 15th is already the 16th in India
+        self.assertEqual(trading_day(datetime(2026, 10, 15, 23, 30, tzinfo=dt_timezone.utc)), self.day)
+
+    def test_rollup_builds_bars_from_cumulative_volume(self):
+        self.store.write([
+            Tick('NSE:A-EQ', 100, 0, 0, 100, self.at(self.day, 9, 15, 5)),
+            Tick('NSE:A-EQ', 103, 0, 0, 150, self.at(self.day, 9, 15, 40)),
+            Tick('NSE:A-EQ', 99, 0, 0, 120, self.at(self.day, 9, 15, 50)),
+            Tick('NSE:A-EQ', 101, 0, 0, 400, self.at(self.day, 9, 16, 10)),
+        ])
+        self.assertEqual(self.store.rollup(self.day), 4)  # two 1-minute bars, one 5-minute, one 15-minute
+        self.assertEqual(self.store.rollup(self.day), 0)  # already rolled up
+        bars = IntradayBar.objects.filter(symbol='NSE:A-EQ', resolution=1).order_by('start')
+        self.assertEqual(
+            [(bar.open_price, bar.high_price, bar.low_price, bar.close_price, bar.volume) for bar in bars],
+            [(100, 103, 99, 99, 150), (101, 101, 101, 101, 250)]
+        )
+        self.assertEqual(bars[0].start, self.at(self.day, 9, 15))
+        five = IntradayBar.objects.get(symbol='NSE:A-EQ', resolution=5)
+        self.assertEqual((five.open_price, five.high_price, five.low_price, five.close_price, five.volume),
+                         (100, 103, 99, 101, 400))
+
+    def test_rollup_fills_missing_and_partial_bars_only(self):
+        def bar(minute, volume, partial=False):
+            return IntradayBar(
+                symbol='NSE:A-EQ', resolution=1, start=self.at(self.day, 9, minute), open_price=1,
+                high_price=1, low_price=1, close_price=1, volume=volume, partial=partial,
+            )
+
+        # The live aggregator wrote 9:15 in full and 9:17 in part, then missed 9:16
+        IntradayBar.save_bars([bar(15, 777), bar(17, 1, partial=True)])
+        self.store.write([
+            Tick('NSE:A-EQ', 100, 0, 0, 100, self.at(self.day, 9, 15, 5)),
+            Tick('NSE:A-EQ', 101, 0, 0, 300, self.at(self.day, 9, 16, 5)),
+            Tick('NSE:A-EQ', 102, 0, 0, 600, self.at(self.day, 9, 17, 5)),
+        ])
+        self.assertEqual(self.store.rollup(self.day), 2 + 1 + 1)  # 9:16 and 9:17, plus the 5 and 15 minute bars
+        bars = IntradayBar.objects.filter(symbol='NSE:A-EQ', resolution=1).order_by('start')
+        self.assertEqual([(bar.volume, bar.partial) for bar in bars], [(777, False), (200, False), (300, False)])
+        self.assertEqual(self.store.rollup(self.day), 0)
+        self.assertEqual(self.store.rollup(self.day, force=True), 5)
+
+    def test_expire_rolls_up_then_drops_old_partitions(self):
+        for offset in range(4):
+            day = self.day - timedelta(days=offset)
+            self.store.write([Tick('NSE:A-EQ', 100 + offset, 0, 0, 10, self.at(day, 10, 0))])
+
+        dropped = self.store.expire(retain_days=2, today=self.day)
+        self.assertEqual(dropped, [self.day - timedelta(days=3), self.day - timedelta(days=2)])
+        self.assertEqual(self.store.partitions(), [self.day - timedelta(days=1), self.day])
+        self.assertEqual(IntradayBar.objects.filter(resolution=1).count(), 2)
+
+
+class CandleAggregatorTests(TestCase):
+    def setUp(self):
+        self.written = []
+        self.aggregator = CandleAggregator(resolutions=[1, 5], late_tolerance=2, sink=self.written.extend)
+        self.day = date(2026, 10, 16)
+
+    def at(self, hour, minute, second=0):
+        return datetime.combine(self.day, datetime.min.time(), tzinfo=TRADING_TIME_ZONE).replace(
+            hour=hour, minute=minute, second=second
+        )
+
+    def test_bars_for_every_resolution(self):
+        for ltp, volume, second in [(100, 10, 1), (104, 30, 20), (98, 35, 59)]:
+            self.aggregator.offer(Tick('NSE:A-EQ', ltp, 0, 0, volume, self.at(9, 16, second)))
+        self.aggregator.offer(Tick('NSE:A-EQ', 101, 0, 0, 60, self.at(9, 17, 5)))
+
+        # The first tick only seeds the day's cumulative volume
+        self.assertEqual(self.aggregator.open_bars('NSE:A-EQ', 1), [
+            (self.at(9, 16), 100, 104, 98, 98, 25),
+            (self.at(9, 17), 101, 101, 101, 101, 25),
+        ])
+        self.assertEqual(self.aggregator.open_bars('NSE:A-EQ', 5), [(self.at(9, 15), 100, 104, 98, 101, 50)])
+
+    def test_restart_mid_session_writes_partial_bars_that_never_overwrite(self):
+        IntradayBar.objects.create(
+            symbol='NSE:A-EQ', resolution=1, start=self.at(11, 0), open_price=99, high_price=105,
+            low_price=97, close_price=101, volume=9000,
+        )
+        aggregator = CandleAggregator(resolutions=[1])
+        aggregator.offer(Tick('NSE:A-EQ', 100, 0, 0, 5000000, self.at(11, 0, 10)))
+        aggregator.offer(Tick('NSE:A-EQ', 101, 0, 0, 5000300, self.at(11, 0, 40)))
+        aggregator.offer(Tick('NSE:A-EQ', 102, 0, 0, 5000500, self.at(11, 1, 5)))
+        aggregator.roll(self.at(11, 2, 10))
+
+        aggregator.flush()
+        bars = {bar.start: bar for bar in IntradayBar.objects.filter(symbol='NSE:A-EQ')}
+        # The 11:00 bar was only partly seen, so the stored bar is kept
+        self.assertEqual((bars[self.at(11, 0)].volume, bars[self.at(11, 0)].partial), (9000, False))
+        self.assertEqual((bars[self.at(11, 1)].volume, bars[self.at(11, 1)].partial), (200, False))
+
+    def test_bars_complete_after_late_tolerance_and_later_ticks_are_dropped(self):
+        self.aggregator.offer(Tick('NSE:A-EQ', 100, 0, 0, 10, self.at(9, 16, 30)))
+        self.assertEqual(self.aggregator.roll(self.at(9, 17, 1)), 0)
+
+        # Late, but within the tolerance: still lands in the 9:16 bar
+        self.aggregator.offer(Tick('NSE:A-EQ', 105, 0, 0, 12, self.at(9, 16, 59)))
+        self.assertEqual(self.aggregator.roll(self.at(9, 17, 3)), 1)
+        self.aggregator.offer(Tick('NSE:A-EQ', 90, 0, 0, 13, self.at(9, 16, 58)))
+
+        self.assertEqual(self.aggregator.flush(), 1)
+        bar = self.written[0]
+        self.assertEqual((bar.resolution, bar.start, bar.open_price, bar.close_price), (1, self.at(9, 16), 100, 105))
+        self.assertEqual(self.aggregator.stats()['late_dropped'], 1)
+        self.assertEqual(self.aggregator.stats()['open_bars'], 1)  # the 5-minute bar
+
+    def test_stop_writes_open_bars_in_batches(self):
+        aggregator = CandleAggregator(resolutions=[1], batch_size=2, sink=lambda bars: self.written.append(len(bars)))
+        for index, symbol in enumerate(['NSE:A-EQ', 'NSE:B-EQ', 'NSE:C-EQ']):
+            aggregator.offer(Tick(symbol, 100, 0, 0, 10, self.at(9, 20 + index)))
+        aggregator.start()
+        aggregator.stop()
+        self.assertEqual(self.written, [2, 1])
+        self.assertEqual(aggregator.stats()['bars_written'], 3)
+
+    def test_intraday_candles_merge_stored_and_open_bars(self):
+        aggregator = CandleAggregator(resolutions=[5])
+        aggregator.offer(Tick('NSE:A-EQ', 100, 0, 0, 10, self.at(9, 15, 10)))
+        IntradayBar.upsert(aggregator.complete_all())
+        aggregator.offer(Tick('NSE:A-EQ', 102, 0, 0, 30, self.at(9, 21)))
+
+        candles = intraday_candles('NSE:A-EQ', 5, self.at(9, 0), self.at(10, 0), aggregator=aggregator)
+        self.assertEqual(candles, [
+            [int(self.at(9, 15).timestamp()), 100.0, 100.0, 100.0, 100.0, 0],
+            [int(self.at(9, 20).timestamp()), 102.0, 102.0, 102.0, 102.0, 20],
+        ])
+        with self.assertRaises(ValueError):
+            intraday_candles('NSE:A-EQ', 7, aggregator=aggregator)
+
+    def test_historical_quotes_view_serves_local_intraday_bars(self):
+        user = User.objects.create_user(username='candles', password='secret')
+        self.client.force_login(user)
+        IntradayBar.objects.create(
+            symbol='NSE:TCS-EQ', resolution=5, start=self.at(9, 15), open_price=100,
+            high_price=102, low_price=99, close_price=101, volume=500,
+        )
+        response = self.client.get(reverse('dashboard:get_historical_quotes'), {
+            'symbol': 'TCS', 'timeframe': '5M',
+            'from': int(self.at(9, 0).timestamp()), 'to': int(self.at(10, 0).timestamp()),
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['source'], 'local')
+        self.assertEqual(data['data']['candles'], [[int(self.at(9, 15).timestamp()), 100.0, 102.0, 99.0, 101.0, 500]])
+
+
+class OHLCVStoreTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = OHLCVStore(self.tmp.name)
+        self.stock = Stock.objects.create(symbol='TCS', name='Tata Consultancy Services', isin='INE467B01029')
+        self.today = timezone.now().date()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_incremental_sync_appends_only_new_bars(self):
+        for day in range(5, 0, -1):
+            make_price(self.stock, self.today - timedelta(days=day), Decimal(100 + day))
+        self.assertEqual(self.store.sync_from_db(), 5)
+        self.assertEqual(self.store.sync_from_db(), 0)
+
+        make_price(self.stock, self.today, Decimal('99.50'))
+        self.assertEqual(self.store.sync_from_db(), 1)
+        self.assertEqual(self.store.last_date(self.stock.id), self.today)
+
+        history = self.store.get_price_history(self.stock, days=2)
+        self.assertEqual(history['close'].tolist(), [102.0, 101.0, 99.5])
+        self.assertEqual(str(history['date'][-1]), self.today.isoformat())
+
+    def test_sync_reloads_stocks_with_changed_history(self):
+        for day in range(5, 0, -1):
+            make_price(self.stock, self.today - timedelta(days=day), Decimal(100 + day))
+        self.assertEqual(self.store.sync_from_db(), 5)
+
+        # A corrected bar and older backfilled history, both behind the last stored date
+        price = StockPrice.objects.get(stock=self.stock, date=self.today - timedelta(days=3))
+        price.close_price = Decimal('200.00')
+        price.save()
+        make_price(self.stock, self.today - timedelta(days=8), Decimal('90.00'))
+
+        self.assertEqual(self.store.sync_from_db(), 6)
+        self.assertEqual(self.store.read(self.stock.id)['close'].tolist(), [90.0, 105.0, 104.0, 200.0, 102.0, 101.0])
+        self.assertEqual(self.store.sync_from_db(), 0)
+
+    def test_append_rejects_out_of_order_bars(self):
+        self.store.append(self.stock.id, {
+            'date': [self.today], 'open': [1], 'high': [1], 'low': [1],
+            'close': [1], 'adjusted_close': [1], 'volume': [1],
+        })
+        with self.assertRaises(ValueError):
+            self.store.append(self.stock.id, {
+                'date': [self.today], 'open': [2], 'high': [2], 'low': [2],
+                'close': [2], 'adjusted_close': [2], 'volume': [2],
+            })
+
+
+class TickBufferDatabaseTests(TransactionTestCase):
+    def test_default_sink_writes_tick_partitions(self):
+        buffer = TickBuffer(batch_size=100, flush_interval=0.05)
+        buffer.start()
+        for i in range(250):
+            buffer.put(make_tick('NSE:RELIANCE-EQ', ltp=Decimal('2500.50'), volume=i))
+        buffer.stop()
+        self.assertEqual(len(list(tick_partitions.ticks(trading_day(timezone.now())))), 250)
+        self.assertEqual(buffer.stats()['pending'], 0)
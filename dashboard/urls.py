@@ -18,6 +18,7 @@ urlpatterns = [
     # API endpoints
     path('api/update-chart-data/', views.update_chart_data, name='update_chart_data'),
     path('api/search-stocks/', views.search_stocks, name='search_stocks'),
+    path('api/stocks/', views.stock_picker, name='stock_picker'),
     
     # Fyers API endpoints
     path('api/fyers/quotes/', views.get_stock_quotes, name='get_stock_quotes'),
@@ -28,4 +29,5 @@ urlpatterns = [
     path('api/market/live/', views.get_live_quotes, name='get_live_quotes'),
     path('api/market/historical/', views.get_historical_quotes, name='get_historical_quotes'),
     path('api/market/summary/', views.get_market_summary, name='get_market_summary'),
+    path('api/market/stream/', views.quote_stream, name='quote_stream'),
 ] 
\ No newline at end of file
@@ -1,18 +1,31 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField
-from decimal import Decimal
-from datetime import datetime, timedelta
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import F, ExpressionWrapper, DecimalField
+from datetime import datetime, timezone as dt_timezone
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import login as auth_login, authenticate
 from django.contrib.auth.models import User
 from .models import (
     Portfolio, Stock, PortfolioHolding, Transaction,
-    Watchlist, AssetAllocation, PortfolioPerformance, StockPrice, StockQuote
+    Watchlist, StockPrice, StockQuote, LatestStockPrice
 )
 from .forms import WatchlistForm
+from .services.quote_cache import get_quotes, MARKET_INDEX_SYMBOLS
+from .services.fyers_client import get_fyers_client
+from .services.search_index import stock_search_index
+from .services.stock_picker import picker_page, STOCK_PICKER_PAGE_SIZE
+from .services.live_prices import live_quotes
+from .services.quote_hub import quote_events, can_stream, QUOTE_STREAM_MAX_SYMBOLS
+from .services.quote_relay import quote_relay
+from .services.market_feed import ingestion_mode
+from .services.candles import intraday_candles, INTRADAY_TIMEFRAMES
+from .services.symbols import to_fyers_symbol
+from .services.dashboard_data import (
+    build_dashboard_context, overview_panel, performance_panel, transaction_history_panel,
+    holdings_panel, performance_chart_data
+)
 from django.urls import reverse
 import pdb
 import traceback
@@ -21,6 +34,8 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.cache import cache
 from django.utils import timezone
+from django.conf import settings
+from asgiref.sync import sync_to_async
 import sys
 import logging
 
@@ -35,6 +50,25 @@ if not ('makemigrations' in sys.argv or 'migrate' in sys.argv):
     except ImportError:
         logger.warning("Fyers service not available - some features will be disabled")
 
+def _epoch_param(request, name):
+    """Aware datetime for an optional epoch-seconds query parameter"""
+    value = request.GET.get(name)
+    return datetime.fromtimestamp(int(value), tz=dt_timezone.utc) if value else None
+
+def _fetch_fyers_quotes(symbols):
+    """Fetch quotes for cache misses in one batched Fyers call"""
+    return get_fyers_client().get_quotes(symbols)
+
+def _get_max_age(request, default=None):
+    """Read the caller's staleness bound in seconds from ?max_age="""
+    max_age = request.GET.get('max_age')
+    if max_age in (None, ''):
+        return default
+    max_age = float(max_age)
+    if max_age < 0:
+        raise ValueError('max_age must not be negative')
+    return max_age
+
 def signup(request):
     print('Signup view called')
     print('Request method:', request.method)
@@ -110,83 +144,12 @@ def signup(request):
 
 @login_required
 def dashboard(request):
-    portfolio = get_object_or_404(Portfolio, user=request.user)
-    
-    # Get portfolio overview data
-    total_value = portfolio.total_value
-    cash_balance = portfolio.cash_balance
-    total_investments = portfolio.holdings.aggregate(
-        total=Sum('total_invested')
-    )['total'] or Decimal('0')
-    
-    # Calculate total returns
-    total_returns = total_value - total_investments
-    returns_percentage = (total_returns / total_investments * 100) if total_investments > 0 else 0
-    
-    # Get daily change
-    today = datetime.now().date()
-    yesterday = today - timedelta(days=1)
-    today_performance = PortfolioPerformance.objects.filter(
-        portfolio=portfolio,
-        date=today
-    ).first()
-    yesterday_performance = PortfolioPerformance.objects.filter(
-        portfolio=portfolio,
-        date=yesterday
-    ).first()
-    
-    daily_change = Decimal('0')
-    if today_performance and yesterday_performance:
-        daily_change = today_performance.daily_change_percentage
-    
-    # Get recent transactions
-    recent_transactions = Transaction.objects.filter(
-        portfolio=portfolio
-    ).order_by('-date')[:5]
-    
-    # Get watchlist
-    watchlist = Watchlist.objects.filter(created_by=request.user).first()
-    watchlist_stocks = []
-    if watchlist:
-        watchlist_stocks = watchlist.stocks.all()
-    
-    # Get asset allocation
-    allocations = AssetAllocation.objects.filter(portfolio=portfolio)
-    allocation_data = [float(alloc.value) for alloc in allocations]
-    
-    # Get performance history for chart
-    performance_history = PortfolioPerformance.objects.filter(
-        portfolio=portfolio
-    ).order_by('date')[:30]  # Last 30 days
-    
-    performance_labels = [p.date.strftime('%Y-%m-%d') for p in performance_history]
-    performance_data = [float(p.total_value) for p in performance_history]
-    
-    watchlists = Watchlist.objects.filter(created_by=request.user)
-    stocks = Stock.objects.all().order_by('symbol')
-    
-    context = {
-        'total_value': total_value,
-        'cash_balance': cash_balance,
-        'total_investments': total_investments,
-        'total_returns': total_returns,
-        'returns_percentage': returns_percentage,
-        'daily_change': daily_change,
-        'recent_transactions': recent_transactions,
-        'watchlist': watchlist_stocks,
-        'allocation_data': allocation_data,
-        'performance_labels': performance_labels,
-        'performance_data': performance_data,
-        'watchlists': watchlists,
-        'stocks': stocks
-    }
-    
+    context = build_dashboard_context(request.user)
     return render(request, 'dashboard/index.html', context)
 
 @login_required
 def portfolio(request):
     portfolio = get_object_or_404(Portfolio, user=request.user)
-    holdings = PortfolioHolding.objects.filter(portfolio=portfolio)
     
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -194,9 +157,11 @@ def portfolio(request):
         shares = int(request.POST.get('shares', 0))
         
         try:
-            stock = Stock.objects.get(symbol=symbol.upper())
+            stock = Stock.objects.select_related('latest_price').get(symbol=symbol.upper())
             
-            if action == 'buy':
+            if stock.current_price is None:
+                messages.error(request, f'No price available for {symbol}')
+            elif action == 'buy':
                 # Calculate total cost
                 total_cost = stock.current_price * shares
                 
@@ -222,7 +187,8 @@ def portfolio(request):
                     
                     # Update portfolio cash balance
                     portfolio.cash_balance -= total_cost
-                    portfolio.save()
+                    # total_value belongs to the valuation engine
+                    portfolio.save(update_fields=['cash_balance', 'updated_at'])
                     
                     # Create transaction record
                     Transaction.objects.create(
@@ -254,7 +220,8 @@ def portfolio(request):
                     
                     # Update portfolio cash balance
                     portfolio.cash_balance += total_proceeds
-                    portfolio.save()
+                    # total_value belongs to the valuation engine
+                    portfolio.save(update_fields=['cash_balance', 'updated_at'])
                     
                     # Create transaction record
                     Transaction.objects.create(
@@ -276,7 +243,7 @@ def portfolio(request):
             messages.error(request, f'You do not own any shares of {symbol}')
     
     context = {
-        'holdings': holdings,
+        'holdings': holdings_panel(request.user, portfolio.pk),
         'portfolio': portfolio
     }
     return render(request, 'dashboard/portfolio.html', context)
@@ -291,35 +258,17 @@ def risk_analysis(request):
 
 @login_required
 def reports(request):
-    portfolio = get_object_or_404(Portfolio, user=request.user)
-    
-    # Get performance history
-    performance_history = PortfolioPerformance.objects.filter(
-        portfolio=portfolio
-    ).order_by('-date')[:30]
-    
-    # Get transaction history
-    transactions = Transaction.objects.filter(
-        portfolio=portfolio
-    ).order_by('-date')
+    portfolio_id = overview_panel(request.user)['portfolio_id']
     
     context = {
-        'performance_history': performance_history,
-        'transactions': transactions
+        'performance_history': performance_panel(request.user, portfolio_id),
+        'transactions': transaction_history_panel(request.user, portfolio_id)
     }
     return render(request, 'dashboard/reports.html', context)
 
 @login_required
 def update_chart_data(request):
-    portfolio = get_object_or_404(Portfolio, user=request.user)
-    
-    # Get performance history for chart
-    performance_history = PortfolioPerformance.objects.filter(
-        portfolio=portfolio
-    ).order_by('date')[:30]  # Last 30 days
-    
-    performance_labels = [p.date.strftime('%Y-%m-%d') for p in performance_history]
-    performance_data = [float(p.total_value) for p in performance_history]
+    performance_labels, performance_data = performance_chart_data(request.user)
     
     return JsonResponse({
         'labels': performance_labels,
@@ -329,38 +278,59 @@ def update_chart_data(request):
 @login_required
 def search_stocks(request):
     query = request.GET.get('q', '')
-    print(f"Searching for stocks with query: {query}")
-    
-    stocks = Stock.objects.filter(
-        symbol__icontains=query
-    ).order_by('symbol')[:10]
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
     
-    print(f"Found {stocks.count()} matching stocks")
-    for stock in stocks:
-        print(f"Stock: {stock.symbol} - {stock.name}")
+    stocks = stock_search_index.search(query, limit=limit)
+    prices = dict(
+        LatestStockPrice.objects.filter(stock_id__in=[stock['id'] for stock in stocks]).values_list('stock_id', 'price')
+    ) if stocks else {}
     
     results = [{
-        'symbol': stock.symbol,
-        'price': float(stock.current_price)
+        'id': stock['id'],
+        'symbol': stock['symbol'],
+        'name': stock['name'],
+        'price': float(prices[stock['id']]) if stock['id'] in prices else None
     } for stock in stocks]
     
-    print(f"Returning results: {results}")
     return JsonResponse({'results': results})
 
 @login_required
-def get_stock_quotes(request):
-    if not FYERS_AVAILABLE:
-        return JsonResponse({'error': 'Fyers service not available'}, status=503)
+def stock_picker(request):
+    """Cursor-paginated stock list for the watchlist stock pickers"""
+    try:
+        limit = int(request.GET.get('limit', STOCK_PICKER_PAGE_SIZE))
+        watchlist_id = int(request.GET['watchlist']) if request.GET.get('watchlist') else None
+        page = picker_page(
+            request.user,
+            query=request.GET.get('q', ''),
+            sector=request.GET.get('sector', ''),
+            cursor=request.GET.get('cursor', ''),
+            limit=limit,
+            watchlist_id=watchlist_id,
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor or limit'}, status=400)
     
+    return JsonResponse(page)
+
+@login_required
+def get_stock_quotes(request):
     try:
         symbols = request.GET.getlist('symbols[]')
         if not symbols:
             return JsonResponse({'error': 'No symbols provided'}, status=400)
         
-        fyers = FyersService()
-        quotes = fyers.get_quotes(symbols)
+        try:
+            max_age = _get_max_age(request)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid max_age'}, status=400)
+        
+        quotes, missing = get_quotes(symbols, max_age=max_age, fetch=_fetch_fyers_quotes)
         
-        return JsonResponse({'quotes': quotes})
+        return JsonResponse({'quotes': quotes, 'missing': missing})
         
     except Exception as e:
         logger.error(f"Error getting stock quotes: {str(e)}")
@@ -393,6 +363,7 @@ def fyers_callback(request):
         
         fyers = FyersService()
         access_token = fyers.generate_access_token(auth_code)
+        get_fyers_client().set_access_token(access_token)
         
         return JsonResponse({'access_token': access_token})
         
@@ -402,28 +373,56 @@ def fyers_callback(request):
 
 @login_required
 def get_live_quotes(request):
-    if not FYERS_AVAILABLE:
-        return JsonResponse({'error': 'Fyers service not available'}, status=503)
-    
     try:
         symbols = request.GET.getlist('symbols[]')
         if not symbols:
             return JsonResponse({'error': 'No symbols provided'}, status=400)
         
-        fyers = FyersService()
-        quotes = fyers.get_live_quotes(symbols)
+        try:
+            max_age = _get_max_age(request, default=getattr(settings, 'LIVE_QUOTE_MAX_AGE', 5))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid max_age'}, status=400)
+        
+        quotes, missing = get_quotes(symbols, max_age=max_age, fetch=_fetch_fyers_quotes)
         
-        return JsonResponse({'quotes': quotes})
+        return JsonResponse({'quotes': quotes, 'missing': missing})
         
     except Exception as e:
         logger.error(f"Error getting live quotes: {str(e)}")
         return JsonResponse({'error': 'Error getting live quotes'}, status=500)
 
+async def quote_stream(request):
+    """
+    Server-sent events push of live quotes for ?symbols=RELIANCE,TCS (Fyers
+    symbols such as NSE:NIFTY50-INDEX are accepted as is). Quotes are fanned
+    out from the ingesting websocket, so browsers never poll Fyers.
+    """
+    is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    if not can_stream(request):
+        return JsonResponse({'error': 'Quote streaming requires the ASGI server'}, status=501)
+    
+    requested = [symbol.strip() for symbol in request.GET.get('symbols', '').split(',') if symbol.strip()]
+    if not requested:
+        return JsonResponse({'error': 'No symbols provided'}, status=400)
+    if len(requested) > QUOTE_STREAM_MAX_SYMBOLS:
+        return JsonResponse({'error': f'At most {QUOTE_STREAM_MAX_SYMBOLS} symbols per stream'}, status=400)
+    
+    # Upstream symbol -> the name the client asked for
+    names = {(symbol if ':' in symbol else to_fyers_symbol(symbol.upper())): symbol for symbol in requested}
+    snapshot = await sync_to_async(live_quotes)(names)
+    if ingestion_mode() == 'command':
+        # Quotes arrive through the shared cache from run_market_feed
+        quote_relay.ensure_running()
+    
+    response = StreamingHttpResponse(quote_events(names, list(snapshot.values())), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def get_historical_quotes(request):
-    if not FYERS_AVAILABLE:
-        return JsonResponse({'error': 'Fyers service not available'}, status=503)
-    
     try:
         symbol = request.GET.get('symbol')
         timeframe = request.GET.get('timeframe', '1D')  # Default to 1 day
@@ -431,8 +430,18 @@ def get_historical_quotes(request):
         if not symbol:
             return JsonResponse({'error': 'No symbol provided'}, status=400)
         
-        fyers = FyersService()
-        data = fyers.get_historical_data(symbol, timeframe)
+        if timeframe in INTRADAY_TIMEFRAMES:
+            # Intraday bars are built locally from the live ticks, so charts
+            # never wait on the Fyers history API
+            try:
+                start, end = _epoch_param(request, 'from'), _epoch_param(request, 'to')
+            except (ValueError, OverflowError, OSError):
+                return JsonResponse({'error': 'from and to must be epoch seconds'}, status=400)
+            fyers_symbol = symbol if ':' in symbol else to_fyers_symbol(symbol.upper())
+            candles = intraday_candles(fyers_symbol, INTRADAY_TIMEFRAMES[timeframe], start, end)
+            return JsonResponse({'data': {'s': 'ok', 'candles': candles}, 'source': 'local'})
+        
+        data = get_fyers_client().get_historical_data(symbol, timeframe)
         
         return JsonResponse({'data': data})
         
@@ -442,14 +451,16 @@ def get_historical_quotes(request):
 
 @login_required
 def get_market_summary(request):
-    if not FYERS_AVAILABLE:
-        return JsonResponse({'error': 'Fyers service not available'}, status=503)
-    
     try:
-        fyers = FyersService()
-        summary = fyers.get_market_summary()
+        try:
+            max_age = _get_max_age(request)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid max_age'}, status=400)
+        
+        quotes, missing = get_quotes(MARKET_INDEX_SYMBOLS, max_age=max_age, fetch=_fetch_fyers_quotes)
+        summary = [quotes[symbol] for symbol in MARKET_INDEX_SYMBOLS if symbol in quotes]
         
-        return JsonResponse({'summary': summary})
+        return JsonResponse({'summary': summary, 'missing': missing})
         
     except Exception as e:
         logger.error(f"Error getting market summary: {str(e)}")
@@ -3,7 +3,10 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
 from django.urls import reverse
+from django.db.models import Q
 from ..models import Watchlist, Stock
+from ..services.stock_picker import sector_choices
+from ..services.live_prices import live_prices, sort_by_price
 from django.template.loader import render_to_string
 import logging
 import json
@@ -16,43 +19,44 @@ def watchlist(request):
     personal_watchlists = Watchlist.objects.filter(
         created_by=request.user,
         is_global=False
-    ).prefetch_related('stocks')
-    
-    # Get all stocks for the create watchlist modal
-    stocks = Stock.objects.all().order_by('symbol')
+    ).with_counts().with_preview_stocks()
     
+    # The create form's stock picker loads stocks from the picker API
     context = {
         'personal_watchlists': personal_watchlists,
-        'stocks': stocks,
+        'selected_stocks': [],
+        'sectors': sector_choices(),
     }
     
     return render(request, 'watchlist/watchlist.html', context)
 
 @login_required
 def watchlist_detail(request, watchlist_id):
-    watchlist = get_object_or_404(Watchlist, id=watchlist_id, created_by=request.user)
-    
-    # Get all stocks with their latest prices
-    stocks = watchlist.stocks.all().order_by('symbol')
-    stocks_with_prices = []
+    watchlist = get_object_or_404(
+        Watchlist.objects.filter(Q(created_by=request.user) | Q(is_global=True)),
+        id=watchlist_id
+    )
+    sort = request.GET.get('sort', 'symbol')
     
-    for stock in stocks:
-        stock_data = {
-            'stock': stock,
-            'latest_price': {
-                'price': 0,
-                'change': 0,
-                'change_percentage': 0,
-                'volume': 0
-            }
-        }
-        stocks_with_prices.append(stock_data)
+    # Live quotes first, then each stock's LatestStockPrice, resolved in bulk
+    stocks = list(watchlist.stocks.select_related('latest_price').order_by('symbol'))
+    prices = live_prices(stocks)
+    stocks_with_prices = [
+        {'stock': stock, 'latest_price': prices.get(stock.pk)}
+        for stock in stocks
+    ]
+    try:
+        stocks_with_prices = sort_by_price(stocks_with_prices, sort)
+    except ValueError:
+        sort = 'symbol'
     
     context = {
         'watchlist': watchlist,
         'stocks_with_prices': stocks_with_prices,
-        'is_owner': watchlist.created_by == request.user,
-        'is_subscriber': request.user in watchlist.subscribers.all(),
+        'sort': sort,
+        'is_owner': watchlist.created_by_id == request.user.pk,
+        # Indexed lookup on the subscribers table rather than loading every subscriber
+        'is_subscriber': watchlist.subscribers.filter(pk=request.user.pk).exists(),
         'total_stocks': len(stocks_with_prices)
     }
     
@@ -66,10 +70,10 @@ def watchlist_detail(request, watchlist_id):
 def create_watchlist(request):
     """Handle watchlist creation"""
     if request.method == 'GET':
-        # Get all stocks for the create watchlist form
-        stocks = Stock.objects.all().order_by('symbol')
+        # Nothing is selected yet; the stock picker loads stocks as the user searches
         context = {
-            'stocks': stocks,
+            'selected_stocks': [],
+            'sectors': sector_choices(),
         }
         return render(request, 'watchlist/create_watchlist_content.html', context)
     
@@ -310,11 +314,11 @@ def edit_watchlist(request, watchlist_id):
     watchlist = get_object_or_404(Watchlist, id=watchlist_id, created_by=request.user)
     
     if request.method == 'GET':
-        # Get all stocks for the edit form
-        stocks = Stock.objects.all().order_by('symbol')
+        # Render only the watchlist's own stocks; the picker loads the rest
         context = {
             'watchlist': watchlist,
-            'stocks': stocks,
+            'selected_stocks': watchlist.stocks.order_by('symbol').only('id', 'symbol'),
+            'sectors': sector_choices(),
         }
         return render(request, 'watchlist/edit_watchlist_content.html', context)
     
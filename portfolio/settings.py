@@ -67,6 +67,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'dashboard.context_processors.watchlists',
+                'dashboard.context_processors.quote_streaming',
             ],
         },
     },
@@ -85,6 +87,29 @@ DATABASES = {
     }
 }
 
+# Cache
+# Quotes, panels, tag versions and cross-process invalidations all go
+# through the cache. Set REDIS_URL whenever more than one process serves
+# the site (several gunicorn workers, or run_market_feed): without it each
+# process has a private local-memory cache, sized here so quotes and
+# panels for thousands of symbols and users fit without constant culling,
+# and invalidations made in one process never reach the others
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -143,3 +168,120 @@ LOGOUT_REDIRECT_URL = 'login'
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
+
+# Live market data pipeline
+# Ticks from the Fyers websocket are buffered in memory and written in
+# batches to the day-partitioned tick tables (tick_partitions), refreshing
+# LatestStockPrice. Backpressure mode when the buffer is full is one of
+# 'block', 'drop_oldest' or 'coalesce' (keep only the newest tick per symbol).
+TICK_BUFFER_CAPACITY = 10000
+TICK_BUFFER_BATCH_SIZE = 500
+TICK_BUFFER_FLUSH_INTERVAL = 1.0  # seconds
+TICK_BUFFER_BACKPRESSURE = 'drop_oldest'
+
+# Ticks are coalesced per symbol before they reach the cache and the tick
+# buffer: only the newest tick per symbol is written every interval.
+# Set to 0 to write every tick.
+QUOTE_COALESCE_INTERVAL = 0.25  # seconds
+
+# Staleness bounds (seconds) for quotes served from the in-process quote
+# table and the stock_quote_* cache. Older entries are refetched from Fyers
+# or fall back to LatestStockPrice. Callers can override per request
+# with ?max_age=. None accepts any cached entry.
+QUOTE_MAX_AGE = 60
+LIVE_QUOTE_MAX_AGE = 5
+
+# Shared Fyers REST client: upstream calls in flight at once per process,
+# and per-request timeout in seconds
+FYERS_CLIENT_MAX_CONCURRENCY = 8
+FYERS_CLIENT_TIMEOUT = 10
+
+# Fyers history requests per second made by `manage.py backfill_prices`
+FYERS_HISTORY_RATE_LIMIT = 8
+
+# Columnar daily bar store (see dashboard/services/ohlcv_store.py), filled
+# from StockPrice by `manage.py sync_ohlcv_store`
+OHLCV_STORE_DIR = os.path.join(BASE_DIR, 'data', 'ohlcv')
+
+# How often (seconds) live re-valuations of holdings and portfolio totals
+# are written back to the database
+PORTFOLIO_VALUATION_INTERVAL = 5.0
+
+# How often (seconds) each process checks whether another process has
+# changed holdings and invalidated its valuation index
+VALUATION_INDEX_CHECK_INTERVAL = 5.0
+
+# With 'thread' ingestion every worker values the same ticks; only the one
+# holding this cache lease (seconds, renewed on every write-back) writes them
+VALUATION_WRITER_LEASE = 30.0
+
+# Per-user dashboard panel cache lifetime in seconds; panels are also
+# invalidated as soon as the rows they depend on change
+PANEL_CACHE_TIMEOUT = 300
+
+# How often (seconds) each process checks whether another process has
+# invalidated its in-memory stock search index
+SEARCH_INDEX_CHECK_INTERVAL = 5.0
+
+# Server-sent events quote push (/dashboard/api/market/stream/). Streams
+# need the ASGI application in portfolio/asgi.py, served with
+#   gunicorn portfolio.asgi:application -k uvicorn.workers.UvicornWorker
+# Under WSGI the endpoint answers 501 and pages show static prices. Each
+# stream holds at most QUOTE_STREAM_MAX_SYMBOLS symbols, sends a keep-alive
+# comment every QUOTE_STREAM_HEARTBEAT seconds when idle and is closed after
+# QUOTE_STREAM_MAX_AGE seconds, after which the browser reconnects
+QUOTE_STREAM_MAX_SYMBOLS = 200
+QUOTE_STREAM_HEARTBEAT = 15.0
+QUOTE_STREAM_MAX_AGE = 300.0
+
+# Upstream websocket subscriptions follow demand: market indices, stocks in
+# any portfolio or watchlist, and symbols open in push streams. Changes are
+# sent every FYERS_WS_SUBSCRIPTION_INTERVAL seconds in frames of at most
+# FYERS_WS_SYMBOLS_PER_MESSAGE symbols. Portfolio and watchlist changes made
+# in other processes are picked up within WATCHED_SYMBOLS_CHECK_INTERVAL seconds
+FYERS_WS_SYMBOLS_PER_MESSAGE = 100
+FYERS_WS_SUBSCRIPTION_INTERVAL = 1.0
+WATCHED_SYMBOLS_CHECK_INTERVAL = 5.0
+
+# The upstream websocket is owned by one supervisor thread. After a drop it
+# reconnects after a random delay between FYERS_WS_RECONNECT_BASE_DELAY and
+# an exponentially growing ceiling capped at FYERS_WS_RECONNECT_MAX_DELAY.
+# Pings go out every FYERS_WS_PING_INTERVAL seconds, and a connection with
+# no data or pong for FYERS_WS_HEARTBEAT_TIMEOUT seconds is closed as stale
+FYERS_WS_RECONNECT_BASE_DELAY = 1.0
+FYERS_WS_RECONNECT_MAX_DELAY = 60.0
+FYERS_WS_PING_INTERVAL = 10.0
+FYERS_WS_HEARTBEAT_TIMEOUT = 30.0
+
+# Market data ingestion. 'thread' starts a websocket thread in every Django
+# process. 'command' leaves web workers free of background threads: run
+# exactly one `python manage.py run_market_feed` per deployment (needs the
+# websockets package). 'command' requires a cache shared between processes
+# (set REDIS_URL; run_market_feed refuses to start on a local-memory cache):
+# quotes, push client symbols and holding/watchlist invalidations all pass
+# through it, and web workers relay quotes to push clients every
+# QUOTE_RELAY_INTERVAL seconds
+MARKET_DATA_INGESTION = 'thread'
+QUOTE_RELAY_INTERVAL = 0.5
+
+# Websocket messages are decoded straight into compact Tick records by
+# TICK_DECODER: 'auto' uses msgspec or orjson when installed and the json
+# module otherwise. Compare them with `python manage.py benchmark_tick_decode`
+TICK_DECODER = 'auto'
+
+# Live ticks are stored in one partition per trading day (a calendar day in
+# TICK_PARTITION_TIME_ZONE): native partitions on PostgreSQL, a table per day
+# elsewhere. `python manage.py compact_ticks` (run daily, after the close)
+# rolls finished days up into 1-minute IntradayBar rows and drops partitions
+# older than TICK_RETENTION_DAYS
+TICK_PARTITION_TIME_ZONE = 'Asia/Kolkata'
+TICK_RETENTION_DAYS = 7
+
+# Live ticks are aggregated into IntradayBar rows of each INTRADAY_RESOLUTIONS
+# size (minutes) as they arrive, so 1M/5M/15M history is served from local
+# bars instead of the Fyers history API. A bar stays open for
+# CANDLE_LATE_TOLERANCE seconds after it ends to take late ticks; completed
+# bars are written every CANDLE_FLUSH_INTERVAL seconds
+INTRADAY_RESOLUTIONS = (1, 5, 15)
+CANDLE_LATE_TOLERANCE = 2.0
+CANDLE_FLUSH_INTERVAL = 2.0
@@ -1,5 +1,288 @@
 // Only declare the class if it hasn't been declared yet
 if (typeof WatchlistManager === 'undefined') {
+    // Lazy-loading stock picker for the create and edit watchlist fragments.
+    // The server renders only the selected stocks (as tags holding hidden
+    // "stocks" inputs); everything else is fetched page by page from the
+    // stock picker API as the user searches and scrolls. Listeners are
+    // delegated from the document so fragments loaded later work too.
+    class StockPicker {
+        static forElement(element) {
+            const root = element && element.closest('.stock-picker');
+            if (!root) {
+                return null;
+            }
+            if (!root.stockPicker) {
+                root.stockPicker = new StockPicker(root);
+            }
+            return root.stockPicker;
+        }
+
+        constructor(root) {
+            this.root = root;
+            this.url = root.dataset.pickerUrl;
+            this.watchlistId = root.dataset.watchlistId || '';
+            this.search = root.querySelector('.stock-picker-search');
+            this.sector = root.querySelector('.stock-picker-sector');
+            this.list = root.querySelector('.stock-list');
+            this.container = root.querySelector('.stock-list-container');
+            this.selectedList = root.querySelector('.selected-stocks');
+            this.selectedCount = root.querySelector('.selected-count');
+            this.noResults = root.querySelector('.no-results');
+            this.loading = root.querySelector('.search-loading');
+
+            this.query = '';
+            this.cursor = null;
+            this.hasNext = false;
+            this.isLoading = false;
+            this.requestId = 0;
+            this.searchTimeout = null;
+
+            // stock id -> symbol, seeded from the server-rendered tags
+            this.selected = new Map();
+            root.querySelectorAll('.selected-stock-tag').forEach(tag => {
+                this.selected.set(tag.dataset.stockId, tag.dataset.symbol);
+            });
+        }
+
+        scheduleSearch() {
+            clearTimeout(this.searchTimeout);
+            this.searchTimeout = setTimeout(() => {
+                this.query = this.search ? this.search.value.trim() : '';
+                this.loadPage(true);
+            }, 300);
+        }
+
+        loadPage(reset) {
+            if (reset) {
+                this.cursor = null;
+                this.hasNext = true;
+                this.list.innerHTML = '';
+            }
+            if (!this.hasNext || (this.isLoading && !reset)) {
+                return;
+            }
+            const requestId = ++this.requestId;
+            this.isLoading = true;
+            if (this.loading) this.loading.style.display = 'block';
+            if (this.noResults) this.noResults.style.display = 'none';
+
+            const params = new URLSearchParams({q: this.query});
+            if (this.sector && this.sector.value) params.set('sector', this.sector.value);
+            if (this.watchlistId) params.set('watchlist', this.watchlistId);
+            if (this.cursor) params.set('cursor', this.cursor);
+
+            fetch(`${this.url}?${params}`)
+                .then(response => response.json())
+                .then(data => {
+                    // Ignore responses for searches the user has already replaced
+                    if (requestId !== this.requestId) {
+                        return;
+                    }
+                    this.cursor = data.next_cursor;
+                    this.hasNext = data.next_cursor !== null;
+                    data.results.forEach(stock => this.list.appendChild(this.renderItem(stock)));
+                    if (this.noResults) {
+                        this.noResults.style.display = this.list.children.length === 0 ? 'block' : 'none';
+                    }
+                })
+                .catch(error => {
+                    console.error('Error loading stocks:', error);
+                })
+                .finally(() => {
+                    if (requestId === this.requestId) {
+                        this.isLoading = false;
+                        if (this.loading) this.loading.style.display = 'none';
+                    }
+                });
+        }
+
+        // Build nodes directly so stock names are never parsed as HTML
+        renderItem(stock) {
+            const item = document.createElement('div');
+            item.className = 'stock-item';
+            const check = document.createElement('div');
+            check.className = 'form-check';
+            const checkbox = document.createElement('input');
+            checkbox.className = 'form-check-input stock-checkbox';
+            checkbox.type = 'checkbox';
+            checkbox.value = stock.id;
+            checkbox.id = `pickerStock${stock.id}`;
+            checkbox.dataset.symbol = stock.symbol;
+            checkbox.checked = this.selected.has(String(stock.id));
+
+            const label = document.createElement('label');
+            label.className = 'form-check-label';
+            label.htmlFor = checkbox.id;
+            const symbol = document.createElement('strong');
+            symbol.className = 'stock-symbol';
+            symbol.textContent = stock.symbol;
+            const name = document.createElement('small');
+            name.className = 'stock-name text-muted ms-2';
+            name.textContent = stock.name;
+            label.append(symbol, name);
+            if (stock.in_watchlist) {
+                const badge = document.createElement('span');
+                badge.className = 'badge bg-secondary ms-2';
+                badge.textContent = 'In watchlist';
+                label.appendChild(badge);
+            }
+
+            check.append(checkbox, label);
+            item.appendChild(check);
+            return item;
+        }
+
+        toggle(stockId, symbol, checked) {
+            if (checked) {
+                this.selected.set(stockId, symbol);
+            } else {
+                this.selected.delete(stockId);
+            }
+            this.renderSelected();
+        }
+
+        remove(stockId) {
+            this.selected.delete(stockId);
+            const checkbox = this.list.querySelector(`.stock-checkbox[value="${stockId}"]`);
+            if (checkbox) {
+                checkbox.checked = false;
+            }
+            this.renderSelected();
+        }
+
+        clear() {
+            this.selected.clear();
+            this.list.querySelectorAll('.stock-checkbox:checked').forEach(checkbox => {
+                checkbox.checked = false;
+            });
+            this.renderSelected();
+        }
+
+        // Selected stocks are submitted through the hidden inputs in their tags
+        renderSelected() {
+            if (this.selectedCount) {
+                this.selectedCount.textContent = this.selected.size;
+            }
+            this.selectedList.innerHTML = '';
+            this.selected.forEach((symbol, stockId) => {
+                const tag = document.createElement('div');
+                tag.className = 'selected-stock-tag';
+                tag.dataset.stockId = stockId;
+                tag.dataset.symbol = symbol;
+                tag.appendChild(document.createTextNode(symbol));
+                const input = document.createElement('input');
+                input.type = 'hidden';
+                input.name = 'stocks';
+                input.value = stockId;
+                const button = document.createElement('button');
+                button.type = 'button';
+                button.className = 'btn-remove-stock';
+                button.innerHTML = '<i class="fas fa-times"></i>';
+                tag.append(input, button);
+                this.selectedList.appendChild(tag);
+            });
+        }
+    }
+
+    document.addEventListener('input', (e) => {
+        if (e.target.classList.contains('stock-picker-search')) {
+            StockPicker.forElement(e.target).scheduleSearch();
+        }
+    });
+
+    document.addEventListener('change', (e) => {
+        const picker = StockPicker.forElement(e.target);
+        if (!picker) {
+            return;
+        }
+        if (e.target.classList.contains('stock-picker-sector')) {
+            picker.scheduleSearch();
+        } else if (e.target.classList.contains('stock-checkbox')) {
+            picker.toggle(e.target.value, e.target.dataset.symbol, e.target.checked);
+        }
+    });
+
+    document.addEventListener('click', (e) => {
+        const button = e.target.closest('.btn-remove-stock');
+        const picker = button && StockPicker.forElement(button);
+        if (picker) {
+            e.preventDefault();
+            picker.remove(button.closest('.selected-stock-tag').dataset.stockId);
+        }
+    });
+
+    // Scroll events don't bubble, so listen in the capture phase
+    document.addEventListener('scroll', (e) => {
+        const container = e.target;
+        if (!container.classList || !container.classList.contains('stock-list-container')) {
+            return;
+        }
+        const picker = StockPicker.forElement(container);
+        if (picker && container.scrollTop + container.clientHeight >= container.scrollHeight - 50) {
+            picker.loadPage(false);
+        }
+    }, true);
+
+    window.StockPicker = StockPicker;
+
+    // Live prices for the watchlist table over server-sent events. The
+    // server fans quotes out from its single upstream websocket, so the
+    // page never polls; EventSource reconnects on its own when the server
+    // ends a stream.
+    const LiveQuotes = {
+        source: null,
+
+        attach(root) {
+            this.detach();
+            const table = (root || document).querySelector('tbody[data-stream-url]');
+            if (!table || typeof EventSource === 'undefined') {
+                return;
+            }
+            const symbols = Array.from(table.querySelectorAll('tr[data-stock-symbol]')).map(row => row.dataset.stockSymbol);
+            if (symbols.length === 0) {
+                return;
+            }
+            const params = new URLSearchParams({symbols: symbols.join(',')});
+            this.source = new EventSource(`${table.dataset.streamUrl}?${params}`);
+            this.source.addEventListener('quotes', (e) => {
+                JSON.parse(e.data).forEach(quote => this.update(table, quote));
+            });
+        },
+
+        detach() {
+            if (this.source) {
+                this.source.close();
+                this.source = null;
+            }
+        },
+
+        update(table, quote) {
+            const row = table.querySelector(`tr[data-stock-symbol="${CSS.escape(quote.symbol)}"]`);
+            if (!row) {
+                return;
+            }
+            const price = row.querySelector('.live-price');
+            const change = row.querySelector('.live-change');
+            const volume = row.querySelector('.live-volume');
+            if (price) {
+                price.textContent = `₹${Number(quote.ltp).toFixed(2)}`;
+                price.classList.remove('text-muted');
+            }
+            if (change) {
+                change.textContent = `${Number(quote.change).toFixed(2)} (${Number(quote.change_percentage).toFixed(2)}%)`;
+                change.classList.remove('text-muted', 'text-success', 'text-danger');
+                if (quote.change > 0) change.classList.add('text-success');
+                if (quote.change < 0) change.classList.add('text-danger');
+            }
+            if (volume) {
+                volume.textContent = Number(quote.volume).toLocaleString();
+                volume.classList.remove('text-muted');
+            }
+        }
+    };
+
+    window.LiveQuotes = LiveQuotes;
+
     class WatchlistManager {
         constructor() {
             console.log('WatchlistManager constructor called');
@@ -8,6 +291,7 @@ if (typeof WatchlistManager === 'undefined') {
             this.initializeModalListener();
             this.init();
             this.handleDirectUrlAccess();
+            LiveQuotes.attach(document);
         }
 
         initializeElements() {
@@ -44,14 +328,6 @@ if (typeof WatchlistManager === 'undefined') {
         initializeProperties() {
             try {
                 // DOM Elements
-                this.stockSearch = document.getElementById('stockSearch');
-                this.stockItems = document.querySelectorAll('.stock-item');
-                this.selectedStocksList = document.getElementById('selectedStocksList');
-                this.selectedCount = document.getElementById('selectedCount');
-                this.stockListContainer = document.querySelector('.stock-list-container');
-                this.noResults = document.getElementById('noResults');
-                this.searchLoading = document.getElementById('searchLoading');
-                this.addStockBtn = document.getElementById('addStock');
                 this.watchlistDetailsContainer = document.getElementById('watchlistDetails');
                 this.watchlistDetailsContent = document.getElementById('watchlistDetailsContent');
                 this.watchlistDetailsName = document.getElementById('watchlistDetailsName');
@@ -68,7 +344,6 @@ if (typeof WatchlistManager === 'undefined') {
                 }
 
                 // State
-                this.selectedStocks = new Set();
                 this.currentWatchlistId = null;
                 this.isFormVisible = false;
             } catch (error) {
@@ -86,101 +361,10 @@ if (typeof WatchlistManager === 'undefined') {
         }
 
         init() {
-            this.setupStockSearch();
-            this.setupStockSelection();
-        }
-
-        setupStockSearch() {
-            const searchInput = document.getElementById('stockSearch');
-            const stockItems = document.querySelectorAll('.stock-item');
-            const noResults = document.getElementById('noResults');
-            const searchLoading = document.getElementById('searchLoading');
-            let searchTimeout;
-
-            if (searchInput) {
-                searchInput.addEventListener('input', (e) => {
-                    const searchText = e.target.value.toLowerCase().trim();
-                    
-                    // Show loading indicator
-                    if (searchLoading) searchLoading.style.display = 'block';
-                    if (noResults) noResults.style.display = 'none';
-
-                    // Clear previous timeout
-                    clearTimeout(searchTimeout);
-
-                    // Set new timeout to prevent too many updates
-                    searchTimeout = setTimeout(() => {
-                        let matchFound = false;
-
-                        stockItems.forEach(item => {
-                            const symbol = item.querySelector('.stock-symbol').textContent.toLowerCase();
-                            const name = item.querySelector('.stock-name').textContent.toLowerCase();
-
-                            if (searchText === '') {
-                                item.style.display = 'none';
-                            } else if (symbol.includes(searchText) || name.includes(searchText)) {
-                                item.style.display = 'block';
-                                matchFound = true;
-                            } else {
-                                item.style.display = 'none';
-                            }
-                        });
-
-                        // Hide loading indicator
-                        if (searchLoading) searchLoading.style.display = 'none';
-
-                        // Show/hide no results message
-                        if (noResults) {
-                            noResults.style.display = searchText && !matchFound ? 'block' : 'none';
-                        }
-                    }, 300);
-                });
-            }
-        }
-
-        setupStockSelection() {
-            const stockCheckboxes = document.querySelectorAll('.stock-checkbox');
-            const selectedStocksList = document.getElementById('selectedStocksList');
-            const selectedCount = document.getElementById('selectedCount');
-
-            stockCheckboxes.forEach(checkbox => {
-                checkbox.addEventListener('change', () => {
-                    this.updateSelectedStocks();
-                });
-            });
-        }
-
-        updateSelectedStocks() {
-            const selectedStocksList = document.getElementById('selectedStocksList');
-            const selectedCount = document.getElementById('selectedCount');
-            const checkedBoxes = document.querySelectorAll('.stock-checkbox:checked');
-
-            if (selectedStocksList && selectedCount) {
-                selectedCount.textContent = checkedBoxes.length;
-                selectedStocksList.innerHTML = '';
-
-                checkedBoxes.forEach(checkbox => {
-                    const stockItem = checkbox.closest('.stock-item');
-                    const symbol = stockItem.querySelector('strong').textContent.trim();
-
-                    const stockTag = document.createElement('div');
-                    stockTag.className = 'selected-stock-tag';
-                    stockTag.innerHTML = `
-                        ${symbol}
-                        <button type="button" class="btn-remove-stock" onclick="window.watchlistManager.removeStock('${checkbox.id}')">
-                            <i class="fas fa-times"></i>
-                        </button>
-                    `;
-                    selectedStocksList.appendChild(stockTag);
-                });
-            }
-        }
-
-        removeStock(checkboxId) {
-            const checkbox = document.getElementById(checkboxId);
-            if (checkbox) {
-                checkbox.checked = false;
-                this.updateSelectedStocks();
+            // Stock picker listeners are delegated from the document by StockPicker
+            this.picker = StockPicker.forElement(document.querySelector('.stock-picker'));
+            if (this.picker) {
+                this.picker.loadPage(true);
             }
         }
 
@@ -189,102 +373,16 @@ if (typeof WatchlistManager === 'undefined') {
             const form = document.getElementById('createWatchlistForm');
             if (form) {
                 form.reset();
-                this.updateSelectedStocks();
+                const picker = StockPicker.forElement(form.querySelector('.stock-picker'));
+                if (picker) {
+                    picker.clear();
+                }
             }
             // Trigger the event to hide the form
             const event = new CustomEvent('hideWatchlistForm');
             document.dispatchEvent(event);
         }
 
-        // Stock search and selection
-        handleStockSearch() {
-            try {
-                const searchInput = document.getElementById('stockSearch');
-                const stockItems = document.querySelectorAll('.stock-item');
-                const noResults = document.getElementById('noResults');
-                const addStockBtn = document.getElementById('addStock');
-                
-                if (!searchInput || !stockItems) return;
-                
-                const searchText = searchInput.value.toLowerCase().trim();
-                let visibleCount = 0;
-
-                stockItems.forEach(item => {
-                    const stockNameEl = item.querySelector('.stock-name');
-                    const stockSymbolEl = item.querySelector('.stock-symbol');
-                    
-                    if (!stockNameEl || !stockSymbolEl) return;
-                    
-                    const stockName = stockNameEl.textContent.toLowerCase();
-                    const stockSymbol = stockSymbolEl.textContent.toLowerCase();
-                    const isVisible = searchText === '' ? false : 
-                                    stockName.includes(searchText) || 
-                                    stockSymbol.includes(searchText);
-                    
-                    item.style.display = isVisible ? 'block' : 'none';
-                    if (isVisible) visibleCount++;
-                });
-
-                // Update UI elements
-                if (noResults) {
-                    noResults.style.display = searchText && visibleCount === 0 ? 'block' : 'none';
-                }
-                if (addStockBtn) {
-                    addStockBtn.disabled = visibleCount === 0;
-                }
-            } catch (error) {
-                console.error('Error in handleStockSearch:', error);
-            }
-        }
-
-        handleAddStock() {
-            const searchText = this.stockSearch.value.toLowerCase();
-            const visibleItems = Array.from(this.stockItems).filter(item => 
-                item.style.display !== 'none' && 
-                !item.querySelector('.stock-checkbox').checked
-            );
-            
-            if (visibleItems.length > 0) {
-                this.handleStockSelection(visibleItems[0]);
-            }
-        }
-
-        handleStockSelection() {
-            const selectedCheckboxes = document.querySelectorAll('.stock-checkbox:checked');
-            console.log('Selected checkboxes:', selectedCheckboxes.length);
-            
-            if (this.selectedCount) {
-                this.selectedCount.textContent = selectedCheckboxes.length;
-            }
-
-            const selectedStocksList = document.getElementById('selectedStocksList');
-            if (selectedStocksList) {
-                selectedStocksList.innerHTML = '';
-                selectedCheckboxes.forEach(checkbox => {
-                    const stockItem = checkbox.closest('.stock-item');
-                    const stockSymbol = stockItem.querySelector('strong').textContent.trim();
-                    const stockId = checkbox.value;
-
-                    selectedStocksList.innerHTML += `
-                        <div class="selected-stock-tag" data-stock-id="${stockId}">
-                            ${stockSymbol}
-                            <button type="button" class="btn-remove-stock" onclick="watchlistManager.removeSelectedStock('${stockId}')">
-                                <i class="fas fa-times"></i>
-                            </button>
-                        </div>
-                    `;
-                });
-            }
-        }
-
-        removeSelectedStock(stockId) {
-            const checkbox = document.querySelector(`.stock-checkbox[value="${stockId}"]`);
-            if (checkbox) {
-                checkbox.checked = false;
-                this.handleStockSelection();
-            }
-        }
-
         // Watchlist creation
         initializeCreateWatchlistForm() {
             const form = document.getElementById('createWatchlistForm');
@@ -292,19 +390,8 @@ if (typeof WatchlistManager === 'undefined') {
                 form.addEventListener('submit', async (e) => {
                     e.preventDefault();
                     
+                    // Selected stocks are carried by the picker's hidden inputs
                     const formData = new FormData(form);
-                    // Get all checked stock checkboxes
-                    const selectedStocks = Array.from(document.querySelectorAll('.stock-checkbox:checked')).map(cb => cb.value);
-                    
-                    // Debug print
-                    console.log('Selected stocks:', selectedStocks);
-                    
-                    // Clear any existing stocks field
-                    formData.delete('stocks');
-                    // Add each selected stock ID
-                    selectedStocks.forEach(stockId => {
-                        formData.append('stocks', stockId);
-                    });
 
                     // Debug print form data
                     for (let pair of formData.entries()) {
@@ -341,6 +428,7 @@ if (typeof WatchlistManager === 'undefined') {
                                 if (watchlistResponse.ok) {
                                     const html = await watchlistResponse.text();
                                     mainContent.innerHTML = html;
+                                    LiveQuotes.attach(mainContent);
                                 } else {
                                     mainContent.innerHTML = '<div class="alert alert-danger">Error loading watchlist details</div>';
                                 }
@@ -430,6 +518,7 @@ if (typeof WatchlistManager === 'undefined') {
                             const existingCardBody = dashboardContent.querySelector('.card-body');
                             if (existingCardBody) {
                                 existingCardBody.innerHTML = cardBody.innerHTML;
+                                LiveQuotes.attach(existingCardBody);
                             }
                         }
                         // Update URL without page reload
@@ -582,168 +671,14 @@ if (typeof WatchlistManager === 'undefined') {
                 const modal = new bootstrap.Modal(document.getElementById('editWatchlistModal'));
                 modal.show();
 
-                // Initialize stock search functionality for the edit modal
+                // The edit fragment's stock picker wires itself up through
+                // StockPicker's delegated listeners
                 const editModal = document.getElementById('editWatchlistModal');
-                const searchInput = editModal.querySelector('#stockSearch');
-                const stockItems = editModal.querySelectorAll('.stock-item');
-                const noResults = editModal.querySelector('#noResults');
-                const searchLoading = editModal.querySelector('#searchLoading');
-                const selectedStocksList = editModal.querySelector('#selectedStocksList');
-                const selectedCount = editModal.querySelector('#selectedCount');
-
-                console.log('Edit Modal Elements:', {
-                    searchInput: !!searchInput,
-                    stockItems: stockItems.length,
-                    noResults: !!noResults,
-                    searchLoading: !!searchLoading,
-                    selectedStocksList: !!selectedStocksList,
-                    selectedCount: !!selectedCount
-                });
-
-                // Hide all stocks by default
-                stockItems.forEach(item => {
-                    item.style.display = 'none';
-                });
-
-                if (searchInput) {
-                    let searchTimeout;
-                    searchInput.addEventListener('input', (e) => {
-                        const searchText = e.target.value.toLowerCase().trim();
-                        console.log('Search Text:', searchText);
-                        
-                        // Show loading indicator
-                        if (searchLoading) searchLoading.style.display = 'block';
-                        if (noResults) noResults.style.display = 'none';
-
-                        // Clear previous timeout
-                        clearTimeout(searchTimeout);
-
-                        // Set new timeout to prevent too many updates
-                        searchTimeout = setTimeout(() => {
-                            let matchFound = false;
-                            console.log('Processing search with timeout');
-
-                            // Hide all items if search text is less than 3 characters
-                            if (searchText.length < 3) {
-                                stockItems.forEach(item => {
-                                    item.style.display = 'none';
-                                });
-                                if (searchLoading) searchLoading.style.display = 'none';
-                                if (noResults) noResults.style.display = 'none';
-                                return;
-                            }
-
-                            stockItems.forEach((item, index) => {
-                                // Get the stock name and symbol from the label text
-                                const label = item.querySelector('.form-check-label');
-                                if (!label) {
-                                    console.log(`Stock ${index + 1} missing label element`);
-                                    return;
-                                }
-
-                                const labelText = label.textContent.toLowerCase();
-                                console.log(`Stock ${index + 1} label text:`, labelText);
-                                
-                                if (labelText.includes(searchText)) {
-                                    item.style.display = 'block';
-                                    matchFound = true;
-                                    console.log(`Stock ${index + 1} shown (matched search)`);
-                                } else {
-                                    item.style.display = 'none';
-                                    console.log(`Stock ${index + 1} hidden (no match)`);
-                                }
-                            });
-
-                            // Hide loading indicator
-                            if (searchLoading) searchLoading.style.display = 'none';
-
-                            // Show/hide no results message
-                            if (noResults) {
-                                const shouldShowNoResults = searchText.length >= 3 && !matchFound;
-                                noResults.style.display = shouldShowNoResults ? 'block' : 'none';
-                                console.log('No Results Display:', shouldShowNoResults);
-                            }
-
-                            console.log('Search Complete:', {
-                                matchFound,
-                                searchText,
-                                visibleItems: Array.from(stockItems).filter(item => item.style.display !== 'none').length
-                            });
-                        }, 300);
-                    });
-                } else {
-                    console.error('Search input element not found in edit modal');
-                }
-
-                // Initialize stock selection functionality
-                const stockCheckboxes = editModal.querySelectorAll('.stock-checkbox');
-
-                // Set initial checked state based on existing selected stocks
-                stockCheckboxes.forEach(checkbox => {
-                    const stockId = checkbox.value;
-                    const existingStock = selectedStocksList.querySelector(`.selected-stock-tag[data-stock-id="${stockId}"]`);
-                    if (existingStock) {
-                        checkbox.checked = true;
-                    }
-                });
-
-                // Update selected count initially
-                if (selectedCount) {
-                    const checkedBoxes = editModal.querySelectorAll('.stock-checkbox:checked');
-                    selectedCount.textContent = checkedBoxes.length;
+                this.editPicker = StockPicker.forElement(editModal.querySelector('.stock-picker'));
+                if (this.editPicker) {
+                    this.editPicker.loadPage(true);
                 }
 
-                stockCheckboxes.forEach(checkbox => {
-                    checkbox.addEventListener('change', () => {
-                        const checkedBoxes = editModal.querySelectorAll('.stock-checkbox:checked');
-                        if (selectedCount) {
-                            selectedCount.textContent = checkedBoxes.length;
-                        }
-                        if (selectedStocksList) {
-                            if (checkbox.checked) {
-                                // Only add the new stock if it's checked and not already in the list
-                                const stockId = checkbox.value;
-                                const existingTag = selectedStocksList.querySelector(`.selected-stock-tag[data-stock-id="${stockId}"]`);
-                                if (!existingTag) {
-                                    const stockItem = checkbox.closest('.stock-item');
-                                    const stockSymbol = stockItem.querySelector('strong').textContent.trim();
-                                    const stockTag = `
-                                        <div class="selected-stock-tag" data-stock-id="${stockId}">
-                                            ${stockSymbol}
-                                            <button type="button" class="btn-remove-stock" onclick="watchlistManager.removeSelectedStock('${stockId}')">
-                                                <i class="fas fa-times"></i>
-                                            </button>
-                                        </div>
-                                    `;
-                                    selectedStocksList.insertAdjacentHTML('beforeend', stockTag);
-                                }
-                            } else {
-                                // Remove the stock tag if unchecked
-                                const stockId = checkbox.value;
-                                const stockTag = selectedStocksList.querySelector(`.selected-stock-tag[data-stock-id="${stockId}"]`);
-                                if (stockTag) {
-                                    stockTag.remove();
-                                }
-                            }
-                        }
-                    });
-                });
-
-                // Initialize remove stock functionality
-                const removeStockButtons = editModal.querySelectorAll('.btn-remove-stock');
-                removeStockButtons.forEach(button => {
-                    button.addEventListener('click', (e) => {
-                        e.preventDefault();
-                        const stockId = button.closest('.selected-stock-tag').dataset.stockId;
-                        const checkbox = editModal.querySelector(`.stock-checkbox[value="${stockId}"]`);
-                        if (checkbox) {
-                            checkbox.checked = false;
-                            const event = new Event('change');
-                            checkbox.dispatchEvent(event);
-                        }
-                    });
-                });
-
                 // Add custom styles to match watchlist details
                 const style = document.createElement('style');
                 style.textContent = `
@@ -879,12 +814,8 @@ if (typeof WatchlistManager === 'undefined') {
                 return;
             }
 
+            // Selected stocks are carried by the picker's hidden inputs
             const formData = new FormData(form);
-            
-            // Get all checked stock checkboxes
-            const selectedStocks = Array.from(document.querySelectorAll('.stock-checkbox:checked')).map(cb => cb.value);
-            formData.delete('stocks'); // Remove the original stocks field
-            selectedStocks.forEach(stockId => formData.append('stocks', stockId));
 
             try {
                 const response = await fetch(`/dashboard/watchlist/${watchlistId}/edit/`, {
@@ -966,13 +897,9 @@ if (typeof WatchlistManager === 'undefined') {
         resetForm() {
             if (this.createWatchlistForm) {
                 this.createWatchlistForm.reset();
-                if (this.selectedStocksList) {
-                    this.selectedStocksList.innerHTML = '';
-                }
-                if (this.selectedCount) {
-                    this.selectedCount.textContent = '0';
+                if (this.picker) {
+                    this.picker.clear();
                 }
-                this.selectedStocks.clear();
             }
         }
 